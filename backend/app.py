@@ -1,27 +1,66 @@
-import logging
-
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger("uvicorn.error")
-logger.setLevel(logging.DEBUG)
-
-from fastapi import FastAPI, HTTPException, Query
-import os, datetime, math, re, requests, time
+from fastapi import FastAPI, Header, HTTPException, Query
+import os, datetime, hmac, math, re, time, asyncio
+from contextlib import asynccontextmanager
 from typing import Optional, List, Dict, Any
-from functools import lru_cache
 from cachetools import TTLCache, cached
-from openai import OpenAI
+from cachetools.keys import hashkey
 from dotenv import load_dotenv
 load_dotenv()
 
-import pandas as pd
+# 로컬 모듈은 .env 로드 이후에 import (모듈 로드 시점에 환경변수를 읽음)
+import telemetry
+from telemetry import PAYLOAD_SAMPLE, timed
+telemetry.setup_logging()
+log = telemetry.get_logger("app")
+
+from http_pool import pools
+import rate_governor
+import circuit
+from circuit import breakers, naver_hedge
+from metric_cache import metric_cache
+import singleflight
+from singleflight import coalesce
+from symbol_index import symbol_index
+from ranking import engine as ranking_engine
+from rpg import classify_rpg as _classify_rpg, classify_rpg_many as _classify_rpg_many, classify_arrays
+from screener import screener, SORT_KEYS as SCREENER_SORT_KEYS
+from peers import peers
+from prefetch import prefetcher
+import history_store
+from history_store import history, FALLBACK_MAX_AGE as HISTORY_FALLBACK_MAX_AGE
+from summary_cache import summary_cache
+import gpt_batch
+import shared_state
+from shared_state import acoordinate, coordinate, run_as_leader
+from streaming import SSE_HEADERS, JSONFieldStream, sse_event
+import naver_html
+import naver_listing
+import local_summary
+import export
+from export import exporter
+from naver_html import extract as extract_naver_html, to_float_safe
+
+# 새로 받은 지표는 모두 이력에 쌓고, 라이브 조회가 실패하면 이력의 최근 값으로 대신한다
+if history is not None:
+    metric_cache.on_store(history.append)
+    metric_cache.fallback = lambda source, symbol: history.fallback(source, symbol, HISTORY_FALLBACK_MAX_AGE)
+
+# 업종 백분위 그룹은 스크리너 스냅샷마다 다시 만들고, 그 사이 새로 받은 지표는 해당 종목만 반영 (peers.py)
+screener.on_snapshot(lambda snap: peers.load(snap.symbol, snap.code, snap.market, snap.sector, snap.values))
+metric_cache.on_store(lambda source, key, value: peers.update(key, value))
+
+# RPG 분류도 단계 타이머를 거친다 (rpg 모듈 자체는 계측과 무관하게 유지)
+classify_rpg = timed("classify")(_classify_rpg)
+classify_rpg_many = timed("classify", source="batch")(_classify_rpg_many)
+
 import numpy as np
 import json
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from bs4 import BeautifulSoup
 
 # -----------------------------
 # 환경변수
@@ -31,16 +70,72 @@ FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
 if not FINNHUB_API_KEY:
     raise RuntimeError("FINNHUB_API_KEY 가 .env 에 설정되어야 합니다.")
 
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+def _openai_client():
+    """공유 커넥션 풀을 쓰는 OpenAI 클라이언트 (키가 없으면 None)"""
+    return pools.openai(OPENAI_API_KEY)
+
+def _aopenai_client():
+    return pools.aopenai(OPENAI_API_KEY)
 
 # -----------------------------
 # 상수
 # -----------------------------
-FINNHUB = "https://finnhub.io/api/v1"
+# 업스트림 주소 (벤치마크 시 bench/upstream_stub.py 로 돌릴 수 있게 환경변수로 변경 가능, OpenAI 는 SDK 가 OPENAI_BASE_URL 을 읽음)
+FINNHUB = os.getenv("FINNHUB_BASE_URL", "https://finnhub.io/api/v1")
+
+# 단계별 타임아웃(초) - 느린 업스트림 하나가 전체 응답을 붙잡지 않도록 상한을 둔다
+STAGE_TIMEOUTS = {
+    "translate": float(os.getenv("TIMEOUT_TRANSLATE", "8")),
+    "search": float(os.getenv("TIMEOUT_SEARCH", "6")),
+    "metrics": float(os.getenv("TIMEOUT_METRICS", "8")),
+    "gpt": float(os.getenv("TIMEOUT_GPT", "25")),
+}
 
-app = FastAPI(title="KR Stock Analyzer with Finnhub")
-print(f"Loaded OpenAI API Key: {bool(OPENAI_API_KEY)}")
-print(f"Loaded Finnhub API Key: {bool(FINNHUB_API_KEY)}")
+# -----------------------------
+# 앱 수명 주기 - 업스트림별 커넥션 풀 생성/정리 (http_pool.py)
+# -----------------------------
+SCREENER_REFRESH_SEC = float(os.getenv("SCREENER_REFRESH_SEC", "21600"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pools.start(OPENAI_API_KEY)
+    symbol_index.reload()
+    tasks = []
+    if SCREENER_REFRESH_SEC > 0:
+        # 스크리너 스냅샷은 백그라운드에서 주기적으로 갱신 (기동을 막지 않음)
+        tasks.append(asyncio.create_task(
+            screener.run_periodic(_screener_universe, _screener_fetch, SCREENER_REFRESH_SEC,
+                                  bulk=_screener_bulk if SCREENER_BULK else None)
+        ))
+    # 이력 봉인·캐시 워밍은 워커 여러 개가 떠 있어도 하나만 (shared_state.run_as_leader)
+    # 스크리너는 워커마다 스냅샷을 갖지만 지표 조회가 공유 캐시·single-flight 를 거치므로 업스트림 호출은 늘지 않는다
+    if history is not None:
+        tasks.append(asyncio.create_task(run_as_leader("history_compact", _compact_history_daily)))
+    if prefetcher.interval > 0:
+        # 시드 종목 워밍 후 인기 종목 캐시를 만료 전에 미리 갱신 (prefetch.py)
+        # 조회 빈도는 리더 워커가 받은 요청만 센다 - 워커 간 부하가 고르면 전체 트래픽의 표본
+        tasks.append(asyncio.create_task(run_as_leader(
+            "prefetch", lambda: prefetcher.run_periodic(_prefetch_seeds, _prefetch_one)
+        )))
+    try:
+        yield
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await pools.aclose()
+
+async def _compact_history_daily():
+    """지난 날짜 이력 파티션을 하루 한 번 정렬 컬럼 파일로 봉인 (파일 I/O 는 스레드에서)"""
+    while True:
+        try:
+            await asyncio.to_thread(history.compact)
+        except Exception as e:
+            log.error("history.compact_error", error=str(e))
+        await asyncio.sleep(86400)
+
+app = FastAPI(title="KR Stock Analyzer with Finnhub", lifespan=lifespan)
+log.info("startup.keys", openai=bool(OPENAI_API_KEY), finnhub=bool(FINNHUB_API_KEY))
 
 app.add_middleware(
     CORSMiddleware,
@@ -54,6 +149,8 @@ app.add_middleware(
     allow_headers=["*"],  # 모든 HTTP 헤더 허용
 )
 
+app.add_middleware(telemetry.TimingMiddleware)
+
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # =========================================================
@@ -71,163 +168,295 @@ def _looks_like_kr_code(s: str) -> bool:
     """6자리 한국 종목코드 형태인지"""
     return bool(re.fullmatch(r"\d{6}", s.strip()))
 
+def _normalize_query(s: str) -> str:
+    """single-flight 키용 정규화 (대소문자·공백 차이 무시)"""
+    return ' '.join(s.strip().lower().split())
+
+async def _with_timeout(stage: str, coro, default=None):
+    """단계별 타임아웃을 적용해 코루틴을 실행하고, 초과 시 default 반환"""
+    try:
+        return await asyncio.wait_for(coro, timeout=STAGE_TIMEOUTS[stage])
+    except asyncio.TimeoutError:
+        telemetry.STAGE_TIMEOUTS.inc(stage=stage)
+        log.warning("stage.timeout", stage=stage, limit=STAGE_TIMEOUTS[stage])
+        return default
+
 # =========================================================
 # 1) 이름 → 티커 변환 (Finnhub 검색 API)
 #    GET /search?q=...&token=...
 # =========================================================
 cache = TTLCache(maxsize=128, ttl=3600)  # 1시간 캐시
 
+def _clean_query(query: str) -> str:
+    query = query.strip()  # 앞뒤 공백 제거
+    query = re.sub(r'[^\w\s]', '', query)  # 특수 문자 제거
+    return ' '.join(query.split())  # 중복 공백 제거
+
+@timed("search")
 @cached(cache)
 def _search_finnhub_candidates(query: str) -> List[Dict[str, Any]]:
     try:
-        query = query.strip()  # 앞뒤 공백 제거
-        query = re.sub(r'[^\w\s]', '', query)  # 특수 문자 제거
-        query = ' '.join(query.split())  # 중복 공백 제거
-
-        r = requests.get(
-            f"{FINNHUB}/search",
-            params={"q": query, "token": FINNHUB_API_KEY},
-            timeout=10
-        )
-        r.raise_for_status()
+        query = _clean_query(query)
+
+        with breakers["finnhub"].guard():
+            r = pools.session("finnhub").get(
+                f"{FINNHUB}/search",
+                params={"q": query, "token": FINNHUB_API_KEY},
+                timeout=10
+            )
+            r.raise_for_status()
         data = r.json() or {}
-        print(f"Search results for query '{query}': {data}")  # 검색 결과 출력
+        log.debug("finnhub.search", query=query, results=len(data.get("result") or []), payload=data, sample=PAYLOAD_SAMPLE)
         return data.get("result", []) or []
     except Exception as e:
-        print(f"Error in _search_finnhub_candidates: {e}")
+        log.warning("finnhub.search_error", query=query, error=str(e))
         return []
 
-def _rank_kr_candidates(q: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """KRX(.KS/.KQ) 또는 글로벌 종목을 포함하여 간단 점수로 정렬"""
+@timed("search")
+async def _search_finnhub_candidates_async(query: str) -> List[Dict[str, Any]]:
+    """_search_finnhub_candidates 의 비동기 버전 (동기 버전과 같은 TTL 캐시를 공유)"""
+    key = hashkey(query)
+    if key in cache:
+        return cache[key]
     try:
-        q_norm = q.strip().lower()
-        # 모든 종목 포함
-        candidates = [
-            x for x in items if isinstance(x.get("symbol", ""), str)
-        ]
-
-        def score(x):
-            sym = x.get("symbol", "")
-            desc = (x.get("description") or "").lower()
-            # 이름 매칭 점수
-            name_hit = 0
-            if q_norm in desc: name_hit += 2
-            if q_norm == desc: name_hit += 2
-            # 거래소 우선순위 (KRX > NASDAQ/NYSE > 기타)
-            exch_boost = 0.3 if sym.endswith(".KS") or sym.endswith(".KQ") else (
-                0.2 if sym in ["TSLA", "AAPL", "GOOGL"] else 0.0
+        q = _clean_query(query)
+        with breakers["finnhub"].guard():
+            r = await pools.aclient("finnhub").get(
+                f"{FINNHUB}/search",
+                params={"q": q, "token": FINNHUB_API_KEY},
+                timeout=10
             )
-            # 기본 점수
-            base = 1.0
-            return base + name_hit + exch_boost
+            r.raise_for_status()
+        data = r.json() or {}
+        log.debug("finnhub.search", query=q, results=len(data.get("result") or []), payload=data, sample=PAYLOAD_SAMPLE)
+        result = data.get("result", []) or []
+        cache[key] = result
+        return result
+    except Exception as e:
+        log.warning("finnhub.search_error", query=query, error=str(e))
+        return []
 
-        return sorted(candidates, key=score, reverse=True)
+def _rank_kr_candidates(q: str, items: List[Dict[str, Any]], k: Optional[int] = None) -> List[Dict[str, Any]]:
+    """KRX(.KS/.KQ) 또는 글로벌 종목을 포함하여 점수로 정렬 (ranking.RankingEngine 으로 일괄 계산)"""
+    try:
+        return ranking_engine.rank(q, items, k=k)
     except Exception as e:
-        print(f"Error in _rank_kr_candidates: {e}")
+        log.error("rank.error", query=q, error=str(e))
         return []
 
+def _resolve_from_index(query: str) -> Optional[Dict[str, str]]:
+    """로컬 종목 인덱스에서 바로 해석 (네트워크 없음). 못 찾으면 None"""
+    try:
+        matches = symbol_index.lookup(query, limit=10)
+        if not matches:
+            return _scan_index(query)
+        # 정확 일치가 있으면 그 안에서만, 없으면 접두/퍼지 후보 전체를 랭킹 엔진으로 정렬
+        pool = [m for m in matches if m.kind == "exact"] or matches
+        items = [
+            {"symbol": m.entry.symbol, "description": f"{m.entry.name_ko} {m.entry.name_en}", "_match": m}
+            for m in pool
+        ]
+        ranked = ranking_engine.rank(query, items, k=1, prior=[m.score for m in pool])
+    except Exception as e:
+        log.error("resolve.index_error", query=query, error=str(e))
+        return None
+    if not ranked:
+        return None
+    match = ranked[0]["_match"]
+    log.debug("resolve.index", query=query, symbol=match.entry.symbol, kind=match.kind)
+    return {"symbol": match.entry.symbol, "name": match.entry.display_name}
+
+def _scan_index(query: str) -> Optional[Dict[str, str]]:
+    """키 일치가 없을 때 전체 종목명에서 부분 문자열로 한 번 더 찾는다 (예: '에너지솔루션')"""
+    q = query.strip().lower()
+    if len(q) < 2:
+        return None
+    cs = symbol_index.index.candidate_set(ranking_engine)
+    ranked = ranking_engine.rank_prepared(q, cs, k=1)
+    if not ranked or q not in ranked[0]["description"].lower():
+        return None
+    entry = ranked[0]["_entry"]
+    log.debug("resolve.index_scan", query=query, symbol=entry.symbol)
+    return {"symbol": entry.symbol, "name": entry.display_name}
+
+@timed("resolve")
+@coalesce(lambda user_input: _normalize_query(user_input))
 def resolve_kr_ticker(user_input: str) -> Dict[str, str]:
     try:
         s = user_input.strip()
 
+        # 1순위: 로컬 인덱스 (GPT 번역·Finnhub 검색은 인덱스에 없을 때만)
+        hit = _resolve_from_index(s)
+        if hit:
+            return hit
+
         # 한국어 종목명일 경우 GPT를 사용하여 영어로 변환
         if re.search(r"[가-힣]", s):  # 한국어 문자가 포함된 경우
-            print(f"Detected Korean name: {s}. Translating to English using GPT.")
+            log.debug("resolve.translate", query=s)
             s = translate_kor_to_eng_with_gpt(s)
+            hit = _resolve_from_index(s)
+            if hit:
+                return hit
 
-        print(f"Final query for Finnhub API: '{s}'")  # Finnhub API에 전달될 쿼리 출력
+        log.debug("resolve.finnhub_search", query=s)
         quotes = _search_finnhub_candidates(s)
-        print(f"Quotes for {s}: {quotes}")  # Finnhub API 검색 결과 출력
-        ranked = _rank_kr_candidates(s, quotes)
-        print(f"Ranked candidates for {s}: {ranked}")
-        if not ranked:
-            raise HTTPException(status_code=404, detail=f"검색 결과가 없습니다: {user_input}. 더 자세한 종목명을 입력해주세요.")
-
-        top = ranked[0]
-        return {
-            "symbol": top["symbol"],
-            "name": top.get("description") or top["symbol"]
-        }
+        return _pick_top_candidate(user_input, s, quotes)
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.error("resolve.error", query=user_input, error=str(e))
+        raise HTTPException(status_code=500, detail="티커 변환 중 오류가 발생했습니다.")
+
+@timed("resolve")
+@coalesce(lambda user_input: _normalize_query(user_input))
+async def resolve_kr_ticker_async(user_input: str) -> Dict[str, str]:
+    try:
+        s = user_input.strip()
+
+        hit = _resolve_from_index(s)
+        if hit:
+            return hit
+
+        if re.search(r"[가-힣]", s):
+            log.debug("resolve.translate", query=s)
+            translated = await _with_timeout("translate", translate_kor_to_eng_with_gpt_async(s))
+            if translated is None:
+                raise HTTPException(status_code=504, detail="종목명 변환 시간이 초과되었습니다.")
+            s = translated
+            hit = _resolve_from_index(s)
+            if hit:
+                return hit
+
+        log.debug("resolve.finnhub_search", query=s)
+        quotes = await _with_timeout("search", _search_finnhub_candidates_async(s), default=[])
+        return _pick_top_candidate(user_input, s, quotes)
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in resolve_kr_ticker: {e}")
+        log.error("resolve.error", query=user_input, error=str(e))
         raise HTTPException(status_code=500, detail="티커 변환 중 오류가 발생했습니다.")
 
+def _pick_top_candidate(user_input: str, query: str, quotes: List[Dict[str, Any]]) -> Dict[str, str]:
+    ranked = _rank_kr_candidates(query, quotes, k=5)
+    log.debug("resolve.ranked", query=query, top=[c["symbol"] for c in ranked], sample=PAYLOAD_SAMPLE)
+    if not ranked:
+        raise HTTPException(status_code=404, detail=f"검색 결과가 없습니다: {user_input}. 더 자세한 종목명을 입력해주세요.")
+
+    top = ranked[0]
+    return {
+        "symbol": top["symbol"],
+        "name": top.get("description") or top["symbol"]
+    }
+
 # =========================================================
 # 2) 지표 수집 (Finnhub /stock/metric + 네이버 금융 크롤링)
 # =========================================================
+def _parse_finnhub_metric(ticker: str, metric: Dict[str, Any]):
+    """Finnhub /stock/metric 응답의 metric 딕셔너리에서 (per, pbr, roe) 추출"""
+    # PER
+    per = (
+        _to_float(metric.get("peTTM")) or
+        _to_float(metric.get("peBasicExclExtraTTM")) or
+        _to_float(metric.get("peAnnual")) or
+        _to_float(metric.get("priceToEarningsTTM"))
+    )
+
+    # PBR
+    pbr = (
+        _to_float(metric.get("pbRatioTTM")) or
+        _to_float(metric.get("priceToBookAnnual")) or
+        _to_float(metric.get("priceToBookMRQ")) or
+        _to_float(metric.get("pbTTM")) or
+        _to_float(metric.get("pbAnnual"))
+    )
+    # PBR 계산 추가
+    if pbr is None:
+        price = _to_float(metric.get("currentPrice"))
+        bvps = _to_float(metric.get("bookValuePerShare"))
+        if price is not None and bvps is not None:
+            pbr = price / bvps
+            log.debug("finnhub.pbr_calculated", ticker=ticker, pbr=pbr)
+        else:
+            log.debug("finnhub.pbr_missing", ticker=ticker)
+
+    # ROE(%)
+    roe = (
+        _to_float(metric.get("roeTTM")) or
+        _to_float(metric.get("returnOnEquityTTM")) or
+        _to_float(metric.get("roeAnnual"))
+    )
+    # roe가 소수(0.12)로 올 수도 있어 보정
+    if roe is not None and roe < 1.0:
+        roe = roe * 100.0
+
+    return per, pbr, roe
+
+@coalesce(lambda ticker: ticker.strip().upper())
 def get_metrics_from_finnhub(ticker: str):
+    # 티커가 .KS 또는 .KQ로 끝날 경우 Finnhub를 건너뛰고 네이버 금융 크롤링 시도
+    if ticker.endswith(".KS") or ticker.endswith(".KQ"):
+        kr_ticker = ticker.split(".")[0]  # 접미사 제거 (숫자 6자리만 남김)
+        log.debug("metrics.kr_route", ticker=ticker, itemcode=kr_ticker)
+        return get_metrics_from_naver_finance(kr_ticker)
+
+    return metric_cache.get_or_fetch("finnhub", ticker, lambda: _fetch_finnhub_metrics(ticker))
+
+@timed("metrics", source="finnhub")
+def _fetch_finnhub_metrics(ticker: str):
     try:
-        # 티커가 .KS 또는 .KQ로 끝날 경우 Finnhub를 건너뛰고 네이버 금융 크롤링 시도
-        if ticker.endswith(".KS") or ticker.endswith(".KQ"):
-            kr_ticker = ticker.split(".")[0]  # 접미사 제거 (숫자 6자리만 남김)
-            print(f"Ticker '{ticker}' detected as KR code. Using Naver Finance directly with ticker: {kr_ticker}")
-            return get_metrics_from_naver_finance(kr_ticker)
-
-        # Finnhub API 호출
-        r = requests.get(
-            f"{FINNHUB}/stock/metric",
-            params={"symbol": ticker, "metric": "all", "token": FINNHUB_API_KEY},
-            timeout=10
-        )
+        # Finnhub API 호출 (장애가 이어지면 breaker 가 열려 바로 실패 처리)
+        with breakers["finnhub"].guard():
+            r = pools.session("finnhub").get(
+                f"{FINNHUB}/stock/metric",
+                params={"symbol": ticker, "metric": "all", "token": FINNHUB_API_KEY},
+                timeout=10
+            )
+            if r.status_code >= 500 or r.status_code == 429:
+                r.raise_for_status()
         if not r.ok:
-            print("Finnhub metric call failed:", r.status_code, r.text[:200])
+            log.warning("finnhub.metric_status", ticker=ticker, status=r.status_code, body=r.text[:200])
             return None, None, None
         metric = (r.json() or {}).get("metric", {}) or {}
+        return _parse_finnhub_metric(ticker, metric)
+    except Exception as e:
+        log.warning("finnhub.metric_error", ticker=ticker, error=str(e))
+        return None, None, None
 
-        # PER
-        per = (
-            _to_float(metric.get("peTTM")) or
-            _to_float(metric.get("peBasicExclExtraTTM")) or
-            _to_float(metric.get("peAnnual")) or
-            _to_float(metric.get("priceToEarningsTTM"))
-        )
-
-        # PBR
-        pbr = (
-            _to_float(metric.get("pbRatioTTM")) or
-            _to_float(metric.get("priceToBookAnnual")) or
-            _to_float(metric.get("priceToBookMRQ")) or
-            _to_float(metric.get("pbTTM")) or
-            _to_float(metric.get("pbAnnual"))
-        )
-        # PBR 계산 추가
-        if pbr is None:
-            price = _to_float(metric.get("currentPrice"))
-            bvps = _to_float(metric.get("bookValuePerShare"))
-            if price is not None and bvps is not None:
-                pbr = price / bvps
-                print(f"Calculated PBR for {ticker}: {pbr}")
-            else:
-                print(f"PBR data is missing and cannot be calculated for {ticker}")
+@coalesce(lambda ticker: ticker.strip().upper())
+async def get_metrics_from_finnhub_async(ticker: str):
+    """get_metrics_from_finnhub 의 비동기 버전"""
+    if ticker.endswith(".KS") or ticker.endswith(".KQ"):
+        kr_ticker = ticker.split(".")[0]
+        log.debug("metrics.kr_route", ticker=ticker, itemcode=kr_ticker)
+        return await get_metrics_from_naver_finance_async(kr_ticker)
 
-        # ROE(%)
-        roe = (
-            _to_float(metric.get("roeTTM")) or
-            _to_float(metric.get("returnOnEquityTTM")) or
-            _to_float(metric.get("roeAnnual"))
-        )
-        # roe가 소수(0.12)로 올 수도 있어 보정
-        if roe is not None and roe < 1.0:
-            roe = roe * 100.0
+    return await metric_cache.aget_or_fetch("finnhub", ticker, lambda: _fetch_finnhub_metrics_async(ticker))
 
-        return per, pbr, roe
+@timed("metrics", source="finnhub")
+async def _fetch_finnhub_metrics_async(ticker: str):
+    try:
+        with breakers["finnhub"].guard():
+            r = await pools.aclient("finnhub").get(
+                f"{FINNHUB}/stock/metric",
+                params={"symbol": ticker, "metric": "all", "token": FINNHUB_API_KEY},
+                timeout=10
+            )
+            if r.status_code >= 500 or r.status_code == 429:
+                r.raise_for_status()
+        if not r.is_success:
+            log.warning("finnhub.metric_status", ticker=ticker, status=r.status_code, body=r.text[:200])
+            return None, None, None
+        metric = (r.json() or {}).get("metric", {}) or {}
+        return _parse_finnhub_metric(ticker, metric)
     except Exception as e:
-        print(f"Error in get_metrics_from_finnhub: {e}")
+        log.warning("finnhub.metric_error", ticker=ticker, error=str(e))
         return None, None, None
 
 # =========================================================
 # 네이버 금융 크롤링
 # =========================================================
-import re, time, json
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
-
-NAVER_JSON_URL = "https://api.finance.naver.com/service/itemSummary.nhn"
-NAVER_HTML_URL = "https://finance.naver.com/item/main.naver?code={itemcode}"
+NAVER_JSON_URL = os.getenv("NAVER_JSON_URL", "https://api.finance.naver.com/service/itemSummary.nhn")
+NAVER_HTML_URL = os.getenv("NAVER_HTML_URL", "https://finance.naver.com/item/main.naver?code={itemcode}")
 
 def _extract_itemcode(ticker_or_code: str | None) -> str | None:
     if not ticker_or_code:
@@ -235,167 +464,170 @@ def _extract_itemcode(ticker_or_code: str | None) -> str | None:
     m = re.search(r'(\d{6})', str(ticker_or_code))
     return m.group(1) if m else None
 
-def _to_float_safe(s):
-    """쉼표·단위(원, 배 등) 포함 문자열에서도 숫자만 추출하여 float 변환"""
-    if s is None:
-        return None
-    if isinstance(s, (int, float)):
-        try:
-            import math
-            if isinstance(s, float) and math.isnan(s):
-                return None
-        except Exception:
-            pass
-        return float(s)
-
-    s = str(s).strip()
-    if s in {"", "-", "N/A", "NaN"}:
-        return None
+NAVER_HTML_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
 
-    # 일반적인 제거 후에도 남는 단위가 있을 수 있으므로 최종적으로 숫자 패턴을 추출
-    s = s.replace(",", "").replace("%", "")
-    m = re.search(r"[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?", s)
-    return float(m.group(0)) if m else None
-
-def _session_with_retries():
-    s = requests.Session()
-    retries = Retry(
-        total=3,
-        backoff_factor=0.5,  # 0.5s, 1s, 2s ...
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=["GET"]
+def _naver_json_headers(itemcode: str) -> Dict[str, str]:
+    return {
+        "User-Agent": "Mozilla/5.0",
+        "Accept": "application/json, text/plain, */*",
+        "Referer": NAVER_HTML_URL.format(itemcode=itemcode),
+        "Connection": "keep-alive",
+    }
+
+def _parse_naver_json(js: Dict[str, Any]):
+    """itemSummary JSON → (per, pbr, roe, eps, bps)"""
+    return (
+        to_float_safe(js.get("per")),
+        to_float_safe(js.get("pbr")),
+        to_float_safe(js.get("roe")),
+        to_float_safe(js.get("eps")),
+        to_float_safe(js.get("bps")),  # JSON에 bps가 있으면 1순위로 사용
     )
-    s.mount("https://", HTTPAdapter(max_retries=retries))
-    return s
+
+def _naver_complete(values) -> bool:
+    """(per, pbr, roe, eps, bps) 만으로 per/pbr/roe 를 모두 낼 수 있는지 (roe 는 eps/bps 로 계산 가능)"""
+    if values is None:
+        return False
+    per, pbr, roe, eps, bps = values
+    return per is not None and pbr is not None and (roe is not None or (eps is not None and bool(bps)))
+
+def _merge_naver_values(*sources):
+    """앞쪽 소스 값을 우선하고 비어 있는 값만 뒤쪽으로 채운다"""
+    merged = (None,) * 5
+    for values in sources:
+        if values:
+            merged = tuple(m if m is not None else v for m, v in zip(merged, values))
+    return merged
+
+def _finalize_naver_metrics(per, pbr, roe, eps, bps):
+    # 3) ROE 직접 계산 (eps/bps 모두 있고 bps != 0일 때)
+    if roe is None and eps is not None and bps is not None and bps != 0:
+        roe = round((eps / bps) * 100, 2)
+
+    log.debug("naver.metrics", per=per, pbr=pbr, roe=roe, eps=eps, bps=bps)
+    return per, pbr, roe
+
+@timed("html_parse")
+def _parse_naver_html(html: str, *values):
+    return extract_naver_html(html, *values)
 
 def get_metrics_from_naver_finance(ticker_or_code: str):
     itemcode = _extract_itemcode(ticker_or_code)
     if not itemcode:
         return None, None, None
 
-    sess = _session_with_retries()
-    headers = {
-        "User-Agent": "Mozilla/5.0",
-        "Accept": "application/json, text/plain, */*",
-        "Referer": NAVER_HTML_URL.format(itemcode=itemcode),
-        "Connection": "keep-alive",
-    }
+    return metric_cache.get_or_fetch("naver", itemcode, lambda: _fetch_naver_metrics(itemcode))
+
+@timed("metrics", source="naver")
+def _fetch_naver_metrics(itemcode: str):
+    sess = pools.session("naver")  # 재시도 정책이 적용된 공유 세션
+    headers = _naver_json_headers(itemcode)
 
     per = pbr = roe = eps = bps = None
 
-    # 1) JSON 엔드포인트 시도
+    # 1) JSON 엔드포인트 시도 (breaker 가 열려 있으면 바로 HTML 로)
     try:
-        r = sess.get(NAVER_JSON_URL, headers=headers, params={"itemcode": itemcode}, timeout=5)
-        if not r.content:
-            time.sleep(0.4)
+        with breakers["naver_json"].guard():
             r = sess.get(NAVER_JSON_URL, headers=headers, params={"itemcode": itemcode}, timeout=5)
+            if not r.content:
+                time.sleep(0.4)
+                r = sess.get(NAVER_JSON_URL, headers=headers, params={"itemcode": itemcode}, timeout=5)
 
-        if not r.content:
-            raise ValueError("Empty body from Naver JSON")
+            if not r.content:
+                raise ValueError("Empty body from Naver JSON")
 
         js = r.json()
-        per = _to_float_safe(js.get("per"))
-        pbr = _to_float_safe(js.get("pbr"))
-        roe = _to_float_safe(js.get("roe"))
-        eps = _to_float_safe(js.get("eps"))
-        bps = _to_float_safe(js.get("bps"))  # JSON에 bps가 있으면 1순위로 사용
-        print(f"JSON Response: {js}")
+        per, pbr, roe, eps, bps = _parse_naver_json(js)
+        log.debug("naver.json", itemcode=itemcode, payload=js, sample=PAYLOAD_SAMPLE)
     except Exception as e:
-        print(f"[naver itemSummary error] {e} (itemcode={itemcode})")
+        log.warning("naver.json_error", itemcode=itemcode, error=str(e))
 
     # 2) HTML 폴백 (부족한 값만 채움)
-    if per is None or pbr is None or roe is None or eps is None or bps is None:
+    if not _naver_complete((per, pbr, roe, eps, bps)):
         try:
-            html_headers = {
-                "User-Agent": "Mozilla/5.0",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            }
             url = NAVER_HTML_URL.format(itemcode=itemcode)
-            res = sess.get(url, headers=html_headers, timeout=6)
+            with breakers["naver_html"].guard():
+                res = sess.get(url, headers=NAVER_HTML_HEADERS, timeout=6)
+                res.raise_for_status()
+            per, pbr, roe, eps, bps = _parse_naver_html(res.text, per, pbr, roe, eps, bps)
+        except Exception as e:
+            log.warning("naver.html_error", itemcode=itemcode, error=str(e))
+
+    return _finalize_naver_metrics(per, pbr, roe, eps, bps)
+
+async def _fetch_naver_json_async(itemcode: str):
+    http = pools.aclient("naver")
+    headers = _naver_json_headers(itemcode)
+    try:
+        with breakers["naver_json"].guard():
+            r = await http.get(NAVER_JSON_URL, headers=headers, params={"itemcode": itemcode}, timeout=5)
+            if not r.content:
+                await asyncio.sleep(0.4)
+                r = await http.get(NAVER_JSON_URL, headers=headers, params={"itemcode": itemcode}, timeout=5)
+
+            if not r.content:
+                raise ValueError("Empty body from Naver JSON")
+
+        js = r.json()
+        log.debug("naver.json", itemcode=itemcode, payload=js, sample=PAYLOAD_SAMPLE)
+        return js
+    except Exception as e:
+        log.warning("naver.json_error", itemcode=itemcode, error=str(e))
+        return None
+
+async def _fetch_naver_html_async(itemcode: str):
+    try:
+        with breakers["naver_html"].guard():
+            res = await pools.aclient("naver").get(
+                NAVER_HTML_URL.format(itemcode=itemcode), headers=NAVER_HTML_HEADERS, timeout=6
+            )
             res.raise_for_status()
-            soup = BeautifulSoup(res.text, "html.parser")
-
-            # id 기반(있으면 가장 신뢰)
-            if per is None:
-                node = soup.select_one("#_per")
-                per = _to_float_safe(node.get_text(strip=True)) if node else per
-            if pbr is None:
-                node = soup.select_one("#_pbr") or soup.select_one("#pbr")  # 언더스코어/무언더스코어 둘 다 대응
-                pbr = _to_float_safe(node.get_text(strip=True)) if node else pbr
-            if roe is None:
-                node = soup.select_one("#_roe")
-                roe = _to_float_safe(node.get_text(strip=True)) if node else roe
-            if eps is None:
-                node = soup.select_one("#_eps")
-                eps = _to_float_safe(node.get_text(strip=True)) if node else eps
-
-            # BPS: 너가 확인한 구조 - <em id="pbr">PBR</em> 바로 다음 <em>이 BPS(원 단위)
-            if bps is None:
-                em_pbr = soup.select_one("em#_pbr") or soup.select_one("em#pbr")
-                if em_pbr:
-                    # 같은 <td> 안의 두 번째 em을 우선 시도
-                    td = em_pbr.find_parent("td")
-                    ems = td.find_all("em") if td else []
-                    if len(ems) >= 2:
-                        bps = _to_float_safe(ems[1].get_text(strip=True))
-                    # 보조: 문서 순서상 다음 em 하나만 집는다
-                    if bps is None:
-                        nxt = em_pbr.find_next("em")
-                        if nxt and nxt is not em_pbr:
-                            bps = _to_float_safe(nxt.get_text(strip=True))
-
-            # 최후 보강: 표 헤더가 'BPS'인 셀을 찾아 오른쪽(td) 값
-            if bps is None:
-                th_bps = soup.find(["th", "dt"], string=re.compile(r"\bBPS\b", re.I))
-                if th_bps:
-                    td_bps = th_bps.find_next("td") or (th_bps.parent.find_next("td") if th_bps.parent else None)
-                    if td_bps:
-                        bps = _to_float_safe(td_bps.get_text(" ", strip=True))
-
-            # 마지막 보조: '원'이 포함된 em 주변에서 숫자만 추출
-            if bps is None:
-                em_with_won = soup.find("em", string=re.compile(r"원"))
-                if em_with_won:
-                    candidate = em_with_won.get_text(" ", strip=True)
-                    if _to_float_safe(candidate) is None:
-                        candidate = (em_with_won.previous_sibling or "") or em_with_won.parent.get_text(" ", strip=True)
-                    bps = _to_float_safe(candidate)
+        return res.text
+    except Exception as e:
+        log.warning("naver.html_error", itemcode=itemcode, error=str(e))
+        return None
 
-        except Exception as e:
-            print(f"[naver HTML fallback error] {e} (itemcode={itemcode})")
+async def get_metrics_from_naver_finance_async(ticker_or_code: str):
+    """get_metrics_from_naver_finance 의 비동기 버전.
+    JSON 을 먼저 요청하고, 최근 p95 지연 안에 답이 없으면 HTML 페이지를 동시에 받아 먼저 끝난 쪽을 쓴다 (circuit.Hedge)."""
+    itemcode = _extract_itemcode(ticker_or_code)
+    if not itemcode:
+        return None, None, None
 
-    # 3) ROE 직접 계산 (eps/bps 모두 있고 bps != 0일 때)
-    if roe is None and eps is not None and bps is not None and bps != 0:
-        roe = round((eps / bps) * 100, 2)
+    return await metric_cache.aget_or_fetch("naver", itemcode, lambda: _fetch_naver_metrics_async(itemcode))
 
-    print(f"Debug - PER: {per}, PBR: {pbr}, ROE: {roe}, EPS: {eps}, BPS: {bps}")
-    return per, pbr, roe
+async def _naver_json_values(itemcode: str):
+    js = await _fetch_naver_json_async(itemcode)
+    return _parse_naver_json(js) if js else None
+
+async def _naver_html_values(itemcode: str, preset=None):
+    """HTML 페이지에서 (per, pbr, roe, eps, bps). preset 에 이미 있는 값은 그대로 두고 빈 값만 채운다"""
+    html = await _fetch_naver_html_async(itemcode)
+    if not html:
+        return None
+    try:
+        # 파싱은 CPU 작업이므로 이벤트 루프를 막지 않도록 스레드에서 수행
+        return await asyncio.to_thread(_parse_naver_html, html, *(preset or (None,) * 5))
+    except Exception as e:
+        log.warning("naver.html_error", itemcode=itemcode, error=str(e))
+        return None
+
+@timed("metrics", source="naver")
+async def _fetch_naver_metrics_async(itemcode: str):
+    # JSON 이 충분하면 HTML(수백 KB)은 받지 않는다. 늦거나 부족할 때만 HTML 로 채움
+    js_values, html_values = await naver_hedge.run(
+        lambda: _naver_json_values(itemcode),
+        lambda preset: _naver_html_values(itemcode, preset),
+        _naver_complete,
+    )
+    return _finalize_naver_metrics(*_merge_naver_values(js_values, html_values))
 
 # =========================================================
 # 3) RPG 분류 & GPT 요약
 # =========================================================
-def classify_rpg(roe, per, pbr):
-    roe_tag = "High" if (roe is not None and roe >= 10) else "Low"
-    per_tag = "Low" if (per is not None and per <= 12) else "High"
-    pbr_tag = "Low" if (pbr is not None and pbr <= 1.0) else "High"
-
-    if roe_tag=="High" and pbr_tag=="Low": job = "전사"
-    elif roe_tag=="High" and per_tag=="High": job = "마법사"
-    else: job = "도적"
-
-    temper = "모험" if (per_tag=="High" and roe_tag=="High") else "수호"
-    title = f"{temper} {job}"
-
-    descriptions = {
-        "수호 전사": "안정적 수익성과 저평가 매력을 바탕으로 자산을 지키는 타입",
-        "모험 전사": "수익성을 무기로 새로운 기회를 추적하는 도전형",
-        "수호 마법사": "검증된 기반 위에 분석과 혁신을 결합한 전략가",
-        "모험 마법사": "성장성과 기술 혁신을 앞세우는 개척자",
-        "수호 도적": "저평가 구간에서 반등을 노리는 잠행형",
-        "모험 도적": "높은 변동성을 기회로 삼는 추격형"
-    }
-    return title, job, temper, descriptions.get(title, "")
-
 SUMMARY_SCHEMA = {
   "type": "object",
   "properties": {
@@ -410,9 +642,8 @@ SUMMARY_SCHEMA = {
   "additionalProperties": False
 }
 
-def gpt_generate(company, roe, per, pbr, rpg_title, rpg_desc):
-    try:
-        user_prompt = f"""
+def _build_summary_prompt(company, roe, per, pbr, rpg_title, rpg_desc) -> str:
+    return f"""
 [요약]
 - 회사명: {company}
 - ROE(%): {roe}
@@ -428,117 +659,1102 @@ def gpt_generate(company, roe, per, pbr, rpg_title, rpg_desc):
 - 위 수치를 반영하여 '주의 1~2문장 / 장점 1~2문장'을 한 줄씩 작성.
 출력은 JSON만.
 """
+
+def _offline_summary(company) -> Dict[str, Any]:
+    return {
+        "summary3": [
+            f"{company}의 핵심 지표를 요약했다.",
+            "지표 조합을 통해 투자 시사점을 도출할 수 있다.",
+            "데이터의 공시 지연·결측에 유의해야 한다."
+        ],
+        "insights": {
+            "caution": "지표는 참고용이며, 공시 지연/결측 가능성이 있다.",
+            "positive": "Finnhub 무료 API로도 빠른 프로토타입이 가능하다."
+        },
+        "tier": "offline",
+    }
+
+def _failed_summary() -> Dict[str, Any]:
+    return {
+        "summary3": ["OpenAI API 호출 실패"],
+        "insights": {
+            "caution": "OpenAI API 호출 실패",
+            "positive": "오프라인 모드로 계속 진행"
+        },
+        "tier": "failed",
+    }
+
+def _parse_summary_content(content: str) -> Dict[str, Any]:
+    return _summary_from_raw(json.loads(content))  # dict로 파싱
+
+def _summary_from_raw(raw_data: Dict[str, Any]) -> Dict[str, Any]:
+    # OpenAI 응답 데이터를 summary3와 insights로 매핑
+    summary3 = [
+        raw_data.get("investment_advice", ""),
+        raw_data.get("recent_news_strategy", ""),
+        raw_data.get("rpg_title_desc", "")
+    ]
+    insights = {
+        "caution": raw_data.get("caution", ""),
+        "positive": raw_data.get("advantage", "")
+    }
+
+    return {"summary3": summary3, "insights": insights}
+
+SUMMARY_MODEL = "gpt-4"
+SUMMARY_TEMPERATURE = 0.2
+
+def _summary_request(company, roe, per, pbr, rpg_title, rpg_desc):
+    """(프롬프트, 캐시 키) - 지표는 캐시 정밀도로 반올림해 프롬프트에 넣는다"""
+    roe, per, pbr = summary_cache.bucket(roe, per, pbr)
+    prompt = _build_summary_prompt(company, roe, per, pbr, rpg_title, rpg_desc)
+    return prompt, summary_cache.key(prompt, SUMMARY_MODEL, SUMMARY_TEMPERATURE)
+
+def _gpt_flight_key(company, roe, per, pbr, rpg_title, rpg_desc):
+    return _summary_request(company, roe, per, pbr, rpg_title, rpg_desc)[1]
+
+def _with_cache_info(summary: Dict[str, Any], hit: bool, age: Optional[float] = None) -> Dict[str, Any]:
+    return dict(summary, cache={"hit": hit, "age": round(age, 1) if age is not None else None})
+
+@coalesce(_gpt_flight_key)
+@timed("gpt")
+def gpt_generate(company, roe, per, pbr, rpg_title, rpg_desc):
+    try:
+        user_prompt, cache_key = _summary_request(company, roe, per, pbr, rpg_title, rpg_desc)
+        cached_summary = summary_cache.get(cache_key)
+        if cached_summary is not None:
+            return _with_cache_info(cached_summary[0], True, cached_summary[1])
+
+        client = _openai_client()
         if client is None:
-            return {
-                "summary3": [
-                    f"{company}의 핵심 지표를 요약했다.",
-                    "지표 조합을 통해 투자 시사점을 도출할 수 있다.",
-                    "데이터의 공시 지연·결측에 유의해야 한다."
-                ],
-                "insights": {
-                    "caution": "지표는 참고용이며, 공시 지연/결측 가능성이 있다.",
-                    "positive": "Finnhub 무료 API로도 빠른 프로토타입이 가능하다."
-                }
-            }
-
-        # OpenAI API 호출
-        resp = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": user_prompt}],
-            temperature=0.2
-        )
+            return _offline_summary(company)
+
+        # 다른 워커가 같은 요약을 만드는 중이면 그 결과를 공유 캐시에서 받는다
+        with coordinate(summary_cache.flight, "summary:" + cache_key, lambda: summary_cache.peek(cache_key)) as shared:
+            if shared is not None:
+                return _with_cache_info(shared[0], True, shared[1])
+
+            # OpenAI API 호출
+            resp = client.chat.completions.create(
+                model=SUMMARY_MODEL,
+                messages=[{"role": "user", "content": user_prompt}],
+                temperature=SUMMARY_TEMPERATURE
+            )
 
-        print(f"OpenAI API response: {resp}")
+            log.debug("openai.summary", company=company, usage=getattr(resp, "usage", None), payload=resp, sample=PAYLOAD_SAMPLE)
 
-        content = resp.choices[0].message.content  # 문자열(JSON)
-        raw_data = json.loads(content)  # dict로 파싱
+            content = resp.choices[0].message.content  # 문자열(JSON)
+            summary = _parse_summary_content(content)
+            summary_cache.put(cache_key, summary)
+        return _with_cache_info(summary, False)
 
-        # OpenAI 응답 데이터를 summary3와 insights로 매핑
-        summary3 = [
-            raw_data.get("investment_advice", ""),
-            raw_data.get("recent_news_strategy", ""),
-            raw_data.get("rpg_title_desc", "")
-        ]
-        insights = {
-            "caution": raw_data.get("caution", ""),
-            "positive": raw_data.get("advantage", "")
-        }
+    except Exception as e:
+        log.error("gpt.error", company=company, error=str(e))
+        return _failed_summary()
 
-        return {"summary3": summary3, "insights": insights}
+@coalesce(_gpt_flight_key)
+@timed("gpt")
+async def gpt_generate_async(company, roe, per, pbr, rpg_title, rpg_desc):
+    """gpt_generate 의 비동기 버전 (AsyncOpenAI 사용)"""
+    try:
+        user_prompt, cache_key = _summary_request(company, roe, per, pbr, rpg_title, rpg_desc)
+        cached_summary = await summary_cache.aget(cache_key)
+        if cached_summary is not None:
+            return _with_cache_info(cached_summary[0], True, cached_summary[1])
+
+        aclient = _aopenai_client()
+        if aclient is None:
+            return _offline_summary(company)
+
+        async with acoordinate(summary_cache.flight, "summary:" + cache_key, lambda: summary_cache.peek(cache_key)) as shared:
+            if shared is not None:
+                return _with_cache_info(shared[0], True, shared[1])
+            summary = await _request_summary_async(aclient, company, user_prompt)
+            await summary_cache.aput(cache_key, summary)
+        return _with_cache_info(summary, False)
 
     except Exception as e:
-        print(f"Error in gpt_generate: {e}")
-        return {
-            "summary3": ["OpenAI API 호출 실패"],
-            "insights": {
-                "caution": "OpenAI API 호출 실패",
-                "positive": "오프라인 모드로 계속 진행"
-            }
-        }
+        log.error("gpt.error", company=company, error=str(e))
+        return _failed_summary()
+
+async def _request_summary_async(aclient, company, user_prompt) -> Dict[str, Any]:
+    """OpenAI 요약 호출 + 파싱 (캐시는 호출하는 쪽에서 처리)"""
+    started = time.perf_counter()
+    resp = await aclient.chat.completions.create(
+        model=SUMMARY_MODEL,
+        messages=[{"role": "user", "content": user_prompt}],
+        temperature=SUMMARY_TEMPERATURE
+    )
+    # 지연 예산 판단용 (local_summary.budget) - 성공한 호출만
+    local_summary.budget.observe(time.perf_counter() - started)
+
+    log.debug("openai.summary", company=company, usage=getattr(resp, "usage", None), payload=resp, sample=PAYLOAD_SAMPLE)
+
+    content = resp.choices[0].message.content
+    return _parse_summary_content(content)
+
+# ---------------------------------------------------------
+# 배치 요약 (gpt_batch.py) - 여러 종목을 completion 한 번에
+# ---------------------------------------------------------
+SUMMARY_ITEM_SCHEMA = gpt_batch.item_schema(SUMMARY_SCHEMA)
+
+def _build_batch_prompt(entries: List[Dict[str, Any]]) -> str:
+    lines = "\n".join(json.dumps(e, ensure_ascii=False) for e in entries)
+    return f"""
+[요약 - 여러 종목]
+아래 [종목 목록]의 각 줄(JSON)은 한 종목의 id, company(회사명), roe(%), per(x), pbr(x), rpg_title, rpg_desc 이다.
+종목마다 다음 규칙으로 작성한다.
+규칙: 1. 회사명을 기반으로, ROE, PER, PBR을 분석하여 앞으로 이 회사에 어떻게 투자해야할지 조언하는 문장 2~3문장 필수로 출력하기 (investment_advice)
+     2. 회사명을 기반으로 해당 회사의 최근 뉴스나 이벤트를 반영하여 투자 전략을 2~3문장으로 필수로 제시하기 (recent_news_strategy)
+     3. rpg_title과 rpg_desc를 반영하여 이 회사가 rpg_title로서 어떻게 활동하고있는지 rpg_desc를 풀어서 1~2문장으로 필수로 설명하기 (rpg_title_desc)
+     4. 수치와 rpg_title을 반영하여 주의 1~2문장 (caution) / 장점 1~2문장 (advantage)
+
+[종목 목록]
+{lines}
+
+출력은 JSON만: {{"items": [{{"id": "<목록의 id 그대로>", "investment_advice": "...", "recent_news_strategy": "...", "rpg_title_desc": "...", "caution": "...", "advantage": "..."}}]}}
+목록의 모든 id 에 대해 빠짐없이 한 항목씩 출력.
+"""
+
+BATCH_PROMPT_TOKENS = gpt_batch.estimate_tokens(_build_batch_prompt([]))
+
+def _batch_entry(company, roe, per, pbr, rpg_title, rpg_desc) -> Dict[str, Any]:
+    """배치 프롬프트의 종목 한 줄 (단건 프롬프트·캐시 키와 같은 반올림)"""
+    roe, per, pbr = summary_cache.bucket(roe, per, pbr)
+    return {"company": company, "roe": roe, "per": per, "pbr": pbr, "rpg_title": rpg_title, "rpg_desc": rpg_desc}
+
+async def _request_summary_batch(entries: List[Dict[str, Any]], max_tokens: int):
+    """(응답 문자열, usage) - 검증·재시도는 gpt_batch 가 처리"""
+    resp = await _aopenai_client().chat.completions.create(
+        model=SUMMARY_MODEL,
+        messages=[{"role": "user", "content": _build_batch_prompt(entries)}],
+        temperature=SUMMARY_TEMPERATURE,
+        max_tokens=max_tokens,
+    )
+    usage = getattr(resp, "usage", None)
+    log.debug("openai.summary_batch", items=len(entries), usage=usage, payload=resp, sample=PAYLOAD_SAMPLE)
+    return resp.choices[0].message.content, usage
+
+@timed("gpt", source="batch")
+async def gpt_generate_many(items: List[tuple]) -> List[Dict[str, Any]]:
+    """
+    여러 종목 요약. items: (company, roe, per, pbr, rpg_title, rpg_desc) 목록, 결과는 같은 순서.
+    캐시에 있는 종목은 바로 쓰고, 나머지는 배치 completion 으로 만들어 단건 요약과 같은 키로 캐시에 넣는다.
+    재시도 후에도 검증을 통과하지 못한 종목은 _failed_summary().
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    jobs: Dict[str, Dict[str, Any]] = {}
+    owners: Dict[str, List[int]] = {}  # 캐시 키 → 결과 위치 (같은 종목이 여러 번 있으면 한 번만 생성)
+    for i, args in enumerate(items):
+        _, cache_key = _summary_request(*args)
+        cached_summary = await summary_cache.aget(cache_key)
+        if cached_summary is not None:
+            results[i] = _with_cache_info(cached_summary[0], True, cached_summary[1])
+            continue
+        if cache_key not in owners:
+            jobs[cache_key] = _batch_entry(*args)
+        owners.setdefault(cache_key, []).append(i)
+
+    if jobs and _aopenai_client() is None:
+        for idx in owners.values():
+            for i in idx:
+                results[i] = _offline_summary(items[i][0])
+    elif jobs:
+        ids = {str(n): key for n, key in enumerate(jobs)}
+        done = await gpt_batch.batcher.run(
+            {n: jobs[key] for n, key in ids.items()}, _request_summary_batch, _summary_from_raw,
+            SUMMARY_ITEM_SCHEMA, BATCH_PROMPT_TOKENS,
+        )
+        for n, key in ids.items():
+            summary = done.get(n)
+            if summary is not None:
+                await summary_cache.aput(key, summary)
+            for i in owners[key]:
+                results[i] = _with_cache_info(summary, False) if summary is not None else _failed_summary()
+    return results
+
+async def gpt_stream_async(company, roe, per, pbr, rpg_title, rpg_desc):
+    """
+    gpt_generate_async 의 스트리밍 버전 (OpenAI stream=True).
+    ("token", 텍스트 조각) / ("field", {name, value, done}) 을 내보내고 마지막에 ("summary", 요약) 을 낸다.
+    """
+    user_prompt, cache_key = _summary_request(company, roe, per, pbr, rpg_title, rpg_desc)
+    cached_summary = await summary_cache.aget(cache_key)
+    if cached_summary is not None:
+        yield "summary", _with_cache_info(cached_summary[0], True, cached_summary[1])
+        return
+
+    aclient = _aopenai_client()
+    if aclient is None:
+        yield "summary", _offline_summary(company)
+        return
+
+    deadline = time.monotonic() + STAGE_TIMEOUTS["gpt"]
+    fields = JSONFieldStream()
+    parts = []
+    stream = None
+    started = time.perf_counter()
+    try:
+        stream = await asyncio.wait_for(
+            aclient.chat.completions.create(
+                model=SUMMARY_MODEL,
+                messages=[{"role": "user", "content": user_prompt}],
+                temperature=SUMMARY_TEMPERATURE,
+                stream=True,
+            ),
+            timeout=STAGE_TIMEOUTS["gpt"],
+        )
+        chunks = stream.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(deadline - time.monotonic(), 0.01))
+            except StopAsyncIteration:
+                break
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            parts.append(delta)
+            yield "token", delta
+            for name, value, done in fields.feed(delta):
+                yield "field", {"name": name, "value": value, "done": done}
+        summary = _parse_summary_content("".join(parts))
+    except Exception as e:
+        log.error("gpt.stream_error", company=company, error=repr(e))
+        yield "summary", _failed_summary()
+        return
+    finally:
+        telemetry.STAGE_SECONDS.observe(time.perf_counter() - started, stage="gpt", source="stream")
+        if stream is not None:
+            await stream.close()
+
+    await summary_cache.aput(cache_key, summary)
+    yield "summary", _with_cache_info(summary, False)
 
 # =========================================================
 # 4) 엔드포인트
 # =========================================================
+def _build_analysis_response(company, ticker, per, pbr, roe, title, job, temper, desc, gpt, primary,
+                             rpg_mode="absolute", peer=None):
+    return {
+        "company": company,
+        "ticker": ticker,
+        "roe": roe, "per": per, "pbr": pbr,
+        "rpg": {"title": title, "job": job, "temper": temper, "description": desc},
+        "rpg_mode": rpg_mode,
+        "peers": peer,
+        "summary3": gpt["summary3"],
+        "insights": gpt["insights"],
+        "summary_cache": gpt.get("cache", {"hit": False, "age": None}),
+        "summary_tier": _summary_tier(gpt),
+        "source": {
+            "primary": primary,
+            "as_of": datetime.datetime.now().astimezone().isoformat(timespec="seconds")
+        }
+    }
+
+def _summary_tier(gpt: Dict[str, Any]) -> str:
+    """gpt(새로 생성) / cache / local(템플릿) / offline / failed"""
+    return gpt.get("tier") or ("cache" if gpt.get("cache", {}).get("hit") else "gpt")
+
+# 지연 예산 (local_summary.py) - 요청 시작부터 deadline 까지 GPT 요약을 못 받으면 템플릿 요약
+_budget_env = os.getenv("LATENCY_BUDGET_MS")
+LATENCY_BUDGET_MS = int(_budget_env) if _budget_env else None
+BUDGET_QUERY = Query(None, ge=0, le=60000,
+                     description="응답 지연 예산(ms). GPT 요약이 예산 안에 끝나지 않으면 템플릿 요약 (기본 LATENCY_BUDGET_MS)")
+
+def _deadline(budget_ms: Optional[int]) -> Optional[float]:
+    ms = budget_ms if budget_ms is not None else LATENCY_BUDGET_MS
+    return None if ms is None else time.perf_counter() + ms / 1000
+
+async def _summary_within(deadline: Optional[float], company, roe, per, pbr, rpg_title, rpg_desc, peer=None):
+    """
+    deadline(perf_counter 기준)까지 GPT 요약. deadline 이 없거나 요약 캐시에 있거나 API 키가 없으면 기존 경로 그대로.
+    남은 시간이 GPT 예상 지연보다 짧으면 바로, 기다리다 deadline 을 넘기면 그 시점에 템플릿 요약으로 응답하고
+    GPT 호출은 백그라운드에서 끝까지 돌려 요약 캐시를 채운다 (다음 요청은 cache).
+    """
+    args = (company, roe, per, pbr, rpg_title, rpg_desc)
+    if deadline is None or _aopenai_client() is None or await summary_cache.apeek(_summary_request(*args)[1]) is not None:
+        gpt = await _with_timeout("gpt", gpt_generate_async(*args), default=_failed_summary())
+    else:
+        remaining = deadline - time.perf_counter()
+        if remaining < local_summary.budget.estimate():
+            local_summary.budget.count("skipped_gpt")
+            with rate_governor.priority(rate_governor.BACKGROUND):
+                local_summary.budget.background(asyncio.ensure_future(
+                    _with_timeout("gpt", gpt_generate_async(*args), default=_failed_summary())
+                ))
+            gpt = None
+        else:
+            gpt = await local_summary.budget.wait(asyncio.ensure_future(
+                _with_timeout("gpt", gpt_generate_async(*args), default=_failed_summary())
+            ), remaining)
+        if gpt is None or _summary_tier(gpt) == "failed":
+            gpt = local_summary.build(*args, peer=peer)
+    local_summary.budget.count("tier_" + _summary_tier(gpt))
+    return gpt
+
+RPG_MODE = os.getenv("RPG_MODE", "absolute")
+RPG_MODE_QUERY = Query(None, pattern="^(absolute|relative)$",
+                       description="absolute(고정 기준값) / relative(업종 중앙값 기준). 기본 RPG_MODE")
+
+def _classify(symbol: str, roe, per, pbr, mode: Optional[str]):
+    """
+    (title, job, temper, desc, 적용된 모드, 업종 백분위).
+    relative 는 업종(부족하면 시장) 중앙값을 기준값으로 분류 - 비교 그룹이 없는 종목(해외 등)은 absolute 로
+    """
+    peer = peers.percentiles(symbol, (per, pbr, roe))
+    thresholds = peers.thresholds(symbol) if (mode or RPG_MODE) == "relative" else None
+    rpg = classify_rpg(roe, per, pbr, thresholds)
+    return (*rpg, "absolute" if thresholds is None else "relative", peer)
+
+def _start_kr_prefetch(name: str) -> Optional[asyncio.Task]:
+    """6자리 코드는 티커 검색 결과를 기다리지 않고 네이버 지표를 미리 받아 둔다"""
+    if not _looks_like_kr_code(name):
+        return None
+    return asyncio.create_task(
+        _with_timeout("metrics", get_metrics_from_naver_finance_async(name), default=(None, None, None))
+    )
+
+async def _metrics_for_resolved(name: str, symbol: str, prefetch: Optional[asyncio.Task]):
+    """티커 해석 결과가 미리 받은 코드와 같으면 prefetch 결과를, 아니면 새로 조회"""
+    if prefetch is not None and symbol.split(".")[0] == name.strip() and symbol.endswith((".KS", ".KQ")):
+        return await prefetch
+    if prefetch is not None:
+        prefetch.cancel()
+    return await _with_timeout("metrics", get_metrics_from_finnhub_async(symbol), default=(None, None, None))
+
+METRICS_MISSING_DETAIL = "지표 조회에 실패했습니다. 티커는 확인되었으나 지표 데이터가 부족합니다."
+
 @app.get("/api/analyze_by_name")
-def analyze_by_name(name: str = Query(..., description="회사명(한글/영문) 또는 6자리 코드")):
+async def analyze_by_name(name: str = Query(..., description="회사명(한글/영문) 또는 6자리 코드"),
+                          rpg_mode: Optional[str] = RPG_MODE_QUERY, budget_ms: Optional[int] = BUDGET_QUERY):
+    deadline = _deadline(budget_ms)
+    prefetch = None
     try:
-        print(f"Received request for name: {name}")
-        resolved = resolve_kr_ticker(name)
-        print(f"Resolved ticker: {resolved}")
+        log.info("analyze.request", name=name)
+
+        prefetch = _start_kr_prefetch(name)
+
+        resolved = await resolve_kr_ticker_async(name)
+        log.debug("analyze.resolved", name=name, symbol=resolved["symbol"])
         symbol = resolved["symbol"]
         display_name = resolved["name"]
+        prefetcher.record(symbol, display_name)
 
-        per, pbr, roe = get_metrics_from_finnhub(symbol)
-        print(f"Metrics - PER: {per}, PBR: {pbr}, ROE: {roe}")
-        title, job, temper, desc = classify_rpg(roe, per, pbr)
-        gpt = gpt_generate(display_name, roe, per, pbr, title, desc)
+        per, pbr, roe = await _metrics_for_resolved(name, symbol, prefetch)
+        prefetch = None
+        log.debug("analyze.metrics", per=per, pbr=pbr, roe=roe)
 
         if all(v is None for v in [roe, per, pbr]):
-            raise HTTPException(status_code=502, detail="지표 조회에 실패했습니다. 티커는 확인되었으나 지표 데이터가 부족합니다.")
+            raise HTTPException(status_code=502, detail=METRICS_MISSING_DETAIL)
 
-        response_data = {
-            "company": display_name,
-            "ticker": symbol,
-            "roe": roe, "per": per, "pbr": pbr,
-            "rpg": {"title": title, "job": job, "temper": temper, "description": desc},
-            "summary3": gpt["summary3"],
-            "insights": gpt["insights"],
-            "source": {
-                "primary": "Finnhub (/search, /stock/metric)",
-                "as_of": datetime.datetime.now().astimezone().isoformat(timespec="seconds")
-            }
-        }
-        print(f"Response data: {response_data}")
+        title, job, temper, desc, mode, peer = _classify(symbol, roe, per, pbr, rpg_mode)
+        gpt = await _summary_within(deadline, display_name, roe, per, pbr, title, desc, peer)
+
+        response_data = _build_analysis_response(
+            display_name, symbol, per, pbr, roe, title, job, temper, desc, gpt,
+            "Finnhub (/search, /stock/metric)", mode, peer
+        )
+        log.debug("analyze.response", payload=response_data, sample=PAYLOAD_SAMPLE)
         return response_data
     except HTTPException as e:
-        print(f"HTTPException in analyze_by_name: {e.detail}")
+        log.info("analyze.http_error", name=name, status=e.status_code, detail=e.detail)
         raise
     except Exception as e:
-        print(f"Unhandled exception in analyze_by_name: {e}")
+        log.error("analyze.error", name=name, error=str(e), exc_info=True)
         raise HTTPException(status_code=500, detail="분석 중 오류가 발생했습니다.")
+    finally:
+        if prefetch is not None:
+            prefetch.cancel()
 
 @app.get("/api/analyze")
-def analyze(ticker: str, company: Optional[str] = None):
+async def analyze(ticker: str, company: Optional[str] = None, rpg_mode: Optional[str] = RPG_MODE_QUERY,
+                  budget_ms: Optional[int] = BUDGET_QUERY):
+    deadline = _deadline(budget_ms)
     try:
-        per, pbr, roe = get_metrics_from_finnhub(ticker)
-        title, job, temper, desc = classify_rpg(roe, per, pbr)
-        gpt = gpt_generate(company or ticker, roe, per, pbr, title, desc)
+        per, pbr, roe = await _with_timeout(
+            "metrics", get_metrics_from_finnhub_async(ticker), default=(None, None, None)
+        )
+        title, job, temper, desc, mode, peer = _classify(ticker, roe, per, pbr, rpg_mode)
+        gpt = await _summary_within(deadline, company or ticker, roe, per, pbr, title, desc, peer)
+
+        return _build_analysis_response(
+            company or ticker, ticker, per, pbr, roe, title, job, temper, desc, gpt,
+            "Finnhub (/stock/metric)", mode, peer
+        )
+    except Exception as e:
+        log.error("analyze.error", ticker=ticker, error=str(e), exc_info=True)
+        raise HTTPException(status_code=500, detail="분석 중 오류가 발생했습니다.")
 
-        return {
-            "company": company or ticker,
-            "ticker": ticker,
+# ---------------------------------------------------------
+# 스트리밍 분석 (SSE) - 티커 → 지표/RPG → GPT 토큰/필드 → 최종 응답 순으로 전송
+# ---------------------------------------------------------
+async def _analysis_events(company: Optional[str], ticker: Optional[str], name: Optional[str], primary: str,
+                           rpg_mode: Optional[str] = None):
+    """
+    이벤트 순서: ticker → metrics → (token / field)* → done
+    실패 시 error {status, detail} 후 종료 (HTTP 상태는 이미 200 으로 나간 뒤)
+    """
+    prefetch = None
+    try:
+        if name is not None:
+            prefetch = _start_kr_prefetch(name)
+            resolved = await resolve_kr_ticker_async(name)
+            ticker, company = resolved["symbol"], resolved["name"]
+            prefetcher.record(ticker, company)
+        company = company or ticker
+        yield sse_event("ticker", {"company": company, "ticker": ticker})
+
+        if name is not None:
+            per, pbr, roe = await _metrics_for_resolved(name, ticker, prefetch)
+            prefetch = None
+            if all(v is None for v in [roe, per, pbr]):
+                raise HTTPException(status_code=502, detail=METRICS_MISSING_DETAIL)
+        else:
+            per, pbr, roe = await _with_timeout(
+                "metrics", get_metrics_from_finnhub_async(ticker), default=(None, None, None)
+            )
+        title, job, temper, desc, mode, peer = _classify(ticker, roe, per, pbr, rpg_mode)
+        yield sse_event("metrics", {
             "roe": roe, "per": per, "pbr": pbr,
             "rpg": {"title": title, "job": job, "temper": temper, "description": desc},
-            "summary3": gpt["summary3"],
-            "insights": gpt["insights"],
-            "source": {
-                "primary": "Finnhub (/stock/metric)",
-                "as_of": datetime.datetime.now().astimezone().isoformat(timespec="seconds")
-            }
-        }
+            "rpg_mode": mode, "peers": peer,
+        })
+
+        gpt = _failed_summary()
+        async for kind, payload in gpt_stream_async(company, roe, per, pbr, title, desc):
+            if kind == "summary":
+                gpt = payload
+            elif kind == "token":
+                yield sse_event("token", {"text": payload})
+            else:
+                yield sse_event("field", payload)
+
+        yield sse_event("done", _build_analysis_response(
+            company, ticker, per, pbr, roe, title, job, temper, desc, gpt, primary, mode, peer
+        ))
+    except HTTPException as e:
+        yield sse_event("error", {"status": e.status_code, "detail": e.detail})
     except Exception as e:
-        print(f"Error in analyze: {e}")
-        raise HTTPException(status_code=500, detail="분석 중 오류가 발생했습니다.")
+        log.error("analyze.stream_error", error=str(e), exc_info=True)
+        yield sse_event("error", {"status": 500, "detail": "분석 중 오류가 발생했습니다."})
+    finally:
+        if prefetch is not None:
+            prefetch.cancel()
+
+@app.get("/api/analyze_by_name/stream")
+async def analyze_by_name_stream(name: str = Query(..., description="회사명(한글/영문) 또는 6자리 코드"),
+                                 rpg_mode: Optional[str] = RPG_MODE_QUERY):
+    """analyze_by_name 의 SSE 버전 - 지표는 조회되는 즉시, GPT 요약은 생성되는 대로 전송"""
+    return StreamingResponse(
+        _analysis_events(None, None, name, "Finnhub (/search, /stock/metric)", rpg_mode),
+        media_type="text/event-stream", headers=SSE_HEADERS,
+    )
+
+@app.get("/api/analyze/stream")
+async def analyze_stream(ticker: str, company: Optional[str] = None, rpg_mode: Optional[str] = RPG_MODE_QUERY):
+    """analyze 의 SSE 버전"""
+    return StreamingResponse(
+        _analysis_events(company, ticker, None, "Finnhub (/stock/metric)", rpg_mode),
+        media_type="text/event-stream", headers=SSE_HEADERS,
+    )
+
+# ---------------------------------------------------------
+# 배치 분석 (워치리스트/포트폴리오)
+# ---------------------------------------------------------
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+
+class BatchAnalyzeRequest(BaseModel):
+    items: List[str] = Field(..., description="티커 또는 회사명(한글/영문)/6자리 코드 목록")
+    summarize: bool = Field(False, description="종목별 GPT 요약 포함 여부")
+    concurrency: Optional[int] = Field(None, ge=1, le=64, description="동시 조회 수 (기본 BATCH_CONCURRENCY)")
+
+def _batch_error(query: str, status: int, detail: str) -> Dict[str, Any]:
+    return {"query": query, "ok": False, "error": {"status": status, "detail": detail}}
+
+async def _fetch_batch_item(query: str, sem: asyncio.Semaphore) -> Dict[str, Any]:
+    """티커 해석 + 지표 조회 (분류/요약 전 단계). 실패는 예외 대신 에러 항목으로 돌려준다"""
+    async with sem:
+        try:
+            resolved = await resolve_kr_ticker_async(query)
+            per, pbr, roe = await _with_timeout(
+                "metrics", get_metrics_from_finnhub_async(resolved["symbol"]), default=(None, None, None)
+            )
+        except HTTPException as e:
+            return _batch_error(query, e.status_code, e.detail)
+        except Exception as e:
+            log.warning("batch.item_error", query=query, error=str(e))
+            return _batch_error(query, 500, "분석 중 오류가 발생했습니다.")
+    if all(v is None for v in [roe, per, pbr]):
+        return _batch_error(query, 502, "지표 조회에 실패했습니다.")
+    return {"query": query, "ok": True, "company": resolved["name"], "ticker": resolved["symbol"],
+            "roe": roe, "per": per, "pbr": pbr}
+
+def _apply_rpg(item: Dict[str, Any], rpg: tuple) -> None:
+    title, job, temper, desc = rpg
+    item["rpg"] = {"title": title, "job": job, "temper": temper, "description": desc}
+
+def _summary_args(item: Dict[str, Any]) -> tuple:
+    rpg = item["rpg"]
+    return item["company"], item["roe"], item["per"], item["pbr"], rpg["title"], rpg["description"]
+
+async def _summarize_batch_item(item: Dict[str, Any], sem: asyncio.Semaphore) -> None:
+    async with sem:
+        gpt = await _with_timeout("gpt", gpt_generate_async(*_summary_args(item)), default=_failed_summary())
+    _apply_summary(item, gpt)
+
+def _apply_summary(item: Dict[str, Any], gpt: Dict[str, Any]) -> None:
+    item["summary3"] = gpt["summary3"]
+    item["insights"] = gpt["insights"]
+    item["summary_cache"] = gpt.get("cache", {"hit": False, "age": None})
+
+def _validate_batch(req: BatchAnalyzeRequest) -> List[str]:
+    items = [s.strip() for s in req.items if s and s.strip()]
+    if not items:
+        raise HTTPException(status_code=400, detail="items 가 비어 있습니다.")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"한 번에 최대 {BATCH_MAX_ITEMS}개까지 분석할 수 있습니다.")
+    return items
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(req: BatchAnalyzeRequest):
+    """여러 종목을 한 번에 분석. 일부 실패는 항목별 error 로 돌려주고 전체 요청은 성공"""
+    items = _validate_batch(req)
+    sem = asyncio.Semaphore(req.concurrency or BATCH_CONCURRENCY)
+
+    with rate_governor.priority(rate_governor.BATCH):
+        results = await asyncio.gather(*[_fetch_batch_item(q, sem) for q in items])
+    ok = [r for r in results if r["ok"]]
+
+    # 지표가 모인 뒤 전체를 한 번에 분류
+    for item, rpg in zip(ok, classify_rpg_many([r["roe"] for r in ok], [r["per"] for r in ok], [r["pbr"] for r in ok])):
+        _apply_rpg(item, rpg)
+
+    if req.summarize and ok:
+        with rate_governor.priority(rate_governor.BATCH):
+            if gpt_batch.batcher.max_items > 1:
+                # 여러 종목을 completion 한 번에 (지시문 반복 없이) - gpt_batch.py
+                for item, gpt in zip(ok, await gpt_generate_many([_summary_args(r) for r in ok])):
+                    _apply_summary(item, gpt)
+            else:
+                await asyncio.gather(*[_summarize_batch_item(r, sem) for r in ok])
+
+    return {
+        "count": len(results),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "results": results,
+        "as_of": datetime.datetime.now().astimezone().isoformat(timespec="seconds"),
+    }
+
+@app.post("/api/analyze/batch/stream")
+async def analyze_batch_stream(req: BatchAnalyzeRequest):
+    """배치 분석 스트리밍 버전 - 종목이 끝나는 순서대로 NDJSON 한 줄씩 전송"""
+    items = _validate_batch(req)
+    sem = asyncio.Semaphore(req.concurrency or BATCH_CONCURRENCY)
+
+    async def run_one(q: str) -> Dict[str, Any]:
+        item = await _fetch_batch_item(q, sem)
+        if item["ok"]:
+            _apply_rpg(item, classify_rpg(item["roe"], item["per"], item["pbr"]))
+            if req.summarize:
+                await _summarize_batch_item(item, sem)
+        return item
+
+    async def lines():
+        with rate_governor.priority(rate_governor.BATCH):
+            tasks = [asyncio.ensure_future(run_one(q)) for q in items]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                yield json.dumps(await fut, ensure_ascii=False) + "\n"
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+# ---------------------------------------------------------
+# 스크리너 (screener.py) - 전 종목 스냅샷에서 필터/정렬/페이지
+# ---------------------------------------------------------
+def _screener_universe() -> List[Dict[str, Any]]:
+    """종목 인덱스의 KRX(.KS/.KQ) 종목 전체 (일괄 수집 시에는 목록에 없는 종목만 종목별로 조회)"""
+    return [
+        {"symbol": e.symbol, "code": e.code, "name": e.name_ko, "market": e.market, "sector": e.sector}
+        for e in symbol_index.index.entries if e.market in ("KS", "KQ")
+    ]
+
+async def _screener_fetch(symbol: str):
+    # 스냅샷 갱신은 사용자 요청보다 뒤에 업스트림 토큰을 받는다
+    with rate_governor.priority(rate_governor.BACKGROUND):
+        return await _with_timeout("metrics", get_metrics_from_finnhub_async(symbol), default=(None, None, None))
+
+SCREENER_BULK = os.getenv("SCREENER_BULK", "naver").lower() not in ("off", "0", "none", "")
+
+async def _screener_bulk() -> List[Dict[str, Any]]:
+    """
+    네이버 시가총액 목록으로 KRX 전 종목(코드·이름·시장·지표)을 한 번에 받아 스크리너 행으로 (naver_listing.py).
+    섹터는 네이버 업종(naver_listing 업종 매핑)이고, 매핑에 없는 종목만 종목 인덱스의 업종을 쓴다.
+    종목 인덱스는 그 밖에 심볼 표기에만 쓴다. 목록에 빠진 값은 인덱스 종목만 종목별 경로로 채우고,
+    목록 값만으로 완전한 종목은 지표 캐시에도 넣는다.
+    """
+    indexed = {x["code"]: x for x in _screener_universe()}
+    with rate_governor.priority(rate_governor.BACKGROUND):
+        df = await naver_listing.listing.ingest(pools.aclient("naver"), fill=get_metrics_from_naver_finance_async,
+                                                fill_codes=indexed)
+    rows, seen = [], set()
+    for code, name, market, per, pbr, roe, industry, source in zip(df["code"], df["name"], df["market"], df["per"],
+                                                                   df["pbr"], df["roe"], df["industry"], df["source"]):
+        if code in seen:  # 수집 중 순위가 바뀌면 같은 종목이 두 페이지에 나올 수 있다
+            continue
+        seen.add(code)
+        values = tuple(None if v != v else float(v) for v in (per, pbr, roe))
+        if source == "listing":
+            await metric_cache.aput("naver", code, values)
+        entry = indexed.get(code)
+        rows.append({
+            "symbol": entry["symbol"] if entry else f"{code}.{market}",
+            "code": code,
+            "name": name or (entry["name"] if entry else ""),
+            "market": market,
+            "sector": industry or (entry["sector"] if entry else ""),
+            "per": values[0], "pbr": values[1], "roe": values[2],
+        })
+    return rows
+
+# ---------------------------------------------------------
+# 캐시 워밍 (prefetch.py) - 시드 목록 / 인기 종목의 지표·요약을 만료 전에 갱신
+# ---------------------------------------------------------
+PREFETCH_SEED = os.getenv("PREFETCH_SEED", "kospi200")
+PREFETCH_SEED_WAIT_SEC = float(os.getenv("PREFETCH_SEED_WAIT_SEC", "180"))
+
+def _metric_target(symbol: str):
+    """get_metrics_from_finnhub_async 와 같은 라우팅: (캐시 소스, 캐시 키, 캐시를 거치지 않는 조회 함수)"""
+    if symbol.endswith((".KS", ".KQ")):
+        itemcode = symbol.split(".")[0]
+        return "naver", itemcode, lambda: _fetch_naver_metrics_async(itemcode)
+    return "finnhub", symbol, lambda: _fetch_finnhub_metrics_async(symbol)
+
+async def _preset_seeds(preset: str, market: str, n: int) -> List[tuple]:
+    """
+    시장 시가총액 상위 n 종목. 네이버 목록으로 만든 스크리너 스냅샷(KRX 전체, 시가총액 순)이 있으면 거기서,
+    없으면 종목 인덱스의 해당 시장 종목 (인덱스 파일에 있는 만큼만 - 모자라면 경고)
+    """
+    if SCREENER_BULK and SCREENER_REFRESH_SEC > 0:
+        # 기동 직후에는 첫 스냅샷을 잠시 기다린다
+        deadline = time.monotonic() + PREFETCH_SEED_WAIT_SEC
+        while screener.snapshot is None and time.monotonic() < deadline:
+            await asyncio.sleep(1.0)
+    snap = screener.snapshot
+    if snap is not None and screener.last_bulk and screener.last_bulk["rows"]:
+        idx = np.flatnonzero(snap.market == market)[:n]
+        targets, origin = [(str(snap.symbol[i]), str(snap.name[i])) for i in idx], "listing"
+    else:
+        entries = [e for e in symbol_index.index.entries if e.market == market][:n]
+        targets, origin = [(e.symbol, e.display_name) for e in entries], "symbol_index"
+    if len(targets) < n:
+        log.warning("prefetch.seed_short", preset=preset, origin=origin, wanted=n, found=len(targets))
+    return targets
+
+async def _prefetch_seeds() -> List[tuple]:
+    """PREFETCH_SEED: kospi200 / kosdaq150 (시가총액 상위, _preset_seeds), 쉼표로 구분한 이름 목록, @파일 경로 (한 줄에 하나)"""
+    spec = PREFETCH_SEED.strip()
+    presets = {"kospi200": ("KS", 200), "kosdaq150": ("KQ", 150)}
+    if not spec or spec.lower() in ("off", "none", "0"):
+        return []
+    if spec.lower() in presets:
+        return await _preset_seeds(spec.lower(), *presets[spec.lower()])
+
+    if spec.startswith("@"):
+        with open(spec[1:], encoding="utf-8") as f:
+            names = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    else:
+        names = [n.strip() for n in spec.split(",") if n.strip()]
+    targets = []
+    with rate_governor.priority(rate_governor.BACKGROUND):
+        for name in names:
+            try:
+                resolved = await resolve_kr_ticker_async(name)
+            except HTTPException as e:
+                log.warning("prefetch.seed_unresolved", name=name, detail=e.detail)
+                continue
+            targets.append((resolved["symbol"], resolved["name"]))
+    return targets
+
+async def _prefetch_one(symbol: str, name: str) -> str:
+    """지표 → RPG → 요약 순으로, 없거나 곧 만료될 항목만 다시 채운다.
+    결과: fresh(할 일 없음) / metrics / summary / metrics+summary / empty(지표 없음) / circuit_open / gpt_budget"""
+    source, key, fetch = _metric_target(symbol)
+    if breakers["naver_json" if source == "naver" else "finnhub"].state != "closed":
+        return "circuit_open"
+
+    refreshed = []
+    cached = await metric_cache.apeek(source, key)
+    values = cached[0] if cached else None
+    if prefetcher.due(cached[1] if cached else None, metric_cache.ttls.get(source, 3600.0)):
+        fresh = await _with_timeout("metrics", metric_cache.arefresh(source, key, fetch))
+        if fresh is not None and any(v is not None for v in fresh):
+            values = fresh
+            refreshed.append("metrics")
+    if values is None or all(v is None for v in values):
+        return "empty"
+
+    per, pbr, roe = values
+    title, _, _, desc = _classify_rpg(roe, per, pbr)
+    prompt, cache_key = _summary_request(name, roe, per, pbr, title, desc)
+    cached_summary = await summary_cache.apeek(cache_key)
+    aclient = _aopenai_client()
+    if aclient is not None and prefetcher.due(cached_summary[1] if cached_summary else None, summary_cache.ttl):
+        if not prefetcher.take_gpt():
+            return "+".join(refreshed + ["gpt_budget"])
+        summary = await _with_timeout("gpt", _request_summary_async(aclient, name, prompt))
+        if summary is None:
+            return "error"
+        await summary_cache.aput(cache_key, summary)
+        refreshed.append("summary")
+    return "+".join(refreshed) or "fresh"
+
+@app.get("/api/screener")
+def screen(
+    market: Optional[str] = Query(None, description="KS / KQ"),
+    sector: Optional[str] = Query(None),
+    title: Optional[str] = Query(None, description="RPG 분류 (예: 수호 전사)"),
+    job: Optional[str] = Query(None),
+    temper: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, description="종목명/심볼 부분 일치"),
+    per_min: Optional[float] = None, per_max: Optional[float] = None,
+    pbr_min: Optional[float] = None, pbr_max: Optional[float] = None,
+    roe_min: Optional[float] = None, roe_max: Optional[float] = None,
+    sort: str = Query("rank", description="rank(시가총액 순) / name / per / pbr / roe"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+):
+    """미리 만든 스냅샷에서만 응답 (업스트림 호출 없음). 지표 결측 종목은 정렬 시 항상 뒤"""
+    snap = screener.snapshot
+    if snap is None:
+        raise HTTPException(status_code=503, detail="스크리너 데이터를 준비 중입니다. 잠시 후 다시 시도해 주세요.")
+    if sort not in SCREENER_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort 는 {', '.join(SCREENER_SORT_KEYS)} 중 하나여야 합니다.")
+
+    filters = {
+        "market": market.upper() if market else None, "sector": sector, "title": title, "job": job,
+        "temper": temper, "q": q,
+        "per_min": per_min, "per_max": per_max, "pbr_min": pbr_min, "pbr_max": pbr_max,
+        "roe_min": roe_min, "roe_max": roe_max,
+    }
+    total, items = snap.query(filters, sort, order == "desc", (page - 1) * page_size, page_size)
+    return {
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "items": items,
+        "snapshot": snap.info(),
+    }
+
+# ---------------------------------------------------------
+# 지표 이력 (history_store.py)
+# ---------------------------------------------------------
+def _history_key(ticker: str):
+    """티커/6자리 코드 → 지표 캐시와 같은 (소스, 키)"""
+    t = ticker.strip().upper()
+    if _looks_like_kr_code(t):
+        t += ".KS"
+    source, key, _ = _metric_target(t)
+    return source, key
+
+def _iso(ts: float) -> str:
+    return datetime.datetime.fromtimestamp(ts).astimezone().isoformat(timespec="seconds")
+
+def _trend(values: np.ndarray) -> Dict[str, Any]:
+    valid = values[~np.isnan(values)]
+    if not valid.size:
+        return {"first": None, "last": None, "change": None, "min": None, "max": None}
+    first, last = float(valid[0]), float(valid[-1])
+    return {
+        "first": round(first, 4), "last": round(last, 4), "change": round(last - first, 4),
+        "min": round(float(valid.min()), 4), "max": round(float(valid.max()), 4),
+    }
+
+@app.get("/api/history")
+def metric_history(
+    ticker: str = Query(..., description="티커 (005930.KS, AAPL) 또는 6자리 코드"),
+    days: int = Query(90, ge=1, le=3650),
+    resolution: str = Query("raw", pattern="^(raw|day)$", description="raw(수집된 모든 점) / day(하루 마지막 값)"),
+):
+    """저장된 PER/PBR/ROE 시계열과 RPG 분류 변화"""
+    if history is None:
+        raise HTTPException(status_code=503, detail="지표 이력 저장이 꺼져 있습니다. (HISTORY_DIR)")
+    source, key = _history_key(ticker)
+    end = time.time()
+    rows = history.query(source, key, start=end - days * 86400, end=end)
+    if not len(rows):
+        raise HTTPException(status_code=404, detail="해당 종목의 지표 이력이 없습니다.")
+    if resolution == "day":
+        day = (rows["ts"] // 86400).astype(np.int64)
+        rows = rows[np.r_[day[1:] != day[:-1], True]]
+
+    # float32 로 저장된 값이라 소수 4자리로 반올림해 내보낸다
+    cols = {c: np.round(rows[c].astype(np.float64), 4) for c in ("per", "pbr", "roe")}
+    rpg = classify_arrays(cols["roe"], cols["per"], cols["pbr"])
+    titles = rpg["title"]
+    changed = np.flatnonzero(titles[1:] != titles[:-1]) + 1
+    ts = rows["ts"]
+    points = [
+        {
+            "as_of": _iso(ts[i]),
+            "per": _to_float(cols["per"][i]), "pbr": _to_float(cols["pbr"][i]), "roe": _to_float(cols["roe"][i]),
+            "rpg": {"title": str(titles[i]), "job": str(rpg["job"][i]), "temper": str(rpg["temper"][i])},
+        }
+        for i in range(len(rows))
+    ]
+    return {
+        "ticker": ticker,
+        "source": source,
+        "resolution": resolution,
+        "count": len(points),
+        "from": points[0]["as_of"],
+        "to": points[-1]["as_of"],
+        "points": points,
+        "rpg_changes": [
+            {"as_of": _iso(ts[i]), "from": str(titles[i - 1]), "to": str(titles[i])} for i in changed
+        ],
+        "trend": {c: _trend(v) for c, v in cols.items()},
+    }
+
+# ---------------------------------------------------------
+# 일괄 내보내기 (export.py) - 스냅샷/이력을 Arrow·Parquet·gzip CSV 로 스트리밍
+# ---------------------------------------------------------
+SNAPSHOT_EXPORT_COLUMNS = ("symbol", "code", "name", "market", "sector", "per", "pbr", "roe", "title", "job", "temper")
+HISTORY_EXPORT_COLUMNS = ("as_of", "symbol", "source", "per", "pbr", "roe", "title")
+
+def _split_param(value: Optional[str]) -> Optional[List[str]]:
+    """쉼표로 구분한 쿼리 값 → 목록 (없으면 None)"""
+    if value is None:
+        return None
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+def _history_export_chunks(rows_iter, names: List[str]):
+    """이력 레코드 chunk → 컬럼 배열 chunk (float32 값은 /api/history 와 같이 소수 4자리)"""
+    empty = True
+    for rows in rows_iter:
+        empty = False
+        values = {c: np.round(rows[c].astype(np.float64), 4) for c in ("per", "pbr", "roe")}
+        cols = {
+            "as_of": (rows["ts"] * 1000).astype("datetime64[ms]"),
+            "symbol": np.char.decode(rows["symbol"], "ascii"),
+            "source": np.char.decode(rows["source"], "ascii"),
+            **values,
+        }
+        if "title" in names:
+            cols["title"] = classify_arrays(values["roe"], values["per"], values["pbr"])["title"].astype(np.str_)
+        yield {n: cols[n] for n in names}
+    if empty:
+        yield from _history_export_chunks([np.empty(0, dtype=history_store.ROW)], names)
+
+def _history_export_keys(tickers: Optional[List[str]], sectors: Optional[List[str]],
+                         markets: Optional[List[str]]) -> Optional[set]:
+    """이력 저장 키(네이버 6자리 코드 / Finnhub 티커) 집합. 조건이 없으면 None (전 종목)"""
+    keys = None
+    if tickers is not None:
+        keys = {_history_key(t)[1] for t in tickers}
+    if sectors is not None or markets is not None:
+        chosen = {
+            _metric_target(e.symbol)[1] for e in symbol_index.index.entries
+            if (sectors is None or e.sector in sectors) and (markets is None or e.market in markets)
+        }
+        keys = chosen if keys is None else keys & chosen
+    return keys
+
+@app.get("/api/export")
+def export_data(
+    dataset: str = Query("snapshot", pattern="^(snapshot|history)$", description="snapshot(스크리너 스냅샷) / history(지표 이력)"),
+    fmt: str = Query("csv", alias="format", pattern="^(arrow|parquet|csv)$",
+                     description="arrow(IPC 스트림) / parquet / csv(gzip)"),
+    columns: Optional[str] = Query(None, description="쉼표로 구분한 컬럼 (기본 전체)"),
+    tickers: Optional[str] = Query(None, description="쉼표로 구분한 티커 또는 6자리 코드"),
+    sector: Optional[str] = Query(None, description="쉼표로 구분한 섹터"),
+    market: Optional[str] = Query(None, description="KS / KQ (쉼표로 여러 개)"),
+    days: int = Query(30, ge=1, le=3650, description="history: 최근 N일"),
+):
+    """현재 스냅샷(또는 이력)을 chunk 단위로 인코딩해 스트리밍 - 행 수와 무관하게 메모리 사용 일정"""
+    if not export.available(fmt):
+        raise HTTPException(status_code=501, detail=f"{fmt} 형식은 pyarrow 가 설치되어 있어야 합니다. (pip install pyarrow)")
+    allowed = SNAPSHOT_EXPORT_COLUMNS if dataset == "snapshot" else HISTORY_EXPORT_COLUMNS
+    names = _split_param(columns) or list(allowed)
+    unknown = [n for n in names if n not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"알 수 없는 컬럼: {', '.join(unknown)} (가능: {', '.join(allowed)})")
+    names = list(dict.fromkeys(names))
+    tickers_list, sectors = _split_param(tickers), _split_param(sector)
+    markets = [m.upper() for m in _split_param(market)] if market else None
+
+    if dataset == "snapshot":
+        snap = screener.snapshot
+        if snap is None:
+            raise HTTPException(status_code=503, detail="스크리너 데이터를 준비 중입니다. 잠시 후 다시 시도해 주세요.")
+        symbols = [t.upper() for t in tickers_list] if tickers_list is not None else None
+        rows = snap.select(symbols, sectors, markets)
+        chunks = export.take(snap.columns(), rows, names, exporter.chunk_rows)
+        stamp = snap.built_at
+    else:
+        if history is None:
+            raise HTTPException(status_code=503, detail="지표 이력 저장이 꺼져 있습니다. (HISTORY_DIR)")
+        keys = _history_export_keys(tickers_list, sectors, markets)
+        end = time.time()
+        chunks = _history_export_chunks(
+            history.iter_chunks(start=end - days * 86400, end=end, symbols=keys, chunk_rows=exporter.chunk_rows), names
+        )
+        stamp = end
+
+    media_type, ext = export.FORMATS[fmt]
+    filename = f"{dataset}-{datetime.datetime.fromtimestamp(stamp).strftime('%Y%m%d-%H%M%S')}.{ext}"
+    return StreamingResponse(
+        exporter.stream(fmt, chunks, dataset), media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """캐시 적중/미스 카운터 (eviction 튜닝용)"""
+    return {
+        "metrics": metric_cache.stats(),
+        "search": {"size": len(cache), "maxsize": cache.maxsize, "ttl": cache.ttl},
+        "singleflight": singleflight.stats(),
+        "screener": screener.status(),
+        "peers": peers.stats(),
+        "prefetch": prefetcher.stats(),
+        "history": history.stats() if history is not None else None,
+        "summary": summary_cache.stats(),
+        "gpt_batch": gpt_batch.batcher.stats(),
+        "summary_budget": local_summary.budget.stats(),
+        "shared": shared_state.stats(),
+        "naver_html": naver_html.stats(),
+        "naver_listing": naver_listing.listing.stats(),
+        "export": exporter.stats(),
+        "rate_limits": rate_governor.governor.stats(),
+        "circuits": circuit.stats(),
+        "stages": telemetry.STAGE_SECONDS.summary(),
+    }
+
+# -----------------------------
+# 관측: Prometheus /metrics, 실행 중 로그 레벨 변경
+# -----------------------------
+_CIRCUIT_STATE = {"closed": 0, "half_open": 1, "open": 2}
+
+def _runtime_metrics():
+    """스크레이프 시점에 각 모듈 stats() 를 metric 으로 변환"""
+    m = metric_cache.stats()
+    yield ("finance_metric_cache_lookups_total", "counter", "지표 캐시 조회 결과별 횟수", [
+        ({"result": k}, m[k]) for k in ("hits_l1", "hits_l2", "stale_hits", "misses")
+    ])
+    yield ("finance_metric_cache_hit_ratio", "gauge", "지표 캐시 적중률", [({}, m["hit_rate"])])
+    yield ("finance_metric_cache_refreshes_total", "counter", "stale 백그라운드 갱신 결과별 횟수", [
+        ({"result": "ok"}, m["refreshes"]), ({"result": "error"}, m["refresh_errors"]),
+    ])
+    yield ("finance_metric_fallbacks_total", "counter", "라이브 조회 실패로 이력 값을 대신 쓴 횟수", [({}, m["fallbacks"])])
+    if history is not None:
+        hs = history.stats()
+        yield ("finance_history_appends_total", "counter", "지표 이력 저장 결과별 횟수", [
+            ({"result": "ok"}, hs["appends"]), ({"result": "error"}, hs["append_errors"]),
+        ])
+    sm = summary_cache.stats()
+    yield ("finance_summary_cache_lookups_total", "counter", "GPT 요약 캐시 조회 결과별 횟수", [
+        ({"result": k}, sm[k]) for k in ("hits_l1", "hits_l2", "misses")
+    ])
+    yield ("finance_summary_cache_hit_ratio", "gauge", "GPT 요약 캐시 적중률", [({}, sm["hit_rate"])])
+    gb = gpt_batch.batcher.stats()
+    yield ("finance_gpt_batch_items_total", "counter", "배치 요약 항목 결과별 횟수", [
+        ({"result": k[len("items_"):]}, gb[k]) for k in ("items_ok", "items_invalid", "items_missing", "items_retried", "items_failed")
+    ])
+    yield ("finance_gpt_batch_tokens_total", "counter", "배치 요약 OpenAI 토큰 사용량", [
+        ({"kind": "prompt"}, gb["prompt_tokens"]), ({"kind": "completion"}, gb["completion_tokens"]),
+    ])
+    sb = local_summary.budget.stats()
+    yield ("finance_summary_tier_total", "counter", "분석 응답 요약 출처별 횟수 (gpt/cache/local/offline/failed)", [
+        ({"tier": t}, sb[f"tier_{t}"]) for t in local_summary.TIERS
+    ])
+    yield ("finance_summary_background_total", "counter", "지연 예산으로 백그라운드로 넘긴 GPT 요약 결과별 횟수", [
+        ({"result": k[len("background_"):]}, sb[k]) for k in ("background_started", "background_done", "background_failed")
+    ])
+    yield ("finance_search_cache_size", "gauge", "Finnhub 검색 결과 캐시 항목 수", [({}, len(cache))])
+    sf = singleflight.stats()
+    yield ("finance_singleflight_calls_total", "counter", "single-flight 실행/합류 횟수", [
+        ({"path": path, "role": role}, sf[f"{path}_{role}"]) for path in ("sync", "async") for role in ("executed", "shared")
+    ])
+    flight = shared_state.flight
+    if flight is not None:
+        fs = flight.stats()
+        yield ("finance_shared_flight_total", "counter", "워커 간 single-flight 결과별 횟수", [
+            ({"result": k}, fs[k]) for k in ("acquired", "waited", "shared_hits", "wait_misses")
+        ])
+    nh = naver_html.stats()
+    yield ("finance_naver_html_extract_total", "counter", "네이버 HTML 추출 단계별 횟수", [
+        ({"result": k}, nh[k]) for k in ("calls", "regex_complete", "lxml_used", "bs4_used", "errors")
+    ])
+    cs = circuit.stats()
+    breaker_stats = cs["breakers"].items()
+    yield ("finance_circuit_state", "gauge", "circuit breaker 상태 (0 closed, 1 half_open, 2 open)", [
+        ({"breaker": name}, _CIRCUIT_STATE[b["state"]]) for name, b in breaker_stats
+    ])
+    yield ("finance_upstream_errors_total", "counter", "업스트림 호출 실패 횟수 (circuit breaker 기준)", [
+        ({"breaker": name}, b["failures"]) for name, b in breaker_stats
+    ])
+    yield ("finance_circuit_rejected_total", "counter", "breaker 가 열려 있어 바로 거절한 호출 수", [
+        ({"breaker": name}, b["rejected"]) for name, b in breaker_stats
+    ])
+    hedge = cs["hedge"]["naver"]
+    yield ("finance_hedge_total", "counter", "네이버 JSON/HTML 헤지 결과별 횟수", [
+        ({"outcome": k}, hedge[k]) for k in ("primary_only", "fallback", "hedged", "primary_wins", "backup_wins", "merged")
+    ])
+    yield ("finance_hedge_delay_seconds", "gauge", "현재 헤지 대기 시간", [({}, hedge["delay"])])
+    rl = rate_governor.governor.stats()["buckets"]
+    samples = [(name, p, s) for name, b in rl.items() for p, s in b["by_priority"].items()]
+    yield ("finance_rate_limit_acquired_total", "counter", "토큰 버킷 통과 횟수", [
+        ({"bucket": n, "priority": p}, s["acquired"]) for n, p, s in samples
+    ])
+    yield ("finance_rate_limit_rejected_total", "counter", "대기 상한 초과로 거절된 호출 수", [
+        ({"bucket": n, "priority": p}, s["rejected"]) for n, p, s in samples
+    ])
+    yield ("finance_rate_limit_wait_seconds_total", "counter", "토큰 대기 누적 시간", [
+        ({"bucket": n, "priority": p}, s["wait_sum"]) for n, p, s in samples
+    ])
+    pf = prefetcher.stats()
+    yield ("finance_prefetch_items_total", "counter", "캐시 워밍 대상 처리 결과별 횟수", [
+        ({"outcome": k}, v) for k, v in sorted(pf["totals"].items())
+    ])
+    yield ("finance_prefetch_tracked", "gauge", "조회 빈도를 추적 중인 종목 수", [({}, pf["tracked"])])
+    snap = screener.snapshot
+    yield ("finance_screener_snapshot_size", "gauge", "스크리너 스냅샷 종목 수", [({}, len(snap.symbol) if snap else 0)])
+
+telemetry.register_collector(_runtime_metrics)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text format (워커별 값)"""
+    return PlainTextResponse(telemetry.render(), media_type=telemetry.CONTENT_TYPE)
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+@app.get("/api/log_level")
+def get_log_level():
+    return telemetry.levels()
+
+@app.put("/api/log_level")
+def set_log_level(
+    level: str = Query(..., description="DEBUG / INFO / WARNING / ERROR"),
+    logger: str = Query(telemetry.ROOT_LOGGER, description="finance(앱 전체), finance.app, httpx 등"),
+    token: Optional[str] = Header(None, alias="X-Admin-Token"),
+):
+    """실행 중 로그 레벨 변경 (X-Admin-Token 헤더 필요 - ADMIN_TOKEN 이 없으면 항상 거절, 이 워커에만 적용)"""
+    if not ADMIN_TOKEN or not hmac.compare_digest((token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="권한이 없습니다.")
+    try:
+        applied = telemetry.set_level(level, logger)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    log.info("log_level.changed", logger=logger, level=applied)
+    return telemetry.levels()
 
 @app.get("/")
 def read_root():
@@ -550,9 +1766,7 @@ async def favicon():
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
-    import traceback
-    print(f"Unhandled exception: {exc}")
-    print("".join(traceback.format_exception(None, exc, exc.__traceback__)))  # 전체 스택 트레이스 출력
+    log.error("http.unhandled", path=request.url.path, error=str(exc), exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={"detail": "서버 내부 오류가 발생했습니다."},
@@ -560,7 +1774,7 @@ async def global_exception_handler(request, exc):
 
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request, exc):
-    print(f"HTTP exception: {exc.detail}")
+    log.info("http.exception", path=request.url.path, status=exc.status_code, detail=exc.detail)
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
@@ -568,50 +1782,76 @@ async def http_exception_handler(request, exc):
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
-    print(f"Validation error: {exc}")
+    log.info("http.validation_error", path=request.url.path, error=str(exc))
     return JSONResponse(
         status_code=422,
         content={"detail": exc.errors()},
     )
 
+def _build_translate_prompt(kor_name: str) -> str:
+    # 프롬프트 수정: JSON 형식 강제
+    return f"""
+        아래의 한국어 종목명을 영어 종목명으로 변환하세요.
+        - 한국어 종목명: "{kor_name}"
+        - 영어 종목명만 JSON 형식으로 반환하세요. 최대한 한 단어로만 반환하세요. 여러 단어로만 해야할 경우에는 꼭 띄어쓰기를 지키세요. 다른 설명은 포함하지 마세요.
+        - JSON 형식 예시: {{ "english_name": "Samsung" }}
+        """
+
+def _parse_translation(kor_name: str, content: str) -> str:
+    # GPT 응답에서 JSON 파싱
+    content = content.strip()
+    log.debug("openai.translate", name=kor_name, payload=content, sample=PAYLOAD_SAMPLE)
+    eng_name_json = json.loads(content)  # JSON 파싱
+    eng_name = eng_name_json.get("english_name", "").strip()
+    if not eng_name:
+        raise ValueError("영어 종목명을 찾을 수 없습니다.")
+
+    # 특수 문자 제거 및 공백 정리
+    eng_name = re.sub(r'[^\w\s]', '', eng_name)  # 특수 문자 제거
+    eng_name = ' '.join(eng_name.split())  # 중복 공백 제거
+    log.info("translate.done", name=kor_name, english=eng_name)
+    return eng_name
+
+@timed("translate")
 def translate_kor_to_eng_with_gpt(kor_name: str) -> str:
     """
     GPT를 사용하여 한국어 종목명을 영어 종목명으로 변환 (JSON 형식 강제)
     """
     try:
+        client = _openai_client()
         if client is None:
             raise RuntimeError("OpenAI API Key가 설정되지 않았습니다.")
 
-        # 프롬프트 수정: JSON 형식 강제
-        prompt = f"""
-        아래의 한국어 종목명을 영어 종목명으로 변환하세요.
-        - 한국어 종목명: "{kor_name}"
-        - 영어 종목명만 JSON 형식으로 반환하세요. 최대한 한 단어로만 반환하세요. 여러 단어로만 해야할 경우에는 꼭 띄어쓰기를 지키세요. 다른 설명은 포함하지 마세요.
-        - JSON 형식 예시: {{ "english_name": "Samsung" }}
-        """
-
         response = client.chat.completions.create(
             model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
+            messages=[{"role": "user", "content": _build_translate_prompt(kor_name)}],
             temperature=0.2
         )
+        return _parse_translation(kor_name, response.choices[0].message.content)
+    except json.JSONDecodeError as e:
+        log.warning("translate.parse_error", name=kor_name, error=str(e))
+        raise HTTPException(status_code=500, detail="GPT 응답에서 JSON 형식이 올바르지 않습니다.")
+    except Exception as e:
+        log.error("translate.error", name=kor_name, error=str(e))
+        raise HTTPException(status_code=500, detail="종목명 변환 중 오류가 발생했습니다.")
+
+@timed("translate")
+async def translate_kor_to_eng_with_gpt_async(kor_name: str) -> str:
+    """translate_kor_to_eng_with_gpt 의 비동기 버전"""
+    try:
+        aclient = _aopenai_client()
+        if aclient is None:
+            raise RuntimeError("OpenAI API Key가 설정되지 않았습니다.")
 
-        # GPT 응답에서 JSON 파싱
-        content = response.choices[0].message.content.strip()
-        print(f"GPT raw response: {content}")
-        eng_name_json = json.loads(content)  # JSON 파싱
-        eng_name = eng_name_json.get("english_name", "").strip()
-        if not eng_name:
-            raise ValueError("영어 종목명을 찾을 수 없습니다.")
-        
-        # 특수 문자 제거 및 공백 정리
-        eng_name = re.sub(r'[^\w\s]', '', eng_name)  # 특수 문자 제거
-        eng_name = ' '.join(eng_name.split())  # 중복 공백 제거
-        print(f"Translated '{kor_name}' to '{eng_name}' using GPT.")
-        return eng_name
+        response = await aclient.chat.completions.create(
+            model="gpt-4",
+            messages=[{"role": "user", "content": _build_translate_prompt(kor_name)}],
+            temperature=0.2
+        )
+        return _parse_translation(kor_name, response.choices[0].message.content)
     except json.JSONDecodeError as e:
-        print(f"JSON parsing error: {e}")
+        log.warning("translate.parse_error", name=kor_name, error=str(e))
         raise HTTPException(status_code=500, detail="GPT 응답에서 JSON 형식이 올바르지 않습니다.")
     except Exception as e:
-        print(f"Error in translate_kor_to_eng_with_gpt: {e}")
+        log.error("translate.error", name=kor_name, error=str(e))
         raise HTTPException(status_code=500, detail="종목명 변환 중 오류가 발생했습니다.")
@@ -0,0 +1,148 @@
+"""
+네이버 종목 페이지 HTML 추출 벤치마크: regex / lxml / bs4 (기존 BeautifulSoup) / extract (실제 경로)
+
+- 전략별 1회 파싱 시간(최소/평균)과 tracemalloc 기준 할당량(peak, 블록 수)을 출력
+  (tracemalloc 은 파이썬 힙만 보므로 lxml 의 C 메모리는 잡히지 않는다)
+- bench/fixtures/*.html 이 있으면 그 파일을, 없으면 실제 페이지 구조를 흉내 낸 합성 페이지를 쓴다
+- 네이버에 접속 가능한 환경에서는 --save 로 실제 페이지를 fixtures 에 저장할 수 있다
+
+    cd backend && python bench/bench_naver_html.py [--repeat 20] [--save 005930,000660]
+"""
+import argparse, glob, os, random, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import naver_html  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# 실제 페이지의 PER/EPS · PBR/BPS 표 구조
+PER_TABLE = """
+<table summary="PER/EPS 정보" class="per_table">
+<caption>PER/EPS 정보</caption>
+<tr><th scope="row"><strong>PER<span class="cm">l</span>EPS<span class="date">(2024.12)</span></strong></th>
+<td><em id="_per">{per}</em>배 <span class="bar">l</span> <em id="_eps">{eps}</em>원</td></tr>
+<tr><th scope="row"><strong>추정PER<span class="cm">l</span>EPS</strong></th>
+<td><em id="_cns_per">{cns_per}</em>배 <span class="bar">l</span> <em id="_cns_eps">{cns_eps}</em>원</td></tr>
+<tr><th scope="row"><strong>PBR<span class="cm">l</span>BPS<span class="date">(2024.12)</span></strong></th>
+<td><em id="_pbr">{pbr}</em>배 <span class="bar">l</span> <em>{bps}</em>원</td></tr>
+<tr><th scope="row"><strong>배당수익률</strong></th><td><em id="_dvr">{dvr}</em>%</td></tr>
+</table>
+"""
+
+def synthetic_page(seed: int, target_kb: int = 250) -> str:
+    """스크립트·내비게이션·시세/공시 표가 섞인 ~target_kb KB 페이지 (지표 표는 문서 중후반)"""
+    rnd = random.Random(seed)
+    head = ["<!DOCTYPE html><html lang='ko'><head><meta charset='euc-kr'><title>네이버 금융</title>"]
+    for i in range(30):
+        head.append(f"<script type='text/javascript'>var cfg{i} = {{'k': '{'x' * rnd.randint(200, 1500)}', 'n': {i}}};</script>")
+    head.append("<style>" + "".join(f".c{i}{{margin:{i}px;color:#{i:06x}}}" for i in range(400)) + "</style></head><body>")
+
+    def filler_table(n_rows: int) -> str:
+        rows = "".join(
+            f"<tr><th scope='row'><span>{rnd.choice(['매출액', '영업이익', '순이익', '부채비율', '당좌비율'])}</span></th>"
+            + "".join(f"<td class='num'><em>{rnd.randint(-5000, 99999):,}</em></td>" for _ in range(6))
+            + "</tr>"
+            for _ in range(n_rows)
+        )
+        return f"<table class='tb_type1'><tbody>{rows}</tbody></table>"
+
+    def nav() -> str:
+        return "<ul>" + "".join(f"<li><a href='/item/main.naver?code={rnd.randint(0, 999999):06d}'>종목{j}</a></li>" for j in range(80)) + "</ul>"
+
+    body = []
+    size = sum(map(len, head))
+    target = target_kb * 1024
+    metrics_at = int(target * 0.6)
+    inserted = False
+    while size < target:
+        block = filler_table(rnd.randint(5, 20)) if rnd.random() < 0.6 else nav()
+        body.append(block)
+        size += len(block)
+        if not inserted and size >= metrics_at:
+            body.append(PER_TABLE.format(
+                per=f"{rnd.uniform(3, 60):.2f}", eps=f"{rnd.randint(100, 90000):,}",
+                cns_per=f"{rnd.uniform(3, 60):.2f}", cns_eps=f"{rnd.randint(100, 90000):,}",
+                pbr=f"{rnd.uniform(0.2, 6):.2f}", bps=f"{rnd.randint(1000, 400000):,}",
+                dvr=f"{rnd.uniform(0, 6):.2f}",
+            ))
+            inserted = True
+    return "".join(head) + "".join(body) + "</body></html>"
+
+def load_fixtures(n_synthetic: int):
+    files = sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html")))
+    if files:
+        out = []
+        for path in files:
+            with open(path, encoding="utf-8") as f:
+                out.append((os.path.basename(path), f.read()))
+        return out
+    return [(f"synthetic-{i}", synthetic_page(i)) for i in range(n_synthetic)]
+
+def save_fixtures(codes):
+    import requests
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for code in codes:
+        res = requests.get(f"https://finance.naver.com/item/main.naver?code={code}",
+                           headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
+        res.raise_for_status()
+        path = os.path.join(FIXTURE_DIR, f"{code}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(res.text)
+        print(f"saved {path} ({len(res.text) // 1024} KB)")
+
+def measure(fn, pages, repeat):
+    times = []
+    for _ in range(repeat):
+        for _, html in pages:
+            t = time.perf_counter()
+            fn(html)
+            times.append(time.perf_counter() - t)
+    # 할당량은 별도 1회 실행으로 측정 (tracemalloc 오버헤드가 시간에 섞이지 않도록)
+    peaks, blocks = [], []
+    for _, html in pages:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        fn(html)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        peaks.append(peak)
+        blocks.append(sum(s.count_diff for s in after.compare_to(before, "filename") if s.count_diff > 0))
+    return min(times), sum(times) / len(times), max(peaks), max(blocks)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--synthetic", type=int, default=5, help="fixtures 가 없을 때 만들 합성 페이지 수")
+    ap.add_argument("--save", help="쉼표로 구분한 종목코드의 실제 페이지를 fixtures 에 저장하고 종료")
+    args = ap.parse_args()
+
+    if args.save:
+        save_fixtures([c.strip() for c in args.save.split(",") if c.strip()])
+        return
+
+    pages = load_fixtures(args.synthetic)
+    avg_kb = sum(len(h) for _, h in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages (avg {avg_kb:.0f} KB), repeat {args.repeat}")
+
+    # 기준(x1.0)은 기존 bs4 경로
+    strategies = [(name, naver_html.STRATEGIES[name]) for name in reversed(naver_html.available_strategies())]
+    strategies.append(("extract (regex→fallback)", naver_html.extract))
+    if "lxml" not in naver_html.available_strategies():
+        print("  lxml: not installed - skipped")
+
+    # 전략 간 결과 일치 확인
+    for label, html in pages:
+        results = {name: fn(html) for name, fn in strategies}
+        if len(set(results.values())) != 1:
+            print(f"  ! mismatch on {label}: {results}")
+
+    base = None
+    print(f"  {'strategy':<26} {'best ms':>8} {'mean ms':>8} {'peak KB':>9} {'alloc blocks':>13}")
+    for name, fn in strategies:
+        best, mean, peak, blocks = measure(fn, pages, args.repeat)
+        base = base or mean
+        print(f"  {name:<26} {best * 1000:8.2f} {mean * 1000:8.2f} {peak / 1024:9.0f} {blocks:13d}   x{base / mean:6.1f}")
+
+if __name__ == "__main__":
+    main()
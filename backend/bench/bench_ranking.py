@@ -0,0 +1,80 @@
+"""
+랭킹 마이크로 벤치마크: 기존 sorted(key=score) 방식 vs ranking.RankingEngine
+
+- engine: 딕셔너리 목록을 매번 배열로 변환 (Finnhub 검색 결과)
+- prepared: CandidateSet 을 미리 만들어 둔 경우 (로컬 종목 인덱스)
+
+    cd backend && python bench/bench_ranking.py [--n 10000] [--repeat 20]
+"""
+import argparse, os, random, string, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ranking import RankingEngine  # noqa: E402
+
+SUFFIXES = ["", "", "", ".KS", ".KQ", ".F", ".MX", ".L", ".TO", ".B"]
+WORDS = ["samsung", "electronics", "apple", "holdings", "motor", "bio", "chem", "tech", "inc", "corp", "group", "energy"]
+
+def legacy_rank(q, items):
+    """기존 _rank_kr_candidates (파이썬 클로저 + 전체 정렬)"""
+    q_norm = q.strip().lower()
+    candidates = [x for x in items if isinstance(x.get("symbol", ""), str)]
+
+    def score(x):
+        sym = x.get("symbol", "")
+        desc = (x.get("description") or "").lower()
+        name_hit = 0
+        if q_norm in desc: name_hit += 2
+        if q_norm == desc: name_hit += 2
+        exch_boost = 0.3 if sym.endswith(".KS") or sym.endswith(".KQ") else (
+            0.2 if sym in ["TSLA", "AAPL", "GOOGL"] else 0.0
+        )
+        return 1.0 + name_hit + exch_boost
+
+    return sorted(candidates, key=score, reverse=True)
+
+def make_items(n, seed=7):
+    rnd = random.Random(seed)
+    items = []
+    for _ in range(n):
+        sym = "".join(rnd.choices(string.ascii_uppercase, k=rnd.randint(2, 5))) + rnd.choice(SUFFIXES)
+        desc = " ".join(rnd.choices(WORDS, k=rnd.randint(1, 4))).upper()
+        items.append({"symbol": sym, "description": desc})
+    return items
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--query", default="samsung electronics")
+    args = ap.parse_args()
+
+    items = make_items(args.n)
+    engine = RankingEngine()
+    prepared = engine.prepare(items)  # 로컬 종목 인덱스처럼 배열을 미리 만들어 둔 후보
+
+    rows = [
+        ("legacy sorted(key=score)", lambda: legacy_rank(args.query, items)),
+        ("engine full sort", lambda: engine.rank(args.query, items)),
+        ("engine top-1 (argpartition)", lambda: engine.rank(args.query, items, k=1)),
+        ("engine top-10 (argpartition)", lambda: engine.rank(args.query, items, k=10)),
+        ("prepared full sort", lambda: engine.rank_prepared(args.query, prepared)),
+        ("prepared top-1", lambda: engine.rank_prepared(args.query, prepared, k=1)),
+        ("prepared top-10", lambda: engine.rank_prepared(args.query, prepared, k=10)),
+    ]
+    base = None
+    print(f"n={args.n} query={args.query!r} (best of {args.repeat})")
+    for name, fn in rows:
+        sec = timeit(fn, args.repeat)
+        base = base or sec
+        print(f"  {name:<30} {sec * 1000:8.2f} ms   x{base / sec:5.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+KRX 전 종목 지표 수집 비교: 네이버 시가총액 목록 일괄 수집(naver_listing.py) vs 종목별 경로(itemSummary JSON + HTML).
+
+- upstream_stub 을 띄우고, 백엔드 모듈(app)을 같은 프로세스에서 스텁 주소 환경변수로 import 해 호출한다
+- bulk: listing.ingest (빠진 값은 종목별 경로로 채움) - 스텁 호출 수와 소요 시간
+- per-item: 목록에 나온 종목 중 --sample 개를 _fetch_naver_metrics_async 로 (캐시를 거치지 않음) 받아
+  전 종목 기준 요청 수·시간으로 환산 (--sample 0 이면 전 종목)
+- 기본은 토큰 버킷 한도를 끄고 스텁 지연만 잰다. --keep-rate-limits 면 운영 한도(naver_json 10/s 등) 그대로
+
+    cd backend && python bench/ingest.py [--sample 300] [--concurrency 16] [--listing-size KS=950,KQ=1700] [--keep-rate-limits]
+"""
+import argparse, asyncio, json, os, random, sys, time
+from types import SimpleNamespace
+from typing import Any, Dict
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from loadtest import COLD_ENV, _free_port, _wait_ready, backend_env  # noqa: E402
+
+def start_stub(port: int, args):
+    import subprocess
+    cmd = [sys.executable, os.path.join(BENCH_DIR, "upstream_stub.py"), "serve", "--port", str(port),
+           "--latency", args.latency, "--jitter", str(args.jitter), "--seed", str(args.seed),
+           "--listing-size", args.listing_size]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR)
+    _wait_ready(f"http://127.0.0.1:{port}/_stub/health", proc)
+    return proc
+
+def stub_calls(stub: str) -> Dict[str, int]:
+    data = httpx.get(f"{stub}/_stub/stats", timeout=5).json()
+    return {route: sum(outcomes.values()) for route, outcomes in data["calls"].items()}
+
+def stub_reset(stub: str) -> None:
+    httpx.post(f"{stub}/_stub/reset", timeout=5)
+
+async def run_bulk(app, stub: str) -> Dict[str, Any]:
+    stub_reset(stub)
+    started = time.perf_counter()
+    df = await app.naver_listing.listing.ingest(app.pools.aclient("naver"), fill=app._fetch_naver_metrics_async)
+    elapsed = time.perf_counter() - started
+    calls = stub_calls(stub)
+    report = app.naver_listing.listing.last_report
+    return {
+        "rows": len(df),
+        "codes": list(df["code"]),
+        "complete": int((df["source"] != "").sum()),
+        "requests": sum(calls.values()),
+        "calls": calls,
+        "elapsed_sec": round(elapsed, 2),
+        "report": {k: v for k, v in report.items() if k != "finished_at"},
+    }
+
+async def run_per_item(app, stub: str, codes, concurrency: int) -> Dict[str, Any]:
+    stub_reset(stub)
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(code: str):
+        async with sem:
+            try:
+                return await app._fetch_naver_metrics_async(code)
+            except Exception:
+                return None
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(c) for c in codes))
+    elapsed = time.perf_counter() - started
+    calls = stub_calls(stub)
+    return {
+        "codes": len(codes),
+        "complete": sum(1 for r in results if r and all(v is not None for v in r[:3])),
+        "requests": sum(calls.values()),
+        "calls": calls,
+        "elapsed_sec": round(elapsed, 2),
+    }
+
+async def run(args, stub: str) -> Dict[str, Any]:
+    import app  # 환경변수를 맞춘 뒤 import
+    bulk = await run_bulk(app, stub)
+    codes = bulk.pop("codes")
+    sample = codes if not args.sample or args.sample >= len(codes) else random.Random(args.seed).sample(codes, args.sample)
+    per_item = await run_per_item(app, stub, sample, args.concurrency)
+    scale = len(codes) / max(len(sample), 1)
+    per_item["estimated_full"] = {
+        "requests": round(per_item["requests"] * scale),
+        "elapsed_sec": round(per_item["elapsed_sec"] * scale, 1),
+    }
+    await app.pools.aclose()
+    return {"bulk": bulk, "per_item": per_item}
+
+def print_report(result: Dict[str, Any]) -> None:
+    bulk, per_item = result["bulk"], result["per_item"]
+    full = per_item["estimated_full"]
+    print(f"종목 {bulk['rows']}개 (목록만으로 완전 {bulk['report']['complete_from_listing']}, "
+          f"종목별로 채움 {bulk['report']['filled_per_item']}, 빠진 값 남음 {bulk['report']['missing']})")
+    print(f"{'':<22} {'requests':>9} {'wall':>9}")
+    print(f"{'bulk (listing+fill)':<22} {bulk['requests']:>9} {bulk['elapsed_sec']:>8.2f}s   {bulk['calls']}")
+    print(f"{'per-item (sample)':<22} {per_item['requests']:>9} {per_item['elapsed_sec']:>8.2f}s   "
+          f"{per_item['codes']} 종목 {per_item['calls']}")
+    print(f"{'per-item (전 종목 환산)':<19} {full['requests']:>9} {full['elapsed_sec']:>8.1f}s")
+    if bulk["requests"] and bulk["elapsed_sec"]:
+        print(f"요청 수 {full['requests'] / bulk['requests']:.1f}배, 시간 {full['elapsed_sec'] / bulk['elapsed_sec']:.1f}배 감소")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sample", type=int, default=300, help="종목별 경로로 받을 종목 수 (0 이면 전 종목)")
+    ap.add_argument("--concurrency", type=int, default=16, help="종목별 경로 동시 요청 수")
+    ap.add_argument("--listing-size", default="KS=950,KQ=1700", help="스텁 시장별 종목 수")
+    ap.add_argument("--latency", default="naver_json=40,naver_html=150,naver_listing=120")
+    ap.add_argument("--jitter", type=float, default=0.3)
+    ap.add_argument("--keep-rate-limits", action="store_true", help="토큰 버킷 기본 한도를 그대로 둔다")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--save", help="결과 JSON 저장 경로")
+    args = ap.parse_args()
+
+    stub_port = _free_port()
+    stub = f"http://127.0.0.1:{stub_port}"
+    stub_proc = start_stub(stub_port, args)
+    try:
+        opts = SimpleNamespace(keep_rate_limits=args.keep_rate_limits, cold=True)
+        env = backend_env(stub, opts)
+        env.update(COLD_ENV)
+        env["HISTORY_DIR"] = "off"
+        os.environ.update(env)
+        os.chdir(BACKEND_DIR)
+        result = asyncio.run(run(args, stub))
+    finally:
+        stub_proc.terminate()
+        stub_proc.wait(timeout=10)
+    print_report(result)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+오프라인 부하 테스트: upstream_stub 과 백엔드를 띄우고 분석 엔드포인트에 동시 요청을 보낸다.
+
+- 백엔드는 업스트림 주소를 스텁으로 바꾼 환경변수로 uvicorn app:app 실행 (API 키는 더미)
+- 요청 구성: /api/analyze_by_name (한글명·영문명·6자리 코드) + /api/analyze (티커) + 검색 실패 이름 일부
+- 엔드포인트별 p50/p95/p99/최대 지연, 처리량, 상태 코드 분포, 요청당 업스트림 호출 수, 백엔드 단계별 시간 출력
+- --save 로 결과를 JSON 으로 저장하고, --compare 로 저장된 기준선과 비교 (회귀 확인용)
+- --workers N (N > 1) 이면 임시 SHARED_STATE_DIR 로 워커 간 캐시·single-flight 를 공유 (--no-shared 로 끔)
+
+    cd backend && python bench/loadtest.py --requests 400 --concurrency 16 [--cold] [--latency openai=800] [--errors naver_json=0.05:empty]
+    cd backend && python bench/loadtest.py --save bench/baseline.json
+    cd backend && python bench/loadtest.py --compare bench/baseline.json
+"""
+import argparse, asyncio, json, os, random, socket, subprocess, sys, tempfile, time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from upstream_stub import load_symbols  # noqa: E402
+
+RATE_BUCKETS = ("FINNHUB_SEARCH", "FINNHUB_METRIC", "NAVER_JSON", "NAVER_HTML", "NAVER_LISTING", "OPENAI")
+COLD_ENV = {"METRIC_TTL_FINNHUB": "0", "METRIC_TTL_NAVER": "0", "METRIC_STALE_TTL": "0", "SUMMARY_CACHE_TTL": "0"}
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{url} 프로세스가 종료됨 (exit {proc.returncode})")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} 가 {timeout:.0f}초 안에 준비되지 않음")
+
+# -----------------------------
+# 서버 기동
+# -----------------------------
+def start_stub(port: int, args) -> subprocess.Popen:
+    cmd = [sys.executable, os.path.join(BENCH_DIR, "upstream_stub.py"), "serve", "--port", str(port),
+           "--jitter", str(args.jitter), "--seed", str(args.seed)]
+    if args.latency:
+        cmd += ["--latency", args.latency]
+    if args.errors:
+        cmd += ["--errors", args.errors]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR)
+    _wait_ready(f"http://127.0.0.1:{port}/_stub/health", proc)
+    return proc
+
+def backend_env(stub: str, args) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "FINNHUB_API_KEY": "loadtest", "OPENAI_API_KEY": "loadtest",
+        "FINNHUB_BASE_URL": f"{stub}/api/v1",
+        "NAVER_JSON_URL": f"{stub}/service/itemSummary.nhn",
+        "NAVER_HTML_URL": f"{stub}/item/main.naver?code={{itemcode}}",
+        "NAVER_LISTING_URL": f"{stub}/sise/sise_market_sum.naver",
+        "NAVER_LISTING_FIELD_URL": f"{stub}/sise/field_submit.naver",
+        "NAVER_INDUSTRY_URL": f"{stub}/sise/sise_group.naver",
+        "NAVER_INDUSTRY_DETAIL_URL": f"{stub}/sise/sise_group_detail.naver",
+        "OPENAI_BASE_URL": f"{stub}/v1",
+        "SCREENER_REFRESH_SEC": "0",
+        "PREFETCH_INTERVAL_SEC": "0",
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+        "HTTP2": "0",
+    })
+    if not args.keep_rate_limits:
+        # 스텁은 한도가 없으므로 토큰 버킷이 측정값을 지배하지 않게 끈다
+        env.update({f"RATE_LIMIT_{b}": "off" for b in RATE_BUCKETS})
+    if args.cold:
+        env.update(COLD_ENV)
+    if getattr(args, "workers", 1) > 1 and not getattr(args, "no_shared", False):
+        # 워커 간 캐시·single-flight 공유 (운영 다중 워커 구성과 같게)
+        env.setdefault("SHARED_STATE_DIR", tempfile.mkdtemp(prefix="finance-shared-"))
+    return env
+
+def start_backend(port: int, stub: str, args) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning", "--no-access-log"]
+    if args.workers > 1:
+        cmd += ["--workers", str(args.workers)]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=backend_env(stub, args))
+    _wait_ready(f"http://127.0.0.1:{port}/api/cache/stats", proc)
+    return proc
+
+# -----------------------------
+# 요청 구성
+# -----------------------------
+def build_queries(n: int, seed: int, miss_ratio: float) -> List[Tuple[str, str, Dict[str, str]]]:
+    """(라벨, 경로, 파라미터) 목록. 인기 종목에 쏠리도록 지프 분포로 뽑는다"""
+    rows = load_symbols()
+    rnd = random.Random(seed)
+    weights = [1.0 / (i + 1) for i in range(len(rows))]
+    out = []
+    for _ in range(n):
+        if rnd.random() < miss_ratio:
+            out.append(("analyze_by_name", "/api/analyze_by_name", {"name": f"없는회사{rnd.randint(0, 999)}"}))
+            continue
+        r = rnd.choices(rows, weights)[0]
+        kind = rnd.random()
+        if kind < 0.4:
+            out.append(("analyze_by_name", "/api/analyze_by_name", {"name": r["name_ko"]}))
+        elif kind < 0.6:
+            out.append(("analyze_by_name", "/api/analyze_by_name", {"name": r["name_en"]}))
+        elif kind < 0.75:
+            out.append(("analyze_by_name", "/api/analyze_by_name", {"name": r["code"]}))
+        else:
+            out.append(("analyze", "/api/analyze", {"ticker": r["symbol"], "company": r["name_en"]}))
+    return out
+
+async def drive(base: str, queries, concurrency: int) -> Tuple[Dict[str, List[float]], Dict[str, Counter], float]:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+    it = iter(queries)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=60.0, limits=limits) as client:
+        async def worker():
+            for label, path, params in it:
+                start = time.perf_counter()
+                try:
+                    r = await client.get(path, params=params)
+                    status = str(r.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                latencies[label].append(time.perf_counter() - start)
+                statuses[label][status] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, statuses, time.perf_counter() - start
+
+# -----------------------------
+# 결과 정리
+# -----------------------------
+def _pct(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+def summarize(latencies, statuses, elapsed: float, upstream: dict, stages: dict, args) -> dict:
+    endpoints = {}
+    total = 0
+    for label, vals in sorted(latencies.items()):
+        vals = sorted(vals)
+        total += len(vals)
+        endpoints[label] = {
+            "count": len(vals),
+            "p50_ms": round(_pct(vals, 0.50) * 1000, 1),
+            "p95_ms": round(_pct(vals, 0.95) * 1000, 1),
+            "p99_ms": round(_pct(vals, 0.99) * 1000, 1),
+            "max_ms": round(vals[-1] * 1000, 1),
+            "status": dict(statuses[label]),
+        }
+    calls = {route: sum(c.values()) for route, c in upstream.get("calls", {}).items()}
+    return {
+        "config": {k: getattr(args, k) for k in ("requests", "concurrency", "warmup", "cold", "latency", "errors",
+                                                 "workers", "seed", "miss_ratio")},
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else None,
+        "endpoints": endpoints,
+        "upstream_calls": calls,
+        "upstream_per_request": {route: round(n / total, 3) for route, n in calls.items()} if total else {},
+        "stages": stages,
+    }
+
+def print_report(result: dict, baseline: Optional[dict] = None) -> None:
+    def delta(cur: float, old: Optional[float]) -> str:
+        if old in (None, 0):
+            return ""
+        return f" ({(cur - old) / old * 100:+.0f}%)"
+
+    base_eps = (baseline or {}).get("endpoints", {})
+    print(f"\n{result['config']['requests']} requests, concurrency {result['config']['concurrency']}, "
+          f"{result['elapsed_s']}s → {result['throughput_rps']} req/s"
+          + delta(result["throughput_rps"] or 0, (baseline or {}).get("throughput_rps")))
+    print(f"{'endpoint':<18}{'count':>7}{'p50':>16}{'p95':>16}{'p99':>16}{'max':>12}  status")
+    for label, e in result["endpoints"].items():
+        b = base_eps.get(label, {})
+        cols = "".join(f"{e[k]:>9.1f}{delta(e[k], b.get(k)):>7}" for k in ("p50_ms", "p95_ms", "p99_ms"))
+        print(f"{label:<18}{e['count']:>7}{cols}{e['max_ms']:>12.1f}  {e['status']}")
+    print("upstream calls / request:", ", ".join(f"{k}={v}" for k, v in sorted(result["upstream_per_request"].items())) or "-")
+    if result["stages"]:
+        print(f"{'stage':<22}{'count':>8}{'mean_ms':>10}{'p95_le_ms':>12}")
+        for name, s in sorted(result["stages"].items()):
+            mean = s.get("mean")
+            p95 = s.get("p95_le")
+            print(f"{name:<22}{s.get('count', 0):>8}{(mean or 0) * 1000:>10.1f}"
+                  f"{(p95 * 1000 if isinstance(p95, (int, float)) else float('nan')):>12.1f}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--warmup", type=int, default=20, help="측정 전에 보낼 요청 수 (커넥션·임포트 준비)")
+    ap.add_argument("--cold", action="store_true", help="지표/요약 캐시 TTL 을 0 으로 (매 요청 업스트림 경로)")
+    ap.add_argument("--latency", default="finnhub=80,naver_json=40,naver_html=150,openai=1200",
+                    help="스텁 라우트별 중앙 지연(ms)")
+    ap.add_argument("--jitter", type=float, default=0.3)
+    ap.add_argument("--errors", help="스텁 오류 주입 (upstream_stub.py 참고)")
+    ap.add_argument("--miss-ratio", type=float, default=0.05, help="검색 실패 이름 비율")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--no-shared", action="store_true", help="--workers > 1 에서 SHARED_STATE_DIR 을 쓰지 않는다")
+    ap.add_argument("--keep-rate-limits", action="store_true", help="토큰 버킷 기본 한도를 그대로 둔다")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--backend", help="이미 떠 있는 백엔드 주소 (지정하면 스텁/백엔드를 띄우지 않음)")
+    ap.add_argument("--stub", help="--backend 와 함께: 그 백엔드가 쓰는 스텁 주소 (호출 수 집계용)")
+    ap.add_argument("--save", help="결과 JSON 저장 경로")
+    ap.add_argument("--compare", help="기준선 JSON 경로")
+    args = ap.parse_args()
+
+    procs: List[subprocess.Popen] = []
+    try:
+        if args.backend:
+            base, stub = args.backend.rstrip("/"), (args.stub or "").rstrip("/")
+        else:
+            stub_port, backend_port = _free_port(), _free_port()
+            stub = f"http://127.0.0.1:{stub_port}"
+            procs.append(start_stub(stub_port, args))
+            procs.append(start_backend(backend_port, stub, args))
+            base = f"http://127.0.0.1:{backend_port}"
+
+        if args.warmup:
+            asyncio.run(drive(base, build_queries(args.warmup, args.seed + 1, 0.0), args.concurrency))
+        if stub:
+            httpx.post(f"{stub}/_stub/reset")
+
+        queries = build_queries(args.requests, args.seed, args.miss_ratio)
+        latencies, statuses, elapsed = asyncio.run(drive(base, queries, args.concurrency))
+
+        upstream = httpx.get(f"{stub}/_stub/stats").json() if stub else {}
+        # 워커가 여럿이면 한 워커의 단계 통계만 보인다
+        stages = httpx.get(f"{base}/api/cache/stats", timeout=10).json().get("stages", {})
+        result = summarize(latencies, statuses, elapsed, upstream, stages, args)
+    finally:
+        for p in reversed(procs):
+            p.terminate()
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=1)
+        print(f"saved {args.save}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+기동 시간·메모리 측정: import app 시간, uvicorn 워커 N 개가 첫 응답을 주기까지 걸린 시간, 워커별 RSS/PSS.
+
+- import: 새 파이썬 프로세스에서 `import app` 을 --repeat 번 재고 중앙값을 출력 (--top 으로 -X importtime 상위 모듈)
+- 서버: upstream_stub 을 띄우고 uvicorn app:app --workers N 을 실행해 /api/cache/stats 가 응답할 때까지 시간
+  (SHARED_STATE_DIR 은 임시 디렉터리 - 워커 간 공유 모드 그대로)
+- 메모리: /proc/<pid>/status 의 VmRSS, /proc/<pid>/smaps_rollup 의 Pss (fork 후 공유 페이지를 나눠 센 값) - Linux 전용
+
+    cd backend && python bench/startup.py --workers 1 2 4 [--repeat 5] [--top 15] [--save bench/startup.json]
+"""
+import argparse, json, os, statistics, subprocess, sys, tempfile, time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from loadtest import _free_port, backend_env, start_stub  # noqa: E402
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+
+# -----------------------------
+# import 시간
+# -----------------------------
+def measure_import(env: Dict[str, str], repeat: int) -> List[float]:
+    out = []
+    for _ in range(repeat):
+        res = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env,
+                             capture_output=True, text=True, check=True)
+        out.append(float(res.stdout.strip().splitlines()[-1]))
+    return out
+
+def import_profile(env: Dict[str, str], top: int) -> List[Dict[str, object]]:
+    """-X importtime 에서 app 이 직접 가져온 모듈의 누적 시간 상위 N 개"""
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=BACKEND_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        # 모듈 이름 앞 들여쓰기(2칸)가 깊이 - app 자신이 0, app 이 직접 가져온 모듈이 1
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            rows.append({"module": name.strip(), "cumulative_ms": int(cum_us) / 1000, "self_ms": int(self_us) / 1000})
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+# -----------------------------
+# 프로세스 메모리
+# -----------------------------
+def _proc_kb(path: str, field: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+def _children(pid: int) -> List[int]:
+    out = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            out.append(int(entry))
+    return out
+
+def process_memory(root: int) -> List[Dict[str, object]]:
+    """uvicorn 메인 프로세스와 자식(워커) 프로세스의 RSS/PSS (MB)"""
+    rows = []
+    for pid in [root] + _children(root):
+        rss = _proc_kb(f"/proc/{pid}/status", "VmRSS")
+        pss = _proc_kb(f"/proc/{pid}/smaps_rollup", "Pss")
+        rows.append({
+            "pid": pid,
+            "role": "main" if pid == root else "worker",
+            "rss_mb": round(rss / 1024, 1) if rss else None,
+            "pss_mb": round(pss / 1024, 1) if pss else None,
+        })
+    return rows
+
+# -----------------------------
+# 서버 기동
+# -----------------------------
+def measure_boot(workers: int, stub: str, args) -> Dict[str, object]:
+    port = _free_port()
+    env = backend_env(stub, args)
+    env["SHARED_STATE_DIR"] = tempfile.mkdtemp(prefix="finance-shared-")
+    cmd = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning", "--no-access-log"]
+    if workers > 1:
+        cmd += ["--workers", str(workers)]
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+    url = f"http://127.0.0.1:{port}/api/cache/stats"
+    try:
+        ready = None
+        while time.perf_counter() - started < args.timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn 종료됨 (exit {proc.returncode})")
+            try:
+                if httpx.get(url, timeout=1.0).status_code == 200:
+                    ready = time.perf_counter() - started
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.02)
+        if ready is None:
+            raise RuntimeError(f"{args.timeout:.0f}초 안에 응답 없음")
+        # 모든 워커가 떠서 요청을 받을 때까지 조금 더 두고 메모리를 잰다
+        time.sleep(args.settle)
+        return {"workers": workers, "ready_sec": round(ready, 3), "processes": process_memory(proc.pid)}
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def print_report(result: Dict[str, object]) -> None:
+    imp = result["import"]
+    print(f"import app: median {imp['median_sec'] * 1000:.0f} ms  (min {imp['min_sec'] * 1000:.0f}, "
+          f"max {imp['max_sec'] * 1000:.0f}, n={len(imp['runs'])})")
+    for row in result.get("import_top", []):
+        print(f"  {row['module']:<28} {row['cumulative_ms']:8.1f} ms")
+    print(f"{'workers':>7}  {'ready':>8}  {'main RSS':>9}  {'worker RSS':>10}  {'worker PSS':>10}  {'total PSS':>9}")
+    for boot in result["boot"]:
+        procs = boot["processes"]
+        main = next(p for p in procs if p["role"] == "main")
+        workers = [p for p in procs if p["role"] == "worker"] or [main]
+        rss = statistics.mean(p["rss_mb"] or 0 for p in workers)
+        pss = statistics.mean(p["pss_mb"] or 0 for p in workers)
+        total = sum(p["pss_mb"] or 0 for p in procs)
+        print(f"{boot['workers']:>7}  {boot['ready_sec']:>7.2f}s  {main['rss_mb'] or 0:>7.1f}MB  "
+              f"{rss:>8.1f}MB  {pss:>8.1f}MB  {total:>7.1f}MB")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--repeat", type=int, default=5, help="import 시간 측정 횟수")
+    ap.add_argument("--top", type=int, default=0, help="-X importtime 상위 모듈 N 개 출력")
+    ap.add_argument("--settle", type=float, default=2.0, help="첫 응답 후 메모리 측정까지 대기(초)")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--save", help="결과 JSON 저장 경로")
+    args = ap.parse_args()
+    # loadtest.backend_env / start_stub 이 읽는 옵션
+    opts = SimpleNamespace(keep_rate_limits=False, cold=False, latency="", errors=None, jitter=0.0, seed=0)
+
+    stub_port = _free_port()
+    stub = f"http://127.0.0.1:{stub_port}"
+    stub_proc = start_stub(stub_port, opts)
+    try:
+        env = backend_env(stub, opts)
+        runs = measure_import(env, args.repeat)
+        result = {
+            "import": {"runs": runs, "median_sec": statistics.median(runs), "min_sec": min(runs), "max_sec": max(runs)},
+        }
+        if args.top:
+            result["import_top"] = import_profile(env, args.top)
+        opts.timeout, opts.settle = args.timeout, args.settle
+        result["boot"] = [measure_boot(n, stub, opts) for n in args.workers]
+    finally:
+        stub_proc.terminate()
+        stub_proc.wait(timeout=10)
+    print_report(result)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+"""
+오프라인 업스트림 스텁 서버: Finnhub / 네이버 금융 / OpenAI 응답을 녹화본(fixtures)으로 재생한다.
+
+- Finnhub  GET /api/v1/search, /api/v1/stock/metric
+- 네이버   GET /service/itemSummary.nhn, /item/main.naver, /sise/sise_market_sum.naver (시가총액 목록), /sise/field_submit.naver,
+           /sise/sise_group.naver, /sise/sise_group_detail.naver (업종 목록 / 업종별 구성 종목)
+  목록은 symbols.csv 의 KRX 종목 뒤에 합성 종목을 붙여 시장별 --listing-size 개 (실제 KOSPI/KOSDAQ 규모)
+  업종은 symbols.csv 종목은 그 섹터, 합성 종목은 코드별로 고정된 symbols.csv 섹터 중 하나
+- OpenAI   POST /v1/chat/completions (stream=True 면 SSE 청크)
+- 녹화본이 없는 종목은 data/symbols.csv 를 바탕으로 종목별로 고정된 합성 응답을 만든다
+  (네이버 HTML 은 bench/fixtures/<코드>.html, 없으면 bench_naver_html.synthetic_page)
+- 지연/오류 주입: --latency naver_json=40,openai=1200 (ms, 로그정규 지터) / --errors naver_json=0.05:empty,finnhub=0.02:500
+  오류 종류: 500, 429, empty(빈 본문 200), timeout(응답 지연 30초)
+  배치 요약 항목 단위 오류: --errors openai_items=0.2:partial (항목마다 20% 확률로 필드 누락)
+- GET /_stub/stats 로 라우트·상태별 호출 수, POST /_stub/reset 으로 초기화
+
+    cd backend && python bench/upstream_stub.py serve --port 9100 [--latency ...] [--errors ...]
+    cd backend && python bench/upstream_stub.py record --symbols 005930,AAPL   # 실제 API 응답 녹화 (.env 키 사용)
+
+백엔드를 스텁으로 돌리려면:
+    FINNHUB_BASE_URL=http://127.0.0.1:9100/api/v1 NAVER_JSON_URL=http://127.0.0.1:9100/service/itemSummary.nhn \\
+    NAVER_HTML_URL='http://127.0.0.1:9100/item/main.naver?code={itemcode}' OPENAI_BASE_URL=http://127.0.0.1:9100/v1
+(bench/loadtest.py 가 이 설정으로 두 서버를 띄운다)
+"""
+import argparse, asyncio, csv, hashlib, json, os, random, sys, threading, time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+UPSTREAM_FIXTURES = os.path.join(FIXTURE_DIR, "upstream.json")
+SYMBOLS_CSV = os.path.join(BACKEND_DIR, "data", "symbols.csv")
+
+ROUTES = ("finnhub", "naver_json", "naver_html", "naver_listing", "openai")
+ERROR_KINDS = ("500", "429", "empty", "timeout", "partial")
+# field_submit 항목 id → 목록 머리글 (네이버 표시 순서)
+LISTING_FIELDS = {"market_sum": "시가총액", "per": "PER", "pbr": "PBR", "roe": "ROE", "eps": "EPS"}
+
+# -----------------------------
+# 녹화본 / 합성 응답
+# -----------------------------
+def _seed(*parts: str) -> random.Random:
+    return random.Random(int(hashlib.md5("|".join(parts).encode()).hexdigest()[:8], 16))
+
+def load_symbols() -> List[Dict[str, str]]:
+    with open(SYMBOLS_CSV, encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+class Fixtures:
+    """upstream.json (녹화본) 우선, 없으면 종목별로 고정된 합성 응답"""
+    def __init__(self, path: str = UPSTREAM_FIXTURES):
+        data = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        self.search: Dict[str, list] = data.get("finnhub_search", {})
+        self.metric: Dict[str, dict] = data.get("finnhub_metric", {})
+        self.naver_json: Dict[str, dict] = data.get("naver_json", {})
+        self.openai: Dict[str, str] = data.get("openai", {})
+        self.symbols = load_symbols()
+        self.name_en = {r["name_ko"]: r["name_en"] for r in self.symbols}
+        self._html: Dict[str, str] = {}
+        self._html_lock = threading.Lock()
+
+    def search_result(self, q: str) -> list:
+        key = q.strip().lower()
+        if key in self.search:
+            return self.search[key]
+        hits = [r for r in self.symbols if key and (key in r["name_en"].lower() or key == r["symbol"].lower())]
+        if hits:
+            return [{"description": r["name_en"].upper(), "displaySymbol": r["symbol"], "symbol": r["symbol"],
+                     "type": "Common Stock"} for r in hits[:10]]
+        # 모르는 이름도 결과 하나는 돌려준다 (검색 → 지표 경로를 끝까지 태우기 위해)
+        sym = "".join(ch for ch in q.upper() if ch.isalnum())[:5] or "STUB"
+        return [{"description": q.upper() + " INC", "displaySymbol": sym, "symbol": sym, "type": "Common Stock"}]
+
+    def metric_result(self, symbol: str) -> dict:
+        if symbol in self.metric:
+            return {"metric": self.metric[symbol], "metricType": "all", "symbol": symbol}
+        rnd = _seed("metric", symbol)
+        metric = {
+            "peTTM": round(rnd.uniform(4, 60), 2),
+            "pbAnnual": round(rnd.uniform(0.3, 12), 2),
+            "roeTTM": round(rnd.uniform(-5, 45), 2),
+            "currentPrice": round(rnd.uniform(10, 900), 2),
+        }
+        # 실제 응답처럼 수백 개 키를 채워 파싱 비용을 비슷하게 맞춘다
+        metric.update({f"field{i}": round(rnd.uniform(-100, 100), 4) for i in range(120)})
+        return {"metric": metric, "metricType": "all", "symbol": symbol}
+
+    def naver_json_result(self, code: str) -> dict:
+        if code in self.naver_json:
+            return self.naver_json[code]
+        rnd = _seed("naver", code)
+        eps = rnd.randint(100, 20000)
+        return {
+            "marketSum": rnd.randint(1000, 4000000), "per": round(rnd.uniform(3, 40), 2), "eps": eps,
+            "pbr": round(rnd.uniform(0.2, 5), 2), "now": rnd.randint(1000, 900000), "diff": rnd.randint(-5000, 5000),
+            "rate": round(rnd.uniform(-5, 5), 2), "quant": rnd.randint(1000, 9000000), "amount": rnd.randint(10, 90000),
+            "high": 0, "low": 0, "risefall": 2,
+        }
+
+    def listing(self, market: str, size: int) -> List[Dict[str, str]]:
+        """시장별 목록 종목 (symbols.csv 종목 + 합성 종목으로 size 개)"""
+        rows = [{"code": r["code"], "name": r["name_ko"]} for r in self.symbols if r["market"] == market]
+        base = 900000 if market == "KS" else 950000
+        rows += [{"code": f"{base + i:06d}", "name": f"합성종목{base + i}"} for i in range(max(0, size - len(rows)))]
+        return rows
+
+    def listing_page(self, market: str, size: int, page: int, fields: List[str]) -> str:
+        """네이버 시가총액 목록 페이지 (table.type_2, 한 페이지 50 종목). fields: field_submit 으로 고른 항목"""
+        rows = self.listing(market, size)
+        last = max(1, (len(rows) + 49) // 50)
+        cols = [c for c in LISTING_FIELDS if c in fields] or ["market_sum", "per", "roe"]
+        head = "".join(f'<th scope="col">{h}</th>' for h in
+                       ["N", "종목명", "현재가", "전일비", "등락률", "액면가"] + [LISTING_FIELDS[c] for c in cols] + ["토론실"])
+        body = []
+        for n, row in enumerate(rows[(page - 1) * 50:page * 50], start=(page - 1) * 50 + 1):
+            js = self.naver_json_result(row["code"])
+            rnd = _seed("listing", row["code"])
+            values = {
+                "market_sum": f"{js['marketSum']:,}", "per": f"{js['per']:.2f}", "pbr": f"{js['pbr']:.2f}",
+                "roe": f"{js['pbr'] / js['per'] * 100:.2f}", "eps": f"{js['eps']:,}",
+            }
+            if rnd.random() < 0.03:  # 일부 종목은 실제처럼 N/A
+                values[rnd.choice(["per", "roe"])] = "N/A"
+            cells = "".join(f'<td class="number">{values[c]}</td>' for c in cols)
+            body.append(
+                f'<tr onMouseOver="mouseOver(this)"><td class="no">{n}</td>'
+                f'<td><a href="/item/main.naver?code={row["code"]}" class="tltle">{row["name"]}</a></td>'
+                f'<td class="number">{js["now"]:,}</td><td class="number">{abs(js["diff"]):,}</td>'
+                f'<td class="number">{js["rate"]:+.2f}%</td><td class="number">100</td>{cells}'
+                f'<td class="center"><a href="/item/board.naver?code={row["code"]}">토론</a></td></tr>'
+            )
+        sosok = 0 if market == "KS" else 1
+        nav = f'<td class="pgRR"><a href="/sise/sise_market_sum.naver?sosok={sosok}&amp;page={last}">맨뒤</a></td>' if page < last else ""
+        return (f'<html><body><table class="type_2" summary="시가총액 리스트"><thead><tr>{head}</tr></thead>'
+                f'<tbody>{"".join(body)}</tbody></table><table class="Nnavi"><tr>{nav}</tr></table></body></html>')
+
+    def industries(self, listing_size: Dict[str, int]) -> List[Tuple[str, List[Dict[str, str]]]]:
+        """[(업종명, 구성 종목)] - 두 시장 목록 종목 전체를 업종으로 나눈다"""
+        sector = {r["code"]: r["sector"] for r in self.symbols if r.get("sector")}
+        names = sorted(set(sector.values()))
+        groups: Dict[str, List[Dict[str, str]]] = {n: [] for n in names}
+        for market, size in listing_size.items():
+            for row in self.listing(market, size):
+                name = sector.get(row["code"]) or _seed("industry", row["code"]).choice(names)
+                groups[name].append(row)
+        return list(groups.items())
+
+    def industry_list_page(self, groups: List[Tuple[str, List[Dict[str, str]]]]) -> str:
+        """업종별 시세 목록 (table.type_1, 업종 번호는 목록 순서)"""
+        body = "".join(
+            f'<tr><td style="padding-left:10px;"><a href="/sise/sise_group_detail.naver?type=upjong&no={no}">{name}</a>'
+            f'</td><td class="number"><span class="tah p11 red01">+0.00%</span></td></tr>'
+            for no, (name, _) in enumerate(groups, start=1)
+        )
+        return f'<html><body><table class="type_1" summary="업종별 시세 리스트">{body}</table></body></html>'
+
+    def industry_page(self, members: List[Dict[str, str]]) -> str:
+        """업종 구성 종목 (table.type_5)"""
+        body = "".join(
+            f'<tr><td class="name"><div class="name_area"><a href="/item/main.naver?code={r["code"]}">{r["name"]}</a>'
+            f'</div></td><td class="number">0</td></tr>'
+            for r in members
+        )
+        return f'<html><body><table class="type_5" summary="업종별 시세 리스트">{body}</table></body></html>'
+
+    def naver_html_result(self, code: str) -> str:
+        with self._html_lock:
+            html = self._html.get(code)
+        if html is None:
+            path = os.path.join(FIXTURE_DIR, f"{code}.html")
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    html = f.read()
+            else:
+                from bench_naver_html import synthetic_page
+                html = synthetic_page(int(code) if code.isdigit() else 0)
+            with self._html_lock:
+                self._html[code] = html
+        return html
+
+    def completion(self, prompt: str, drop: Optional[Callable[[], bool]] = None) -> str:
+        if "english_name" in prompt:
+            # 번역 프롬프트: "한국어 종목명: "..."" 에서 이름을 꺼낸다
+            name = prompt.split('한국어 종목명: "', 1)[-1].split('"', 1)[0]
+            if name in self.openai:
+                return self.openai[name]
+            return json.dumps({"english_name": self.name_en.get(name, name)}, ensure_ascii=False)
+        if "summary" in self.openai:
+            return self.openai["summary"]
+        if "[종목 목록]" in prompt:
+            # 배치 요약 프롬프트: 목록의 JSON 줄마다 한 항목
+            entries = [json.loads(line) for line in prompt.split("[종목 목록]", 1)[1].splitlines()
+                       if line.startswith("{")]
+            items = [dict(json.loads(self.summary(e["company"])), id=e["id"]) for e in entries]
+            if drop:
+                for item in items:
+                    if drop():
+                        item.pop("caution")
+            return json.dumps({"items": items}, ensure_ascii=False)
+        return self.summary(prompt.split("회사명:", 1)[-1].split("\n", 1)[0].strip())
+
+    def summary(self, company: str) -> str:
+        return json.dumps({
+            "investment_advice": f"{company}의 ROE·PER·PBR 조합을 보면 분할 매수로 접근하는 것이 좋다. 밸류에이션 부담을 확인하자.",
+            "recent_news_strategy": f"{company}의 최근 실적 발표와 업황 뉴스를 확인하고, 변동성이 큰 구간에서는 비중을 조절하자.",
+            "rpg_title_desc": f"{company}는 지표 조합에 맞는 캐릭터로서 자신의 역할을 수행하고 있다.",
+            "caution": "단기 변동성과 지표 결측 가능성에 유의해야 한다.",
+            "advantage": "핵심 지표가 업종 평균 대비 안정적이다.",
+        }, ensure_ascii=False)
+
+# -----------------------------
+# 지연 / 오류 주입
+# -----------------------------
+def parse_latency(spec: Optional[str]) -> Dict[str, float]:
+    """'naver_json=40,openai=1200' → 초 단위 중앙값"""
+    out = {}
+    for part in filter(None, (spec or "").split(",")):
+        name, _, ms = part.partition("=")
+        out[name.strip()] = float(ms) / 1000
+    return out
+
+def parse_errors(spec: Optional[str]) -> Dict[str, Tuple[float, str]]:
+    """'naver_json=0.05:empty,finnhub=0.02' → {route: (비율, 종류)}"""
+    out = {}
+    for part in filter(None, (spec or "").split(",")):
+        name, _, rest = part.partition("=")
+        rate, _, kind = rest.partition(":")
+        kind = kind or "500"
+        if kind not in ERROR_KINDS:
+            raise ValueError(f"unknown error kind '{kind}' (use {', '.join(ERROR_KINDS)})")
+        out[name.strip()] = (float(rate), kind)
+    return out
+
+class Injector:
+    def __init__(self, latency: Dict[str, float], errors: Dict[str, Tuple[float, str]], jitter: float, seed: int):
+        self.latency = latency
+        self.errors = errors
+        self.jitter = jitter
+        self._rnd = random.Random(seed)
+
+    def delay(self, route: str) -> float:
+        base = self.latency.get(route, 0.0)
+        if base <= 0:
+            return 0.0
+        return base * self._rnd.lognormvariate(0, self.jitter) if self.jitter else base
+
+    def error(self, route: str) -> Optional[str]:
+        rate, kind = self.errors.get(route, (0.0, ""))
+        return kind if rate and self._rnd.random() < rate else None
+
+# -----------------------------
+# 스텁 앱
+# -----------------------------
+def create_app(fixtures: Fixtures, injector: Injector, listing_size: Optional[Dict[str, int]] = None):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+    app = FastAPI(title="upstream stub")
+    calls: Counter = Counter()
+
+    async def inject(route: str) -> Optional[Response]:
+        """지연 후, 오류를 주입할 차례면 그 응답을 돌려준다"""
+        kind = injector.error(route)
+        calls[(route, kind or "ok")] += 1
+        delay = injector.delay(route)
+        if kind == "timeout":
+            delay = 30.0
+        if delay:
+            await asyncio.sleep(delay)
+        if kind == "500":
+            return PlainTextResponse("stub error", status_code=500)
+        if kind == "429":
+            return PlainTextResponse("rate limited", status_code=429)
+        if kind == "empty":
+            return Response(b"", status_code=200)
+        return None
+
+    @app.get("/api/v1/search")
+    async def search(q: str = ""):
+        return await inject("finnhub") or JSONResponse({"count": 1, "result": fixtures.search_result(q)})
+
+    @app.get("/api/v1/stock/metric")
+    async def metric(symbol: str = ""):
+        return await inject("finnhub") or JSONResponse(fixtures.metric_result(symbol))
+
+    @app.get("/service/itemSummary.nhn")
+    async def item_summary(itemcode: str = ""):
+        return await inject("naver_json") or JSONResponse(fixtures.naver_json_result(itemcode))
+
+    @app.get("/item/main.naver")
+    async def item_main(code: str = ""):
+        return await inject("naver_html") or Response(fixtures.naver_html_result(code), media_type="text/html; charset=utf-8")
+
+    listing_size = listing_size or {"KS": 950, "KQ": 1700}
+
+    @app.get("/sise/field_submit.naver")
+    async def field_submit(request: Request):
+        fields = request.query_params.getlist("fieldIds")
+        resp = Response(status_code=302, headers={"Location": request.query_params.get("returnUrl", "/")})
+        resp.set_cookie("field_list", "|".join(fields))
+        return resp
+
+    @app.get("/sise/sise_market_sum.naver")
+    async def market_sum(request: Request, sosok: int = 0, page: int = 1):
+        failed = await inject("naver_listing")
+        if failed is not None:
+            return failed
+        fields = [f for f in request.cookies.get("field_list", "").split("|") if f]
+        market = "KS" if sosok == 0 else "KQ"
+        return Response(fixtures.listing_page(market, listing_size[market], page, fields),
+                        media_type="text/html; charset=utf-8")
+
+    industries = fixtures.industries(listing_size)
+
+    @app.get("/sise/sise_group.naver")
+    async def industry_list(type: str = "upjong"):
+        return await inject("naver_listing") or Response(fixtures.industry_list_page(industries),
+                                                         media_type="text/html; charset=utf-8")
+
+    @app.get("/sise/sise_group_detail.naver")
+    async def industry_detail(type: str = "upjong", no: int = 0):
+        failed = await inject("naver_listing")
+        if failed is not None:
+            return failed
+        members = industries[no - 1][1] if 0 < no <= len(industries) else []
+        return Response(fixtures.industry_page(members), media_type="text/html; charset=utf-8")
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        prompt = "".join(m.get("content") or "" for m in body.get("messages", []))
+        content = fixtures.completion(prompt, drop=lambda: injector.error("openai_items") == "partial")
+        model = body.get("model", "gpt-4")
+        created = int(time.time())
+        if not body.get("stream"):
+            failed = await inject("openai")
+            if failed is not None:
+                return failed
+            return JSONResponse({
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt) // 2, "completion_tokens": len(content) // 2,
+                          "total_tokens": (len(prompt) + len(content)) // 2},
+            })
+
+        # 스트리밍: 주입 지연을 첫 토큰 전 20% / 청크 사이 80% 로 나눈다
+        kind = injector.error("openai")
+        calls[("openai", kind or "ok")] += 1
+        if kind in ("500", "429"):
+            return PlainTextResponse("stub error", status_code=int(kind))
+        total = injector.delay("openai")
+        pieces = [content[i:i + 6] for i in range(0, len(content), 6)]
+
+        async def events():
+            await asyncio.sleep(total * 0.2)
+            for piece in pieces:
+                chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(total * 0.8 / max(len(pieces), 1))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/_stub/stats")
+    def stats():
+        by_route: Dict[str, Dict[str, int]] = {}
+        for (route, outcome), n in calls.items():
+            by_route.setdefault(route, {})[outcome] = n
+        return {"calls": by_route, "total": sum(calls.values())}
+
+    @app.post("/_stub/reset")
+    def reset():
+        calls.clear()
+        return {"ok": True}
+
+    @app.get("/_stub/health")
+    def health():
+        return {"ok": True}
+
+    return app
+
+# -----------------------------
+# 녹화
+# -----------------------------
+def record(symbols: List[str], path: str = UPSTREAM_FIXTURES) -> None:
+    """실제 Finnhub/네이버 응답을 upstream.json 에 추가 (HTML 은 bench_naver_html --save 와 같은 위치)"""
+    import requests
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(BACKEND_DIR, ".env"))
+    token = os.getenv("FINNHUB_API_KEY")
+    data: Dict[str, Any] = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    for key in ("finnhub_search", "finnhub_metric", "naver_json", "openai"):
+        data.setdefault(key, {})
+    ua = {"User-Agent": "Mozilla/5.0"}
+    by_symbol = {r["symbol"]: r for r in load_symbols()}
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for sym in symbols:
+        row = by_symbol.get(sym) or by_symbol.get(f"{sym}.KS") or by_symbol.get(f"{sym}.KQ")
+        code = sym.split(".")[0]
+        if code.isdigit():
+            js = requests.get("https://api.finance.naver.com/service/itemSummary.nhn", params={"itemcode": code},
+                              headers=ua, timeout=10)
+            if js.content:
+                data["naver_json"][code] = js.json()
+            html = requests.get(f"https://finance.naver.com/item/main.naver?code={code}", headers=ua, timeout=10)
+            with open(os.path.join(FIXTURE_DIR, f"{code}.html"), "w", encoding="utf-8") as f:
+                f.write(html.text)
+            print(f"recorded naver {code}")
+            continue
+        if not token:
+            print(f"skip {sym}: FINNHUB_API_KEY 없음")
+            continue
+        m = requests.get("https://finnhub.io/api/v1/stock/metric", params={"symbol": sym, "metric": "all", "token": token}, timeout=10)
+        data["finnhub_metric"][sym] = (m.json() or {}).get("metric", {})
+        q = row["name_en"] if row else sym
+        s = requests.get("https://finnhub.io/api/v1/search", params={"q": q, "token": token}, timeout=10)
+        data["finnhub_search"][q.lower()] = (s.json() or {}).get("result", [])
+        print(f"recorded finnhub {sym}")
+        time.sleep(1.1)  # 무료 키 분당 60회
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    print(f"saved {path}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sv = sub.add_parser("serve")
+    sv.add_argument("--host", default="127.0.0.1")
+    sv.add_argument("--port", type=int, default=9100)
+    sv.add_argument("--latency", help="라우트별 중앙 지연(ms): finnhub=80,naver_json=40,naver_html=150,openai=1200")
+    sv.add_argument("--jitter", type=float, default=0.3, help="로그정규 지터 sigma (0 이면 고정 지연)")
+    sv.add_argument("--errors", help="라우트별 오류 비율: naver_json=0.05:empty,finnhub=0.02:500")
+    sv.add_argument("--seed", type=int, default=0)
+    sv.add_argument("--listing-size", default="KS=950,KQ=1700", help="시가총액 목록 시장별 종목 수")
+    rc = sub.add_parser("record")
+    rc.add_argument("--symbols", required=True, help="쉼표로 구분 (005930,AAPL)")
+    args = ap.parse_args()
+
+    if args.cmd == "record":
+        record([s.strip() for s in args.symbols.split(",") if s.strip()])
+        return
+
+    import uvicorn
+    injector = Injector(parse_latency(args.latency), parse_errors(args.errors), args.jitter, args.seed)
+    listing_size = {k: int(v) for k, _, v in (p.partition("=") for p in args.listing_size.split(","))}
+    uvicorn.run(create_app(Fixtures(), injector, listing_size), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+업스트림 장애 격리 (circuit breaker) + 지연 대비 헤지 요청.
+
+- CircuitBreaker: 연속 실패가 기준을 넘으면 일정 시간(open) 동안 호출을 바로 거절(CircuitOpen)하고,
+  쿨다운 뒤 한 건만 시험 호출(half_open)해 성공하면 다시 닫는다. slow_sec 보다 오래 걸린 호출도 실패로 센다.
+  지연은 rate_governor 토큰 대기를 뺀 시간 (트랜스포트가 note_queued 로 알려 준다). RateLimitExceeded 는 실패가 아님
+  breakers["finnhub"] / breakers["naver_json"] / breakers["naver_html"]
+  BREAKER_FAILURES, BREAKER_COOLDOWN_SEC, BREAKER_SLOW_<이름> 으로 조정
+- Hedge: 주 요청이 최근 지연 분위수(p95) 안에 끝나지 않으면 보조 요청을 동시에 보내고 먼저 끝난 쪽을 쓴다
+"""
+import os, time, asyncio, threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from rate_governor import RateLimitExceeded
+from telemetry import get_logger
+
+log = get_logger("circuit")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# guard 블록 안에서 토큰 버킷을 기다린 시간 (초). 리스트 하나를 공유해 asyncio.to_thread / 태스크에서도 더해진다
+_queued: ContextVar[Optional[List[float]]] = ContextVar("breaker_queued", default=None)
+
+def note_queued(seconds: float) -> None:
+    """토큰 대기 시간 보고 (http_pool 트랜스포트/어댑터에서) - 감싼 guard 의 지연 계산에서 뺀다"""
+    cell = _queued.get()
+    if cell is not None:
+        cell[0] += seconds
+
+class CircuitOpen(Exception):
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"circuit '{name}' open (retry in {retry_in:.1f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    def __init__(self, name: str, failures: int = 5, cooldown: float = 30.0, slow_sec: Optional[float] = None):
+        self.name = name
+        self.failures = failures
+        self.cooldown = cooldown
+        self.slow_sec = slow_sec
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._last_error: Optional[str] = None
+        self._counters = {"calls": 0, "successes": 0, "failures": 0, "slow": 0, "rejected": 0, "opened": 0}
+
+    # -----------------------------
+    # 상태 전이
+    # -----------------------------
+    def _retry_in(self) -> float:
+        return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._retry_in() == 0.0:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> None:
+        """호출 가능하면 통과, 아니면 CircuitOpen"""
+        with self._lock:
+            if self._state == OPEN and self._retry_in() == 0.0:
+                self._state = HALF_OPEN
+            if self._state == CLOSED or (self._state == HALF_OPEN and not self._probing):
+                self._probing = self._state == HALF_OPEN
+                self._counters["calls"] += 1
+                return
+            self._counters["rejected"] += 1
+            retry_in = self._retry_in()
+        raise CircuitOpen(self.name, retry_in)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._counters["successes"] += 1
+            self._consecutive = 0
+            self._probing = False
+            self._state = CLOSED
+
+    def record_failure(self, error: str = "") -> None:
+        with self._lock:
+            self._counters["failures"] += 1
+            self._consecutive += 1
+            self._last_error = error or None
+            # 이미 열린 뒤 늦게 끝난 호출의 실패는 쿨다운을 다시 늘리지 않는다
+            if self._state != OPEN and (self._state == HALF_OPEN or self._consecutive >= self.failures):
+                self._counters["opened"] += 1
+                log.warning("circuit.open", breaker=self.name, cooldown=self.cooldown, error=error)
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self) -> None:
+        """결과 없이 끝난 호출 (빠르게 취소된 경우) - 시험 호출 자리만 돌려준다"""
+        with self._lock:
+            self._probing = False
+
+    @contextmanager
+    def guard(self):
+        """with breaker.guard(): 블록 안의 예외·지연을 실패로 기록 (동기/비동기 본문 모두 사용 가능)"""
+        self.allow()
+        cell = [0.0]
+        token = _queued.set(cell)
+        start = time.monotonic()
+        try:
+            yield
+        except RateLimitExceeded:
+            # 우리 쪽 속도 제한으로 보내지도 못한 호출 - 업스트림 상태와 무관
+            self.release()
+            raise
+        except Exception as e:
+            self.record_failure(f"{type(e).__name__}: {e}"[:200])
+            raise
+        except BaseException:
+            # 취소(헤지 패배, 단계 타임아웃)는 이미 slow_sec 을 넘긴 경우에만 실패로 본다
+            if self.slow_sec is not None and time.monotonic() - start - cell[0] > self.slow_sec:
+                self._count_slow()
+                self.record_failure("cancelled after slow call")
+            else:
+                self.release()
+            raise
+        finally:
+            _queued.reset(token)
+        elapsed = time.monotonic() - start - cell[0]
+        if self.slow_sec is not None and elapsed > self.slow_sec:
+            self._count_slow()
+            self.record_failure(f"slow call {elapsed:.1f}s")
+        else:
+            self.record_success()
+
+    def _count_slow(self) -> None:
+        with self._lock:
+            self._counters["slow"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._state
+            if state == OPEN and self._retry_in() == 0.0:
+                state = HALF_OPEN
+            return dict(
+                self._counters,
+                state=state,
+                consecutive_failures=self._consecutive,
+                retry_in=round(self._retry_in(), 1) if state == OPEN else None,
+                last_error=self._last_error,
+                failures_to_open=self.failures,
+                cooldown=self.cooldown,
+                slow_sec=self.slow_sec,
+            )
+
+# 호출이 이 시간보다 오래 걸리면 (정상 응답이어도) 실패로 센다
+DEFAULT_SLOW_SEC = {"finnhub": 5.0, "naver_json": 2.0, "naver_html": 4.0}
+
+def _make_breakers() -> Dict[str, CircuitBreaker]:
+    failures = int(os.getenv("BREAKER_FAILURES", "5"))
+    cooldown = float(os.getenv("BREAKER_COOLDOWN_SEC", "30"))
+    return {
+        name: CircuitBreaker(name, failures, cooldown, float(os.getenv(f"BREAKER_SLOW_{name.upper()}", slow)))
+        for name, slow in DEFAULT_SLOW_SEC.items()
+    }
+
+breakers = _make_breakers()
+
+# -----------------------------
+# 헤지 요청
+# -----------------------------
+def _result(task: asyncio.Future) -> Any:
+    return task.result() if task.done() and not task.cancelled() else None
+
+class Hedge:
+    """주 요청 지연의 분위수를 추적해 보조 요청을 보낼 시점을 정한다"""
+    def __init__(self, name: str, quantile: float = 0.95, min_delay: float = 0.3, max_delay: float = 2.5,
+                 default_delay: float = 1.0, window: int = 200, min_samples: int = 20):
+        self.name = name
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._counters = {
+            "runs": 0, "primary_only": 0, "fallback": 0, "hedged": 0,
+            "primary_wins": 0, "backup_wins": 0, "merged": 0,
+        }
+
+    def delay(self) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        q = samples[min(len(samples) - 1, int(self.quantile * len(samples)))]
+        return min(self.max_delay, max(self.min_delay, q))
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def _count(self, *names: str) -> None:
+        with self._lock:
+            for name in names:
+                self._counters[name] += 1
+
+    async def run(self, primary: Callable[[], Awaitable[Any]], backup: Callable[[Any], Awaitable[Any]],
+                  complete: Callable[[Any], bool]) -> Tuple[Any, Any]:
+        """(주 결과, 보조 결과). 결과는 None 일 수 있고, 쓰이지 않은 쪽은 None.
+        - 주 요청이 deadline 안에 끝나고 complete 면 보조 요청 없음
+        - deadline 안에 끝났지만 부족하면 보조 요청을 이어서 (backup(주 결과))
+        - deadline 을 넘기면 보조 요청(backup(None))을 동시에 보내고, 먼저 complete 한 쪽을 쓰고 나머지는 취소
+        """
+        self._count("runs")
+        deadline = self.delay()
+        start = time.monotonic()
+        p_task = asyncio.ensure_future(primary())
+        b_task = None
+        try:
+            done, _ = await asyncio.wait({p_task}, timeout=deadline)
+            if done:
+                first = p_task.result()
+                if first is not None:
+                    self.observe(time.monotonic() - start)
+                if complete(first):
+                    self._count("primary_only")
+                    return first, None
+                self._count("fallback")
+                return first, await backup(first)
+
+            self._count("hedged")
+            b_task = asyncio.ensure_future(backup(None))
+            pending = {p_task, b_task}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if p_task in done and p_task.result() is not None:
+                    self.observe(time.monotonic() - start)
+                for task in done:
+                    if complete(task.result()):
+                        self._count("primary_wins" if task is p_task else "backup_wins")
+                        # 먼저 끝나 있던 쪽 결과도 함께 돌려준다 (부족한 값 보충용)
+                        return _result(p_task), _result(b_task)
+            # 둘 다 부족 - 합쳐서 쓴다
+            self._count("merged")
+            return p_task.result(), b_task.result()
+        finally:
+            for task in (p_task, b_task):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self._counters)
+            n = len(self._samples)
+        c["backup_win_rate"] = round(c["backup_wins"] / c["hedged"], 4) if c["hedged"] else None
+        c["delay"] = round(self.delay(), 3)
+        c["samples"] = n
+        return c
+
+naver_hedge = Hedge(
+    "naver",
+    quantile=float(os.getenv("NAVER_HEDGE_QUANTILE", "0.95")),
+    min_delay=float(os.getenv("NAVER_HEDGE_MIN_SEC", "0.3")),
+    max_delay=float(os.getenv("NAVER_HEDGE_MAX_SEC", "2.5")),
+)
+
+def stats() -> Dict[str, Any]:
+    return {
+        "breakers": {name: b.stats() for name, b in breakers.items()},
+        "hedge": {"naver": naver_hedge.stats()},
+    }
@@ -0,0 +1,154 @@
+"""
+스냅샷/이력 일괄 내보내기 - Arrow IPC 스트림 / Parquet / gzip CSV.
+
+- 입력은 컬럼 배열 묶음(Dict[str, np.ndarray]) chunk 의 이터레이터. chunk 마다 바로 인코딩해 나온 바이트를 흘려보낸다
+  (행 단위 dict 를 만들지 않고, 메모리에는 chunk 하나와 인코더 버퍼만 - 내보내는 행 수와 무관하게 일정)
+- arrow: RecordBatch 스트림, parquet: chunk 하나가 row group 하나, csv: chunk 별 CSV 를 zlib(gzip) 으로 이어서 압축
+- arrow / parquet 는 pyarrow 가 설치된 경우만 (선택 의존성, 첫 사용 시 import). csv 는 pandas 만 있으면 된다
+"""
+import importlib.util, os, threading, time, zlib
+from typing import Dict, Iterator, Sequence
+
+import numpy as np
+
+from telemetry import get_logger
+
+log = get_logger("export")
+
+Chunk = Dict[str, np.ndarray]
+
+# 형식 → (media type, 파일 확장자)
+FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "csv": ("application/gzip", "csv.gz"),
+}
+
+def available(fmt: str) -> bool:
+    return fmt == "csv" or importlib.util.find_spec("pyarrow") is not None
+
+def take(columns: Dict[str, np.ndarray], indices: np.ndarray, names: Sequence[str], chunk_rows: int) -> Iterator[Chunk]:
+    """indices 행의 names 컬럼을 chunk_rows 개씩 (행이 없어도 빈 chunk 하나 - 형식별 스키마/헤더용)"""
+    for lo in range(0, max(len(indices), 1), chunk_rows):
+        idx = indices[lo:lo + chunk_rows]
+        yield {n: columns[n][idx] for n in names}
+
+class _Sink:
+    """pyarrow 가 쓰는 파일 객체 - 쓴 바이트를 모아 두었다가 chunk 마다 비운다"""
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+def _record_batch(chunk: Chunk):
+    import pyarrow as pa
+    arrays = [
+        pa.array(v, type=pa.timestamp("ms", tz="UTC")) if v.dtype.kind == "M" else pa.array(v)
+        for v in chunk.values()
+    ]
+    return pa.RecordBatch.from_arrays(arrays, names=list(chunk))
+
+def _arrow(chunks: Iterator[Chunk]) -> Iterator[bytes]:
+    import pyarrow as pa
+    sink = _Sink()
+    writer = None
+    for chunk in chunks:
+        batch = _record_batch(chunk)
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, batch.schema)
+        writer.write_batch(batch)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+    yield sink.drain()
+
+def _parquet(chunks: Iterator[Chunk]) -> Iterator[bytes]:
+    import pyarrow.parquet as pq
+    sink = _Sink()
+    writer = None
+    for chunk in chunks:
+        batch = _record_batch(chunk)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, batch.schema, compression="zstd")
+        writer.write_batch(batch)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+    yield sink.drain()
+
+def _csv(chunks: Iterator[Chunk]) -> Iterator[bytes]:
+    import pandas as pd
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip 헤더
+    header = True
+    for chunk in chunks:
+        text = pd.DataFrame(chunk, copy=False).to_csv(index=False, header=header, na_rep="", lineterminator="\n")
+        header = False
+        yield z.compress(text.encode("utf-8"))
+    yield z.flush()
+
+_ENCODERS = {"arrow": _arrow, "parquet": _parquet, "csv": _csv}
+
+class Exporter:
+    def __init__(self, chunk_rows: int = 65536):
+        self.chunk_rows = chunk_rows
+        self._lock = threading.Lock()
+        self._counters = {"exports": 0, "rows": 0, "bytes": 0, "errors": 0}
+        self._by_format = {f: 0 for f in FORMATS}
+
+    def stream(self, fmt: str, chunks: Iterator[Chunk], label: str = "") -> Iterator[bytes]:
+        """chunk 이터레이터 → 인코딩된 바이트 조각 (StreamingResponse 본문)"""
+        started = time.perf_counter()
+        counts = {"rows": 0, "bytes": 0}
+
+        def counted() -> Iterator[Chunk]:
+            for chunk in chunks:
+                counts["rows"] += len(next(iter(chunk.values()))) if chunk else 0
+                yield chunk
+
+        ok = False
+        try:
+            for data in _ENCODERS[fmt](counted()):
+                if data:
+                    counts["bytes"] += len(data)
+                    yield data
+            ok = True
+        finally:
+            with self._lock:
+                self._counters["exports"] += 1
+                self._counters["rows"] += counts["rows"]
+                self._counters["bytes"] += counts["bytes"]
+                self._counters["errors"] += 0 if ok else 1
+                self._by_format[fmt] += 1
+            log.info("export.done", dataset=label, format=fmt, ok=ok, rows=counts["rows"], bytes=counts["bytes"],
+                     elapsed=round(time.perf_counter() - started, 3))
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            c: Dict[str, object] = dict(self._counters)
+            c["by_format"] = dict(self._by_format)
+        c["chunk_rows"] = self.chunk_rows
+        c["pyarrow"] = available("arrow")
+        return c
+
+exporter = Exporter(chunk_rows=int(os.getenv("EXPORT_CHUNK_ROWS", "65536")))
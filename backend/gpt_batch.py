@@ -0,0 +1,203 @@
+"""
+여러 종목의 GPT 요약을 completion 한 번으로 (배치 생성).
+
+- 긴 지시문은 배치마다 한 번만 보내고, 종목별 입력 (company, roe, per, pbr, rpg_title, rpg_desc) 은 id 를 붙여 나열
+- 응답 {"items": [{"id": ..., ...}, ...]} 은 항목마다 요약 스키마(SUMMARY_SCHEMA 에서 빈 문자열을 막은 것)로 검증하고,
+  검증에 실패했거나 빠진 항목만 모아 다음 라운드에 다시 요청한다 (GPT_BATCH_RETRIES 라운드)
+- 한 배치는 GPT_BATCH_MAX_ITEMS 개 이하, 예상 토큰(지시문 + 항목 입력 + 항목당 출력 예상치)이 GPT_BATCH_TOKEN_BUDGET 이하
+  출력 예상치 합계는 max_tokens 로도 넘겨 배치 하나가 예산 이상으로 길어지지 않게 한다
+- 동시에 보내는 배치 요청은 GPT_BATCH_CONCURRENCY 개까지
+"""
+import asyncio, copy, json, os, threading
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from telemetry import get_logger
+
+log = get_logger("gpt_batch")
+
+# (항목 입력 목록, max_tokens) → (응답 문자열, usage)
+RequestFn = Callable[[List[Dict[str, Any]], int], Awaitable[Tuple[str, Any]]]
+
+# -----------------------------
+# 스키마 검증 (SUMMARY_SCHEMA 가 쓰는 부분: object / array / string, required, min/maxItems, additionalProperties)
+# -----------------------------
+def item_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """문자열 필드에 minLength 1 을 더한 사본 - 배치 응답에서 빠진 필드가 빈 문자열로 채워지는 것을 잡는다"""
+    out = copy.deepcopy(schema)
+
+    def walk(node: Dict[str, Any]) -> None:
+        if node.get("type") == "string":
+            node.setdefault("minLength", 1)
+        for child in node.get("properties", {}).values():
+            walk(child)
+        if isinstance(node.get("items"), dict):
+            walk(node["items"])
+
+    walk(out)
+    return out
+
+def validate(value: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """스키마 위반 목록 (비어 있으면 통과)"""
+    kind = schema.get("type")
+    if kind == "object":
+        if not isinstance(value, dict):
+            return [f"{path}: object 가 아님"]
+        props = schema.get("properties", {})
+        errors = [f"{path}.{k}: 없음" for k in schema.get("required", []) if k not in value]
+        if schema.get("additionalProperties") is False:
+            errors += [f"{path}.{k}: 허용되지 않은 필드" for k in value if k not in props]
+        for key, sub in props.items():
+            if key in value:
+                errors += validate(value[key], sub, f"{path}.{key}")
+        return errors
+    if kind == "array":
+        if not isinstance(value, list):
+            return [f"{path}: array 가 아님"]
+        errors = []
+        if len(value) < schema.get("minItems", 0):
+            errors.append(f"{path}: 항목 {len(value)}개 < {schema['minItems']}")
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            errors.append(f"{path}: 항목 {len(value)}개 > {schema['maxItems']}")
+        if isinstance(schema.get("items"), dict):
+            for i, v in enumerate(value):
+                errors += validate(v, schema["items"], f"{path}[{i}]")
+        return errors
+    if kind == "string":
+        if not isinstance(value, str):
+            return [f"{path}: string 이 아님"]
+        if len(value.strip()) < schema.get("minLength", 0):
+            return [f"{path}: 비어 있음"]
+    return []
+
+# -----------------------------
+# 토큰 예산
+# -----------------------------
+def estimate_tokens(text: str) -> int:
+    """대략적인 토큰 수 (토크나이저 없이): ASCII 는 4자당 1, 한글 등은 글자당 1"""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+def pack(sizes: Sequence[int], header: int, budget: int, max_items: int) -> List[List[int]]:
+    """항목별 예상 토큰 sizes 를 순서대로 묶은 인덱스 목록. 혼자서도 예산을 넘는 항목은 단독 배치"""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = header
+    for i, size in enumerate(sizes):
+        if current and (len(current) >= max_items or used + size > budget):
+            batches.append(current)
+            current, used = [], header
+        current.append(i)
+        used += size
+    if current:
+        batches.append(current)
+    return batches
+
+# -----------------------------
+# 배치 실행
+# -----------------------------
+class BatchSummarizer:
+    def __init__(self, max_items: int = 8, token_budget: int = 8000, item_output_tokens: int = 500,
+                 concurrency: int = 3, retries: int = 1, timeout: float = 90.0):
+        self.max_items = max_items
+        self.token_budget = token_budget
+        self.item_output_tokens = item_output_tokens
+        self.concurrency = concurrency
+        self.retries = retries
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._counters = {
+            "runs": 0, "batches": 0, "request_errors": 0,
+            "items_ok": 0, "items_invalid": 0, "items_missing": 0, "items_retried": 0, "items_failed": 0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+        }
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    async def run(self, jobs: Dict[str, Dict[str, Any]], request: RequestFn,
+                  to_summary: Callable[[Dict[str, Any]], Dict[str, Any]], schema: Dict[str, Any],
+                  header_tokens: int) -> Dict[str, Dict[str, Any]]:
+        """jobs: id → 프롬프트에 넣을 항목 입력. 검증을 통과한 항목만 id → 요약 으로 돌려준다"""
+        self._count("runs")
+        done: Dict[str, Dict[str, Any]] = {}
+        pending = list(jobs)
+        sem = asyncio.Semaphore(self.concurrency)
+        for attempt in range(self.retries + 1):
+            if not pending:
+                break
+            if attempt:
+                self._count("items_retried", len(pending))
+                log.info("gpt_batch.retry", attempt=attempt, items=len(pending))
+            sizes = [estimate_tokens(json.dumps(jobs[i], ensure_ascii=False)) + self.item_output_tokens for i in pending]
+            batches = [[pending[k] for k in idx] for idx in pack(sizes, header_tokens, self.token_budget, self.max_items)]
+            for result in await asyncio.gather(*(self._one(ids, jobs, request, to_summary, schema, sem) for ids in batches)):
+                done.update(result)
+            pending = [i for i in pending if i not in done]
+        if pending:
+            self._count("items_failed", len(pending))
+            log.warning("gpt_batch.failed_items", items=len(pending))
+        return done
+
+    async def _one(self, ids: List[str], jobs: Dict[str, Dict[str, Any]], request: RequestFn,
+                   to_summary: Callable[[Dict[str, Any]], Dict[str, Any]], schema: Dict[str, Any],
+                   sem: asyncio.Semaphore) -> Dict[str, Dict[str, Any]]:
+        entries = [dict(jobs[i], id=i) for i in ids]
+        async with sem:
+            self._count("batches")
+            try:
+                content, usage = await asyncio.wait_for(request(entries, self.item_output_tokens * len(ids)), self.timeout)
+                data = json.loads(content)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._count("request_errors")
+                log.warning("gpt_batch.request_error", items=len(ids), error=f"{type(e).__name__}: {e}"[:200])
+                return {}
+        if usage is not None:
+            self._count("prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+            self._count("completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+        raw_items = data.get("items") if isinstance(data, dict) else data
+        wanted = set(ids)
+        out: Dict[str, Dict[str, Any]] = {}
+        invalid = set()
+        for raw in raw_items if isinstance(raw_items, list) else []:
+            if not isinstance(raw, dict):
+                continue
+            item_id = str(raw.get("id"))
+            if item_id not in wanted or item_id in out:
+                continue
+            summary = to_summary(raw)
+            errors = validate(summary, schema)
+            if errors:
+                invalid.add(item_id)
+                log.debug("gpt_batch.invalid_item", id=item_id, errors=errors[:3])
+                continue
+            out[item_id] = summary
+        self._count("items_ok", len(out))
+        invalid -= out.keys()
+        self._count("items_invalid", len(invalid))
+        self._count("items_missing", len(wanted) - len(out) - len(invalid))
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self._counters)
+        c.update({
+            "max_items": self.max_items,
+            "token_budget": self.token_budget,
+            "item_output_tokens": self.item_output_tokens,
+            "concurrency": self.concurrency,
+            "retries": self.retries,
+        })
+        return c
+
+batcher = BatchSummarizer(
+    max_items=int(os.getenv("GPT_BATCH_MAX_ITEMS", "8")),
+    token_budget=int(os.getenv("GPT_BATCH_TOKEN_BUDGET", "8000")),
+    item_output_tokens=int(os.getenv("GPT_BATCH_ITEM_TOKENS", "500")),
+    concurrency=int(os.getenv("GPT_BATCH_CONCURRENCY", "3")),
+    retries=int(os.getenv("GPT_BATCH_RETRIES", "1")),
+    timeout=float(os.getenv("GPT_BATCH_TIMEOUT", "90")),
+)
@@ -0,0 +1,236 @@
+"""
+지표 이력 저장소 (날짜별 파티션, 메모리 매핑 NumPy 파일).
+
+- 업스트림에서 새로 받은 (per, pbr, roe) 는 모두 HISTORY_DIR/<UTC 날짜>/log.bin 에 고정 길이 레코드로 덧붙인다
+  (O_APPEND 한 번의 write 라 여러 워커가 동시에 써도 레코드가 섞이지 않는다)
+- 지난 날짜 파티션은 (symbol, ts) 순으로 정렬한 컬럼별 .npy 로 봉인(seal)한다
+  조회는 np.load(mmap_mode="r") 후 symbol 컬럼에 searchsorted 로 구간만 읽어, 파일 전체를 메모리에 올리지 않는다
+- 라이브 조회가 실패하면 fallback() 이 최근 이력 값을 대신 돌려준다 (HISTORY_FALLBACK_MAX_AGE_SEC 이내)
+- iter_chunks() 는 여러 종목·날짜 구간을 파티션 순으로 일정 크기씩 읽는다 (내보내기용, 메모리 사용 일정)
+"""
+import datetime, os, threading, time
+from typing import Collection, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from telemetry import get_logger
+
+log = get_logger("history")
+
+Metrics = Tuple[Optional[float], Optional[float], Optional[float]]
+
+ROW = np.dtype([
+    ("ts", "<f8"), ("symbol", "S16"), ("source", "S8"),
+    ("per", "<f4"), ("pbr", "<f4"), ("roe", "<f4"),
+])
+COLUMNS = ROW.names
+LOG_FILE = "log.bin"
+SEALED_MARKER = "SEALED"
+
+def _day(ts: float) -> str:
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).strftime("%Y-%m-%d")
+
+def _nan(v) -> float:
+    return np.nan if v is None else float(v)
+
+def _none(v) -> Optional[float]:
+    v = float(v)
+    return None if np.isnan(v) else round(v, 4)
+
+class HistoryStore:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._counters = {"appends": 0, "append_errors": 0, "sealed": 0, "fallbacks": 0, "queries": 0}
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    # -----------------------------
+    # 쓰기
+    # -----------------------------
+    def append(self, source: str, symbol: str, value: Metrics, ts: Optional[float] = None) -> None:
+        if value is None or all(v is None for v in value):
+            return
+        ts = ts or time.time()
+        rec = np.array([(ts, symbol.encode()[:16], source.encode()[:8], *map(_nan, value))], dtype=ROW)
+        part = os.path.join(self.root, _day(ts))
+        try:
+            os.makedirs(part, exist_ok=True)
+            fd = os.open(os.path.join(part, LOG_FILE), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, rec.tobytes())
+            finally:
+                os.close(fd)
+            self._count("appends")
+        except OSError as e:
+            self._count("append_errors")
+            log.warning("history.append_error", symbol=symbol, error=str(e))
+
+    # -----------------------------
+    # 파티션 봉인 (지난 날짜만 - 더 이상 쓰는 워커가 없다)
+    # -----------------------------
+    def _partitions(self, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        days = sorted(d for d in os.listdir(self.root) if len(d) == 10 and d[4] == "-")
+        return [d for d in days if (start is None or d >= start) and (end is None or d <= end)]
+
+    def _read_log(self, part: str) -> np.ndarray:
+        path = os.path.join(part, LOG_FILE)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return np.empty(0, dtype=ROW)
+        n = size // ROW.itemsize  # 쓰는 중인 마지막 레코드는 건너뛴다
+        if n == 0:
+            return np.empty(0, dtype=ROW)
+        return np.memmap(path, dtype=ROW, mode="r", shape=(n,))
+
+    def seal(self, day: str) -> bool:
+        """log.bin → (symbol, ts) 정렬 컬럼 파일. 여러 워커가 동시에 해도 같은 내용을 rename 으로 덮어쓸 뿐이다"""
+        part = os.path.join(self.root, day)
+        if os.path.exists(os.path.join(part, SEALED_MARKER)):
+            return False
+        rows = np.array(self._read_log(part))
+        if not len(rows):
+            # 비어 있거나 다른 워커가 방금 봉인하고 log 를 지운 경우 - 봉인된 컬럼을 빈 배열로 덮지 않는다
+            return False
+        order = np.lexsort((rows["ts"], rows["symbol"]))
+        rows = rows[order]
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        for col in COLUMNS:
+            tmp = os.path.join(part, col + ".npy" + suffix)
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(rows[col]))
+            os.replace(tmp, os.path.join(part, col + ".npy"))
+        tmp = os.path.join(part, SEALED_MARKER + suffix)
+        with open(tmp, "w") as f:
+            f.write(str(len(rows)))
+        os.replace(tmp, os.path.join(part, SEALED_MARKER))
+        try:
+            os.remove(os.path.join(part, LOG_FILE))
+        except FileNotFoundError:
+            pass
+        self._count("sealed")
+        log.info("history.sealed", day=day, rows=len(rows))
+        return True
+
+    def compact(self) -> int:
+        """오늘(UTC) 이전의 봉인되지 않은 파티션을 모두 봉인"""
+        today = _day(time.time())
+        return sum(self.seal(d) for d in self._partitions(end=today) if d < today)
+
+    # -----------------------------
+    # 읽기
+    # -----------------------------
+    def _scan(self, day: str, source: str, symbol: str) -> Iterator[np.ndarray]:
+        """파티션 하나에서 (source, symbol) 행. 봉인된 파티션은 searchsorted 구간만 읽는다"""
+        part = os.path.join(self.root, day)
+        key = symbol.encode()[:16]
+        src = source.encode()[:8]
+        if os.path.exists(os.path.join(part, SEALED_MARKER)):
+            syms = np.load(os.path.join(part, "symbol.npy"), mmap_mode="r")
+            lo = int(np.searchsorted(syms, key, side="left"))
+            hi = int(np.searchsorted(syms, key, side="right"))
+            if lo == hi:
+                return
+            out = np.empty(hi - lo, dtype=ROW)
+            for col in COLUMNS:
+                out[col] = np.load(os.path.join(part, col + ".npy"), mmap_mode="r")[lo:hi]
+            yield out[out["source"] == src]
+            return
+        rows = self._read_log(part)
+        if len(rows):
+            yield np.array(rows[(rows["symbol"] == key) & (rows["source"] == src)])
+
+    def query(self, source: str, symbol: str, start: Optional[float] = None,
+              end: Optional[float] = None) -> np.ndarray:
+        """[start, end] 구간 레코드 (ts 오름차순)"""
+        self._count("queries")
+        chunks = []
+        for day in self._partitions(_day(start) if start else None, _day(end) if end else None):
+            chunks.extend(self._scan(day, source, symbol))
+        if not chunks:
+            return np.empty(0, dtype=ROW)
+        rows = np.concatenate(chunks)
+        rows = rows[np.argsort(rows["ts"], kind="stable")]
+        if start is not None:
+            rows = rows[rows["ts"] >= start]
+        if end is not None:
+            rows = rows[rows["ts"] <= end]
+        return rows
+
+    def iter_chunks(self, start: Optional[float] = None, end: Optional[float] = None,
+                    symbols: Optional[Collection[str]] = None, chunk_rows: int = 65536) -> Iterator[np.ndarray]:
+        """[start, end] 구간 레코드를 파티션(날짜) 순으로 최대 chunk_rows 개씩. symbols 가 있으면 그 종목만"""
+        self._count("queries")
+        keys = np.array([s.encode()[:16] for s in symbols], dtype="S16") if symbols is not None else None
+        for day in self._partitions(_day(start) if start else None, _day(end) if end else None):
+            part = os.path.join(self.root, day)
+            if os.path.exists(os.path.join(part, SEALED_MARKER)):
+                cols = {c: np.load(os.path.join(part, c + ".npy"), mmap_mode="r") for c in COLUMNS}
+            else:
+                rows = self._read_log(part)
+                cols = {c: rows[c] for c in COLUMNS}
+            n = len(cols["ts"])
+            for lo in range(0, n, chunk_rows):
+                # 메모리 매핑 구간을 chunk 크기만큼만 복사
+                chunk = np.empty(min(chunk_rows, n - lo), dtype=ROW)
+                for c in COLUMNS:
+                    chunk[c] = cols[c][lo:lo + chunk_rows]
+                mask = np.ones(len(chunk), dtype=bool)
+                if start is not None:
+                    mask &= chunk["ts"] >= start
+                if end is not None:
+                    mask &= chunk["ts"] <= end
+                if keys is not None:
+                    mask &= np.isin(chunk["symbol"], keys)
+                if not mask.all():
+                    chunk = chunk[mask]
+                if len(chunk):
+                    yield chunk
+
+    def latest(self, source: str, symbol: str, max_age: float) -> Optional[Tuple[Metrics, float]]:
+        """max_age 초 이내의 가장 최근 값 (값, 경과초). 최신 파티션부터 거꾸로 본다"""
+        now = time.time()
+        for day in reversed(self._partitions(_day(now - max_age), _day(now))):
+            rows = [r for r in self._scan(day, source, symbol) if len(r)]
+            if not rows:
+                continue
+            rows = np.concatenate(rows)
+            last = rows[int(np.argmax(rows["ts"]))]
+            age = now - float(last["ts"])
+            if age > max_age:
+                return None
+            return (_none(last["per"]), _none(last["pbr"]), _none(last["roe"])), age
+        return None
+
+    def fallback(self, source: str, symbol: str, max_age: float) -> Optional[Metrics]:
+        hit = self.latest(source, symbol, max_age)
+        if hit is None:
+            return None
+        self._count("fallbacks")
+        log.warning("history.fallback", source=source, symbol=symbol, age=round(hit[1]))
+        return hit[0]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            c = dict(self._counters)
+        parts = self._partitions()
+        c.update({
+            "root": self.root,
+            "partitions": len(parts),
+            "first_day": parts[0] if parts else None,
+            "last_day": parts[-1] if parts else None,
+        })
+        return c
+
+def _make_store() -> Optional[HistoryStore]:
+    root = os.getenv("HISTORY_DIR", os.path.join("data", "history"))
+    if not root or root.lower() in ("off", "none", "0"):
+        return None
+    return HistoryStore(root)
+
+history = _make_store()
+FALLBACK_MAX_AGE = float(os.getenv("HISTORY_FALLBACK_MAX_AGE_SEC", "604800"))  # 7일
@@ -0,0 +1,291 @@
+"""
+업스트림(Finnhub / 네이버 금융 / OpenAI)별 커넥션 풀.
+
+앱 수명 동안 업스트림마다 하나의 클라이언트를 유지해 TCP/TLS 핸드셰이크를 재사용한다.
+- 동기 경로: requests.Session + HTTPAdapter(pool_maxsize, Retry)
+- 비동기 경로: httpx.AsyncClient(Limits, keep-alive, 가능하면 HTTP/2) + 동일한 Retry 정책
+모든 요청(재시도 포함)은 보내기 전에 rate_governor 의 토큰 버킷을 거치고 (대기 시간은 circuit breaker 지연에서 제외), 시도별 응답 시간·상태가 /metrics 에 기록된다.
+FastAPI lifespan 에서 start()/aclose() 로 생성·정리한다.
+"""
+import os, time, asyncio, importlib.util
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from circuit import note_queued
+from rate_governor import governor
+from telemetry import counter, histogram
+
+UPSTREAMS = ("finnhub", "naver", "openai")
+
+# -----------------------------
+# 설정 (환경변수로 조정, 업스트림별 오버라이드: HTTP_POOL_SIZE_NAVER 등)
+# -----------------------------
+def _env(name: str, upstream: Optional[str], default: str) -> str:
+    if upstream:
+        v = os.getenv(f"{name}_{upstream.upper()}")
+        if v is not None:
+            return v
+    return os.getenv(name, default)
+
+def pool_size(upstream: Optional[str] = None) -> int:
+    return int(_env("HTTP_POOL_SIZE", upstream, "20"))
+
+def keepalive_expiry(upstream: Optional[str] = None) -> float:
+    return float(_env("HTTP_KEEPALIVE_EXPIRY", upstream, "30"))
+
+def http2_enabled(upstream: Optional[str] = None) -> bool:
+    """HTTP/2 는 h2 패키지가 설치되어 있을 때만 사용 (ALPN 협상 실패 시 1.1 로 자동 폴백)"""
+    want = _env("HTTP2", upstream, "1").lower() not in ("0", "false", "no")
+    return want and importlib.util.find_spec("h2") is not None
+
+def make_retry() -> Retry:
+    """기존 _session_with_retries 와 동일한 재시도 정책"""
+    return Retry(
+        total=3,
+        backoff_factor=0.5,  # 0.5s, 1s, 2s ...
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"]
+    )
+
+# -----------------------------
+# 속도 조절 (rate_governor 버킷 선택 + 트랜스포트/어댑터)
+# -----------------------------
+def bucket_for(upstream: str, path: str) -> str:
+    """업스트림 + 경로 → 토큰 버킷 이름"""
+    if upstream == "finnhub":
+        return "finnhub_search" if path.rstrip("/").endswith("/search") else "finnhub_metric"
+    if upstream == "naver":
+        if "itemSummary" in path:
+            return "naver_json"
+        return "naver_listing" if path.startswith("/sise/") else "naver_html"
+    return upstream
+
+UPSTREAM_SECONDS = histogram(
+    "finance_upstream_request_seconds", "업스트림 HTTP 시도별 응답 시간(초, 토큰 대기 제외)", ("bucket",)
+)
+UPSTREAM_REQUESTS = counter("finance_upstream_requests_total", "업스트림 HTTP 시도 수 (상태 코드 계열별)", ("bucket", "status"))
+
+def _record(bucket: str, start: float, status) -> None:
+    UPSTREAM_SECONDS.observe(time.perf_counter() - start, bucket=bucket)
+    UPSTREAM_REQUESTS.inc(bucket=bucket, status=status if isinstance(status, str) else f"{status // 100}xx")
+
+class GovernedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, upstream: str, transport: httpx.AsyncBaseTransport):
+        self.upstream = upstream
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        bucket = bucket_for(self.upstream, request.url.path)
+        queued = time.monotonic()
+        try:
+            await governor.aacquire(bucket)
+        finally:
+            note_queued(time.monotonic() - queued)  # 취소·거절로 끝난 대기도 breaker 지연에서 뺀다
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception:
+            _record(bucket, start, "error")
+            raise
+        _record(bucket, start, response.status_code)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+class GovernedSyncTransport(httpx.BaseTransport):
+    """동기 OpenAI 클라이언트용"""
+    def __init__(self, upstream: str, transport: httpx.BaseTransport):
+        self.upstream = upstream
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        bucket = bucket_for(self.upstream, request.url.path)
+        queued = time.monotonic()
+        try:
+            governor.acquire(bucket)
+        finally:
+            note_queued(time.monotonic() - queued)
+        start = time.perf_counter()
+        try:
+            response = self._transport.handle_request(request)
+        except Exception:
+            _record(bucket, start, "error")
+            raise
+        _record(bucket, start, response.status_code)
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+class GovernedAdapter(HTTPAdapter):
+    """requests 세션용 - 논리 요청 1건마다 토큰 1개 (urllib3 내부 재시도는 어댑터 안에서 처리)"""
+    def __init__(self, upstream: str, **kwargs):
+        self.upstream = upstream
+        super().__init__(**kwargs)
+
+    def send(self, request, *args, **kwargs):
+        bucket = bucket_for(self.upstream, urlsplit(request.url).path)
+        queued = time.monotonic()
+        try:
+            governor.acquire(bucket)
+        finally:
+            note_queued(time.monotonic() - queued)
+        start = time.perf_counter()
+        try:
+            response = super().send(request, *args, **kwargs)
+        except Exception:
+            _record(bucket, start, "error")
+            raise
+        _record(bucket, start, response.status_code)
+        return response
+
+# -----------------------------
+# 비동기 재시도 트랜스포트 (urllib3 Retry 정책을 httpx 에 적용)
+# -----------------------------
+class RetryTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, retry: Retry):
+        self._transport = transport
+        self._retry = retry
+
+    def _backoff(self, attempt: int) -> float:
+        if attempt <= 1:
+            return 0.0
+        return min(self._retry.backoff_factor * (2 ** (attempt - 1)), self._retry.DEFAULT_BACKOFF_MAX)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        retry = self._retry
+        retryable = request.method in (retry.allowed_methods or ())
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = await self._transport.handle_async_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError):
+                if not retryable or attempt > retry.total:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if not retryable or attempt > retry.total or response.status_code not in retry.status_forcelist:
+                return response
+
+            # Retry-After 헤더가 있으면 우선 (429/503)
+            delay = self._backoff(attempt)
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            await response.aclose()
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+# -----------------------------
+# 풀 레지스트리
+# -----------------------------
+class UpstreamPools:
+    def __init__(self):
+        self._sessions: Dict[str, requests.Session] = {}
+        self._aclients: Dict[str, httpx.AsyncClient] = {}
+        self._openai = None
+        self._aopenai = None
+
+    # --- 동기 ---
+    def session(self, upstream: str) -> requests.Session:
+        s = self._sessions.get(upstream)
+        if s is None:
+            s = requests.Session()
+            size = pool_size(upstream)
+            adapter = GovernedAdapter(upstream, pool_connections=size, pool_maxsize=size, max_retries=make_retry())
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            self._sessions[upstream] = s
+        return s
+
+    # --- 비동기 ---
+    def _limits(self, upstream: str) -> httpx.Limits:
+        size = pool_size(upstream)
+        return httpx.Limits(
+            max_connections=size,
+            max_keepalive_connections=size,
+            keepalive_expiry=keepalive_expiry(upstream),
+        )
+
+    def aclient(self, upstream: str) -> httpx.AsyncClient:
+        c = self._aclients.get(upstream)
+        if c is None or c.is_closed:
+            http2 = http2_enabled(upstream)
+            # 재시도 시도마다 토큰을 받도록 RetryTransport 안쪽에 GovernedTransport
+            transport = RetryTransport(
+                GovernedTransport(upstream, httpx.AsyncHTTPTransport(limits=self._limits(upstream), http2=http2, retries=0)),
+                make_retry(),
+            )
+            c = httpx.AsyncClient(transport=transport, follow_redirects=True)
+            self._aclients[upstream] = c
+        return c
+
+    def isolated_aclient(self, upstream: str, **kwargs) -> httpx.AsyncClient:
+        """공유 풀·쿠키 저장소와 분리된 일회용 클라이언트 (같은 속도 조절·재시도). 호출한 쪽에서 닫는다"""
+        transport = RetryTransport(GovernedTransport(upstream, httpx.AsyncHTTPTransport(retries=0)), make_retry())
+        return httpx.AsyncClient(transport=transport, **kwargs)
+
+    # --- OpenAI (SDK 자체 재시도를 사용하고, 커넥션 풀만 공유) ---
+    def openai(self, api_key: Optional[str]):
+        if not api_key:
+            return None
+        if self._openai is None:
+            from openai import OpenAI
+            self._openai = OpenAI(
+                api_key=api_key,
+                http_client=httpx.Client(transport=GovernedSyncTransport(
+                    "openai", httpx.HTTPTransport(limits=self._limits("openai"), http2=http2_enabled("openai"))
+                )),
+            )
+        return self._openai
+
+    def aopenai(self, api_key: Optional[str]):
+        if not api_key:
+            return None
+        if self._aopenai is None:
+            from openai import AsyncOpenAI
+            self._aopenai = AsyncOpenAI(
+                api_key=api_key,
+                http_client=httpx.AsyncClient(transport=GovernedTransport(
+                    "openai", httpx.AsyncHTTPTransport(limits=self._limits("openai"), http2=http2_enabled("openai"))
+                )),
+            )
+        return self._aopenai
+
+    # --- 수명 주기 ---
+    def start(self, openai_api_key: Optional[str] = None) -> None:
+        """startup 시점에 모든 업스트림 클라이언트를 미리 만들어 둔다"""
+        for name in ("finnhub", "naver"):
+            self.session(name)
+            self.aclient(name)
+        self.openai(openai_api_key)
+        self.aopenai(openai_api_key)
+
+    async def aclose(self) -> None:
+        for c in self._aclients.values():
+            await c.aclose()
+        self._aclients.clear()
+        if self._aopenai is not None:
+            await self._aopenai.close()
+            self._aopenai = None
+        self.close()
+
+    def close(self) -> None:
+        for s in self._sessions.values():
+            s.close()
+        self._sessions.clear()
+        if self._openai is not None:
+            self._openai.close()
+            self._openai = None
+
+pools = UpstreamPools()
@@ -0,0 +1,183 @@
+"""
+지연 예산 안에서의 요약 (GPT 대신 로컬 템플릿).
+
+- build: 지표·RPG 분류·업종 백분위만으로 summary3 / insights 를 만드는 결정적 템플릿 (문자열 조립뿐, 1ms 미만)
+- SummaryBudget: 최근 GPT 요약 호출 지연의 분위수를 추적해, 남은 예산으로 GPT 를 기다릴 만한지 판단
+  기다리지 않거나 예산을 넘긴 GPT 호출은 백그라운드에서 끝까지 돌려 요약 캐시를 채운다 (다음 요청은 cache)
+- 응답의 summary_tier: gpt(새로 생성) / cache(요약 캐시) / local(템플릿) / offline(API 키 없음) / failed
+"""
+import asyncio, os, threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from rpg import DEFAULT_THRESHOLDS, RPGThresholds
+from telemetry import get_logger
+
+log = get_logger("local_summary")
+
+TIERS = ("gpt", "cache", "local", "offline", "failed")
+
+# -----------------------------
+# 템플릿
+# -----------------------------
+def _num(v: Optional[float], digits: int = 1) -> str:
+    return "N/A" if v is None else f"{v:.{digits}f}"
+
+def _roe_text(roe: Optional[float], th: RPGThresholds) -> str:
+    if roe is None:
+        return "수익성은 확인되지 않았고"
+    if roe < 0:
+        return "적자로 자기자본이 줄고 있으며"
+    if roe >= th.roe_min * 1.5:
+        return "수익성이 높고"
+    if roe >= th.roe_min:
+        return "수익성이 양호하며"
+    return "수익성이 기준에 못 미치고"
+
+def _valuation_text(per: Optional[float], pbr: Optional[float], th: RPGThresholds) -> str:
+    if per is None and pbr is None:
+        return "밸류에이션은 판단할 수 없다"
+    if per is not None and per < 0:
+        return "이익이 없어 PER 로는 평가하기 어렵다"
+    cheap_per = per is not None and per <= th.per_max
+    cheap_pbr = pbr is not None and pbr <= th.pbr_max
+    if cheap_per and cheap_pbr:
+        return "이익·자산 대비 모두 저평가 구간이다"
+    if cheap_per:
+        return "이익 대비로는 저평가 구간이다"
+    if cheap_pbr:
+        return "자산가치 대비로는 저평가 구간이다"
+    if per is not None and per > th.per_max * 2:
+        return "이익 대비 주가가 높은 편이다"
+    return "적정 이상으로 평가받고 있다"
+
+def _advice(roe: Optional[float], per: Optional[float], th: RPGThresholds) -> str:
+    good_roe = roe is not None and roe >= th.roe_min
+    cheap = per is not None and 0 < per <= th.per_max
+    if good_roe and cheap:
+        return "분할 매수로 중장기 보유를 검토할 만하다."
+    if good_roe:
+        return "성장이 이어지는지 분기 실적으로 확인하며 비중을 조절하는 접근이 적합하다."
+    if cheap:
+        return "저평가가 수익성 개선으로 이어지는지 확인한 뒤 접근하는 편이 낫다."
+    return "실적 개선 신호를 확인하기 전까지는 보수적으로 접근하는 편이 안전하다."
+
+def _peer_text(peer: Optional[Dict[str, Any]], th: RPGThresholds) -> str:
+    if not peer:
+        return (f"업종 비교 데이터가 없어 고정 기준(ROE {th.roe_min:g}%, PER {th.per_max:g}배, "
+                f"PBR {th.pbr_max:g}배)으로만 평가했다.")
+    if peer["basis"] == "sector":
+        lead, label, ref = "", f"'{peer['group']}' 업종", "업종"
+    else:
+        # 시장 전체와 비교한 결과를 업종 평균이라고 부르지 않는다
+        why = f"'{peer['sector']}' 업종 종목이 적어" if peer.get("sector") else "업종 정보가 없어"
+        lead, label, ref = f"{why} {peer['group']} 시장 전체와 비교했다. ", f"{peer['group']} 시장", "시장"
+    pct = {c: (peer.get(c) or {}).get("percentile") for c in ("per", "pbr", "roe")}
+    count = max((peer.get(c) or {}).get("count", 0) for c in ("per", "pbr", "roe"))
+    parts = []
+    if pct["roe"] is not None:
+        parts.append(f"수익성은 {ref} 평균 이상" if pct["roe"] >= 50 else f"수익성은 {ref} 평균 이하")
+    if pct["per"] is not None:
+        parts.append(f"주가 수준은 {ref}보다 낮은 편" if pct["per"] <= 50 else f"주가 수준은 {ref}보다 높은 편")
+    tail = f", {'이고 '.join(parts)}이다." if parts else "."
+    return (f"{lead}{label} {count}개 종목 중 백분위는 PER {_num(pct['per'], 0)}·PBR {_num(pct['pbr'], 0)}·"
+            f"ROE {_num(pct['roe'], 0)}{tail}")
+
+def _caution(roe, per, pbr, th: RPGThresholds) -> str:
+    if roe is None or per is None or pbr is None:
+        return "일부 지표가 비어 있어 판단 근거가 제한적이다."
+    if roe < 0 or per < 0:
+        return "적자 구간이라 이익 회복 여부를 먼저 확인해야 한다."
+    if per > th.per_max * 2:
+        return "이익 대비 주가가 높아 실적이 기대에 못 미치면 변동성이 클 수 있다."
+    if roe < th.roe_min:
+        return f"ROE 가 기준({th.roe_min:g}%)에 못 미쳐 수익성 개선이 필요하다."
+    return "지표는 최근 공시 기준이라 이후 실적 변화는 반영되지 않았을 수 있다."
+
+def _positive(roe, per, pbr, th: RPGThresholds) -> str:
+    if roe is not None and roe >= th.roe_min:
+        return f"ROE {_num(roe)}% 로 자기자본을 효율적으로 활용하고 있다."
+    if pbr is not None and 0 < pbr <= th.pbr_max:
+        return f"PBR {_num(pbr, 2)}배로 자산가치 대비 가격 부담이 적다."
+    if per is not None and 0 < per <= th.per_max:
+        return f"PER {_num(per)}배로 이익 대비 가격 부담이 적다."
+    return "수익성이 회복되면 재평가될 여지가 있다."
+
+def build(company, roe, per, pbr, rpg_title, rpg_desc, peer: Optional[Dict[str, Any]] = None,
+          thresholds: Optional[RPGThresholds] = None) -> Dict[str, Any]:
+    """GPT 요약과 같은 모양의 템플릿 요약 (같은 입력이면 같은 문장)"""
+    th = thresholds or DEFAULT_THRESHOLDS
+    first = (f"{company}는 ROE {_num(roe)}%·PER {_num(per)}배·PBR {_num(pbr, 2)}배로 "
+             f"{_roe_text(roe, th)} {_valuation_text(per, pbr, th)}. {_advice(roe, per, th)}")
+    third = f"'{rpg_title}' 유형으로, {rpg_desc}이다." if rpg_desc else f"'{rpg_title}' 유형이다."
+    return {
+        "summary3": [first, _peer_text(peer, th), third],
+        "insights": {"caution": _caution(roe, per, pbr, th), "positive": _positive(roe, per, pbr, th)},
+        "tier": "local",
+    }
+
+# -----------------------------
+# GPT 지연 추적 / 백그라운드 채우기
+# -----------------------------
+class SummaryBudget:
+    def __init__(self, quantile: float = 0.9, default_sec: float = 8.0, window: int = 100, min_samples: int = 5):
+        self.quantile = quantile
+        self.default_sec = default_sec
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._tasks = set()  # 백그라운드 GPT 태스크 참조 유지 (GC 방지)
+        self._counters = {f"tier_{t}": 0 for t in TIERS}
+        self._counters.update({"skipped_gpt": 0, "deadline_exceeded": 0, "background_started": 0,
+                               "background_done": 0, "background_failed": 0})
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def estimate(self) -> float:
+        """GPT 요약 한 번의 예상 지연 (최근 호출의 분위수, 표본이 적으면 기본값)"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return self.default_sec
+        return samples[min(len(samples) - 1, int(self.quantile * len(samples)))]
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def background(self, task: "asyncio.Future[Any]") -> None:
+        """응답에 쓰지 않은 GPT 호출을 끝까지 돌린다 (결과는 gpt_generate_async 가 요약 캐시에 저장)"""
+        self.count("background_started")
+        self._tasks.add(task)
+
+        def done(t: "asyncio.Future[Any]") -> None:
+            self._tasks.discard(t)
+            failed = t.cancelled() or t.exception() is not None or (t.result() or {}).get("tier") == "failed"
+            self.count("background_failed" if failed else "background_done")
+            if failed:
+                log.warning("local_summary.background_failed")
+
+        task.add_done_callback(done)
+
+    async def wait(self, task: "asyncio.Future[Any]", remaining: float) -> Optional[Any]:
+        """remaining 초 안에 끝나면 결과, 아니면 None (태스크는 취소하지 않고 백그라운드로 넘긴다)"""
+        done, _ = await asyncio.wait({task}, timeout=max(remaining, 0.0))
+        if done:
+            return task.result()
+        self.count("deadline_exceeded")
+        self.background(task)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self._counters)
+            n = len(self._samples)
+        c.update({"gpt_estimate_sec": round(self.estimate(), 3), "samples": n, "pending": len(self._tasks)})
+        return c
+
+budget = SummaryBudget(
+    quantile=float(os.getenv("SUMMARY_BUDGET_QUANTILE", "0.9")),
+    default_sec=float(os.getenv("SUMMARY_BUDGET_DEFAULT_SEC", "8")),
+)
@@ -0,0 +1,17 @@
+"""
+프로세스 내 LRU 캐시 공통 부분 (metric_cache / summary_cache 의 L1).
+
+- CountingLRU: cachetools.LRUCache + 용량 초과로 밀려난 항목 수(evictions) - 각 캐시의 stats() 에 노출
+"""
+from cachetools import LRUCache
+
+class CountingLRU(LRUCache):
+    """용량 초과로 밀려난 항목 수를 센다"""
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self.evictions = 0
+
+    def popitem(self):
+        item = super().popitem()
+        self.evictions += 1
+        return item
@@ -0,0 +1,323 @@
+"""
+(per, pbr, roe) 지표 캐시.
+
+- L1: 프로세스 내부 LRU (lru.CountingLRU)
+- L2: 선택적 공유 계층 (SQLite WAL 파일, METRIC_CACHE_DB 로 경로 지정) - 모든 uvicorn 워커가 공유
+- 소스(finnhub / naver)별 TTL, 만료 후 stale 구간에서는 이전 값을 즉시 돌려주고 백그라운드에서 갱신
+- hits/misses 카운터는 stats() 로 노출
+- L2 를 공유할 때(SHARED_STATE_DIR) 같은 키의 미스는 워커 전체에서 한 번만 업스트림을 호출 (shared_state.SharedFlight)
+- 비동기 경로(aget_or_fetch / apeek / aput)는 L1 은 바로, L2(SQLite) 읽기·쓰기는 asyncio.to_thread 로 (이벤트 루프를 막지 않음)
+- on_store 로 새 값 저장 알림(이력 저장), fallback 으로 조회 실패 시 대체 값(이력의 최근 값)을 연결할 수 있다
+"""
+import os, time, sqlite3, threading, asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from lru import CountingLRU
+from rate_governor import BACKGROUND, priority
+import shared_state
+from shared_state import SQLiteConn, acoordinate, coordinate, db_path
+from telemetry import get_logger
+
+log = get_logger("metric_cache")
+
+Metrics = Tuple[Optional[float], Optional[float], Optional[float]]
+
+DEFAULT_TTLS = {
+    "finnhub": float(os.getenv("METRIC_TTL_FINNHUB", "21600")),  # 6시간
+    "naver": float(os.getenv("METRIC_TTL_NAVER", "21600")),
+}
+DEFAULT_STALE_TTL = float(os.getenv("METRIC_STALE_TTL", "86400"))  # 만료 후 24시간까지 stale 응답 허용
+
+def _is_empty(value: Metrics) -> bool:
+    return value is None or all(v is None for v in value)
+
+class SQLiteTier:
+    """워커 간 공유되는 L2 계층"""
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = SQLiteConn(path, init=[
+            "CREATE TABLE IF NOT EXISTS metric_cache ("
+            " source TEXT NOT NULL, symbol TEXT NOT NULL,"
+            " per REAL, pbr REAL, roe REAL, fetched_at REAL NOT NULL,"
+            " PRIMARY KEY (source, symbol))"
+        ])
+
+    def get(self, source: str, symbol: str) -> Optional[Tuple[Metrics, float]]:
+        row = self._conn().execute(
+            "SELECT per, pbr, roe, fetched_at FROM metric_cache WHERE source=? AND symbol=?",
+            (source, symbol),
+        ).fetchone()
+        if row is None:
+            return None
+        return (row[0], row[1], row[2]), row[3]
+
+    def put(self, source: str, symbol: str, value: Metrics, fetched_at: float) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO metric_cache (source, symbol, per, pbr, roe, fetched_at) VALUES (?,?,?,?,?,?)",
+            (source, symbol, value[0], value[1], value[2], fetched_at),
+        )
+
+class MetricCache:
+    def __init__(self, maxsize: int = 2048, ttls: Optional[Dict[str, float]] = None,
+                 stale_ttl: float = DEFAULT_STALE_TTL, db_path: Optional[str] = None):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.stale_ttl = stale_ttl
+        self._l1 = CountingLRU(maxsize)
+        self._l2 = SQLiteTier(db_path) if db_path else None
+        # 다른 워커가 받은 값을 L2 에서 읽을 수 있을 때만 워커 간 single-flight
+        self.flight = shared_state.flight if self._l2 is not None else None
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._tasks = set()  # 백그라운드 갱신 태스크 참조 유지 (GC 방지)
+        self._listeners: List[Callable[[str, str, Metrics], None]] = []
+        self.fallback: Optional[Callable[[str, str], Optional[Metrics]]] = None
+        self._counters = {
+            "hits_l1": 0, "hits_l2": 0, "stale_hits": 0, "misses": 0,
+            "refreshes": 0, "refresh_errors": 0, "fallbacks": 0, "shared_hits": 0,
+        }
+
+    def on_store(self, fn: Callable[[str, str, Metrics], None]) -> None:
+        """업스트림에서 새로 받은 값이 저장될 때마다 fn(source, symbol, value) 호출 (이력 저장 등)"""
+        self._listeners.append(fn)
+
+    # -----------------------------
+    # 내부 유틸
+    # -----------------------------
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _ttl(self, source: str) -> float:
+        return self.ttls.get(source, 3600.0)
+
+    def _lookup(self, source: str, symbol: str, l2: bool = True) -> Tuple[Optional[Metrics], Optional[float], str]:
+        """(값, 경과초, 계층) - 없거나 stale 구간도 지났으면 (None, None, ''). l2=False 면 L1 만"""
+        key = (source, symbol)
+        now = time.time()
+        with self._lock:
+            entry = self._l1.get(key)
+        tier = "l1"
+        if entry is None and l2 and self._l2 is not None:
+            try:
+                entry = self._l2.get(source, symbol)
+            except sqlite3.Error as e:
+                log.warning("metric_cache.l2_read_error", error=str(e))
+                entry = None
+            if entry is not None:
+                tier = "l2"
+                with self._lock:
+                    self._l1[key] = entry
+        if entry is None:
+            return None, None, ""
+        value, fetched_at = entry
+        age = now - fetched_at
+        if age > self._ttl(source) + self.stale_ttl:
+            with self._lock:
+                self._l1.pop(key, None)
+            return None, None, ""
+        return value, age, tier
+
+    async def _alookup(self, source: str, symbol: str) -> Tuple[Optional[Metrics], Optional[float], str]:
+        """_lookup 의 비동기 버전 - L1 미스일 때만 스레드에서 L2 조회"""
+        found = self._lookup(source, symbol, l2=False)
+        if found[0] is None and self._l2 is not None:
+            found = await asyncio.to_thread(self._lookup, source, symbol)
+        return found
+
+    def peek(self, source: str, symbol: str) -> Optional[Tuple[Metrics, float]]:
+        """(값, 경과초) 또는 None - 적중/미스 카운터를 건드리지 않는다 (prefetch 판단용)"""
+        value, age, _ = self._lookup(source, symbol)
+        return None if value is None else (value, age)
+
+    async def apeek(self, source: str, symbol: str) -> Optional[Tuple[Metrics, float]]:
+        value, age, _ = await self._alookup(source, symbol)
+        return None if value is None else (value, age)
+
+    def _l2_put(self, source: str, symbol: str, value: Metrics, fetched_at: float) -> None:
+        try:
+            self._l2.put(source, symbol, value, fetched_at)
+        except sqlite3.Error as e:
+            log.warning("metric_cache.l2_write_error", error=str(e))
+
+    def put(self, source: str, symbol: str, value: Metrics, fetched_at: Optional[float] = None) -> None:
+        # 실패(모두 None)는 캐시하지 않는다
+        if _is_empty(value):
+            return
+        fetched_at = fetched_at or time.time()
+        if self._l2 is not None:
+            self._l2_put(source, symbol, value, fetched_at)
+        self._store(source, symbol, value, fetched_at)
+
+    async def aput(self, source: str, symbol: str, value: Metrics, fetched_at: Optional[float] = None) -> None:
+        """put 의 비동기 버전 (L2 쓰기는 스레드에서)"""
+        if _is_empty(value):
+            return
+        fetched_at = fetched_at or time.time()
+        if self._l2 is not None:
+            await asyncio.to_thread(self._l2_put, source, symbol, value, fetched_at)
+        self._store(source, symbol, value, fetched_at)
+
+    def _store(self, source: str, symbol: str, value: Metrics, fetched_at: float) -> None:
+        """L1 저장 + on_store 알림"""
+        with self._lock:
+            self._l1[(source, symbol)] = (tuple(value), fetched_at)
+        for fn in self._listeners:
+            try:
+                fn(source, symbol, value)
+            except Exception as e:
+                log.warning("metric_cache.listener_error", error=str(e))
+
+    def _fallback(self, source: str, symbol: str, value: Metrics) -> Metrics:
+        """조회 실패(모두 None) 시 fallback 소스 값 (캐시에는 넣지 않는다)"""
+        if not _is_empty(value) or self.fallback is None:
+            return value
+        alt = self.fallback(source, symbol)
+        if _is_empty(alt):
+            return value
+        self._count("fallbacks")
+        return alt
+
+    def _shared_fresh(self, source: str, symbol: str) -> Optional[Metrics]:
+        """다른 워커가 방금 L2 에 넣은 값 (TTL 이내일 때만). 미스였으므로 TTL 이내 값은 곧 새 값이다"""
+        value, age, _ = self._lookup(source, symbol)
+        return value if value is not None and age <= self._ttl(source) else None
+
+    def _claim_refresh(self, key) -> bool:
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _release_refresh(self, key) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def _classify(self, source: str, symbol: str):
+        return self._tally(source, *self._lookup(source, symbol))
+
+    def _tally(self, source: str, value: Optional[Metrics], age: Optional[float], tier: str):
+        """조회 결과 → (값, stale 여부) + 적중/미스 카운터"""
+        if value is None:
+            self._count("misses")
+            return None, False
+        if age <= self._ttl(source):
+            self._count("hits_l1" if tier == "l1" else "hits_l2")
+            return value, False
+        self._count("stale_hits")
+        return value, True
+
+    # -----------------------------
+    # 동기 경로
+    # -----------------------------
+    def get_or_fetch(self, source: str, symbol: str, fetch: Callable[[], Metrics]) -> Metrics:
+        value, stale = self._classify(source, symbol)
+        if value is not None:
+            if stale:
+                self._refresh_in_thread(source, symbol, fetch)
+            return value
+        with coordinate(self.flight, f"metric:{source}:{symbol}", lambda: self._shared_fresh(source, symbol)) as shared:
+            if shared is not None:
+                self._count("shared_hits")
+                return shared
+            value = fetch()
+            self.put(source, symbol, value)
+        return self._fallback(source, symbol, value)
+
+    def _refresh_in_thread(self, source: str, symbol: str, fetch: Callable[[], Metrics]) -> None:
+        key = (source, symbol)
+        if not self._claim_refresh(key):
+            return
+
+        def run():
+            try:
+                with priority(BACKGROUND):
+                    value = fetch()
+                self.put(source, symbol, value)
+                self._count("refreshes")
+            except Exception as e:
+                self._count("refresh_errors")
+                log.warning("metric_cache.refresh_error", source=source, symbol=symbol, error=str(e))
+            finally:
+                self._release_refresh(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    # -----------------------------
+    # 비동기 경로
+    # -----------------------------
+    async def aget_or_fetch(self, source: str, symbol: str, fetch: Callable[[], Awaitable[Metrics]]) -> Metrics:
+        value, stale = self._tally(source, *await self._alookup(source, symbol))
+        if value is not None:
+            if stale:
+                self._refresh_in_task(source, symbol, fetch)
+            return value
+        # _shared_fresh 는 acoordinate 가 스레드에서 부른다
+        async with acoordinate(self.flight, f"metric:{source}:{symbol}", lambda: self._shared_fresh(source, symbol)) as shared:
+            if shared is not None:
+                self._count("shared_hits")
+                return shared
+            value = await fetch()
+            await self.aput(source, symbol, value)
+        return self._fallback(source, symbol, value)
+
+    def _refresh_in_task(self, source: str, symbol: str, fetch: Callable[[], Awaitable[Metrics]]) -> None:
+        key = (source, symbol)
+        if not self._claim_refresh(key):
+            return
+
+        async def run():
+            try:
+                with priority(BACKGROUND):
+                    value = await fetch()
+                await self.aput(source, symbol, value)
+                self._count("refreshes")
+            except Exception as e:
+                self._count("refresh_errors")
+                log.warning("metric_cache.refresh_error", source=source, symbol=symbol, error=str(e))
+            finally:
+                self._release_refresh(key)
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def arefresh(self, source: str, symbol: str, fetch: Callable[[], Awaitable[Metrics]]) -> Optional[Metrics]:
+        """만료 전에 미리 갱신. 이미 다른 갱신이 진행 중이면 None"""
+        key = (source, symbol)
+        if not self._claim_refresh(key):
+            return None
+        try:
+            value = await fetch()
+            await self.aput(source, symbol, value)
+            self._count("refreshes")
+            return value
+        except Exception:
+            self._count("refresh_errors")
+            raise
+        finally:
+            self._release_refresh(key)
+
+    # -----------------------------
+    # 관측
+    # -----------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self._counters)
+            size, maxsize, evictions = len(self._l1), self._l1.maxsize, self._l1.evictions
+        lookups = c["hits_l1"] + c["hits_l2"] + c["stale_hits"] + c["misses"]
+        c.update({
+            "l1_size": size,
+            "l1_maxsize": maxsize,
+            "l1_evictions": evictions,
+            "l2_enabled": self._l2 is not None,
+            "hit_rate": round((lookups - c["misses"]) / lookups, 4) if lookups else None,
+            "ttls": self.ttls,
+            "stale_ttl": self.stale_ttl,
+        })
+        return c
+
+metric_cache = MetricCache(
+    maxsize=int(os.getenv("METRIC_CACHE_SIZE", "4096")),
+    db_path=db_path("METRIC_CACHE_DB", "metric_cache.db"),
+)
@@ -0,0 +1,264 @@
+"""
+네이버 금융 종목 메인 HTML → (per, pbr, roe, eps, bps) 추출.
+
+수백 KB 페이지 전체를 BeautifulSoup(html.parser)로 파싱하지 않도록 단계별로 시도한다.
+1) regex: id="_per" 등 필요한 위치만 컴파일된 정규식/str.find 로 찾고, 다 찾으면 멈춘다
+2) lxml: 설치되어 있으면 C 파서로 기존과 같은 규칙 적용
+3) bs4: 기존 BeautifulSoup 로직 (lxml 이 없거나 실패했을 때)
+앞 단계에서 채운 값은 유지하고, 비어 있는 값만 다음 단계가 채운다.
+"""
+import html as html_lib
+import math, re, threading
+from typing import Dict, List, Optional, Tuple
+
+from telemetry import get_logger
+
+log = get_logger("naver_html")
+
+try:
+    import lxml.html as lxml_html
+except ImportError:  # 선택 의존성
+    lxml_html = None
+
+Values = Tuple[Optional[float], Optional[float], Optional[float], Optional[float], Optional[float]]
+
+_NUMBER = re.compile(r"[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?")
+_ID_ATTR = re.compile(r"""id=["'](_per|_pbr|pbr|_roe|_eps)["']""")
+_EM_OPEN = re.compile(r"<em\b[^>]*>", re.I)
+_TAG = re.compile(r"<[^>]+>")
+_BPS_LABEL = re.compile(r"\bBPS\b", re.I)
+
+def to_float_safe(s):
+    """쉼표·단위(원, 배 등) 포함 문자열에서도 숫자만 추출하여 float 변환"""
+    if s is None:
+        return None
+    if isinstance(s, (int, float)):
+        if isinstance(s, float) and math.isnan(s):
+            return None
+        return float(s)
+
+    s = str(s).strip()
+    if s in {"", "-", "N/A", "NaN"}:
+        return None
+
+    # 일반적인 제거 후에도 남는 단위가 있을 수 있으므로 최종적으로 숫자 패턴을 추출
+    s = s.replace(",", "").replace("%", "")
+    m = _NUMBER.search(s)
+    return float(m.group(0)) if m else None
+
+def _needs_more(values: Values) -> bool:
+    # ROE 는 메인 페이지에 없는 경우가 많고 EPS/BPS 로 계산하므로 폴백 여부 판단에서 제외
+    per, pbr, _roe, eps, bps = values
+    return per is None or pbr is None or eps is None or bps is None
+
+# -----------------------------
+# 1) regex - 태그 트리를 만들지 않는 부분 스캔 ('id=' 리터럴로 시작하는 패턴이라 C 수준 탐색)
+# -----------------------------
+def _inner_text(html: str, open_end: int) -> Tuple[str, int]:
+    """여는 태그 끝(>) 다음부터 첫 닫는 태그 전까지의 텍스트, 닫는 태그 위치"""
+    close = html.find("</", open_end)
+    if close < 0:
+        return "", -1
+    text = html[open_end:close]
+    if "<" in text:
+        text = _TAG.sub("", text)
+    if "&" in text:
+        text = html_lib.unescape(text)
+    return text.strip(), close
+
+def extract_regex(html: str, per=None, pbr=None, roe=None, eps=None, bps=None) -> Values:
+    # 찾아야 할 id (BPS 는 PBR 위치 기준이라 pbr 이 있어도 bps 가 비면 _pbr 필요)
+    need = {k for k, missing in (("_per", per is None), ("_roe", roe is None), ("_eps", eps is None),
+                                 ("_pbr", pbr is None or bps is None)) if missing}
+    found: Dict[str, Tuple[str, int]] = {}
+    for m in _ID_ATTR.finditer(html):
+        key = m.group(1)
+        if key in found or (m.start() and not html[m.start() - 1].isspace()):  # data-id= 등 제외
+            continue
+        tag_end = html.find(">", m.end())
+        if tag_end < 0:
+            break
+        found[key] = _inner_text(html, tag_end + 1)
+        if need.issubset(found):
+            break
+
+    if per is None and "_per" in found:
+        per = to_float_safe(found["_per"][0])
+    pbr_hit = found.get("_pbr") or found.get("pbr")
+    if pbr is None and pbr_hit:
+        pbr = to_float_safe(pbr_hit[0])
+    if roe is None and "_roe" in found:
+        roe = to_float_safe(found["_roe"][0])
+    if eps is None and "_eps" in found:
+        eps = to_float_safe(found["_eps"][0])
+
+    # BPS: PBR em 과 같은 <td> 안의 다음 em (없으면 문서 순서상 다음 em)
+    if bps is None and pbr_hit and pbr_hit[1] >= 0:
+        start = pbr_hit[1]
+        td_end = html.find("</td>", start)
+        m = _EM_OPEN.search(html, start, td_end if td_end >= 0 else len(html))
+        if m is None and td_end >= 0:
+            m = _EM_OPEN.search(html, start)
+        if m is not None:
+            bps = to_float_safe(_inner_text(html, m.end())[0])
+    return per, pbr, roe, eps, bps
+
+# -----------------------------
+# 2) lxml - 전체 파싱이지만 C 구현 (설치된 경우만)
+# -----------------------------
+def extract_lxml(html: str, per=None, pbr=None, roe=None, eps=None, bps=None) -> Values:
+    doc = lxml_html.fromstring(html)
+
+    def by_id(*ids):
+        for i in ids:
+            found = doc.xpath("//*[@id=$i]", i=i)
+            if found:
+                return found[0]
+        return None
+
+    def text(el) -> str:
+        return el.text_content().strip() if el is not None else ""
+
+    if per is None:
+        node = by_id("_per")
+        per = to_float_safe(text(node)) if node is not None else per
+    if pbr is None:
+        node = by_id("_pbr", "pbr")
+        pbr = to_float_safe(text(node)) if node is not None else pbr
+    if roe is None:
+        node = by_id("_roe")
+        roe = to_float_safe(text(node)) if node is not None else roe
+    if eps is None:
+        node = by_id("_eps")
+        eps = to_float_safe(text(node)) if node is not None else eps
+
+    if bps is None:
+        em_pbr = next(iter(doc.xpath("//em[@id='_pbr']") or doc.xpath("//em[@id='pbr']")), None)
+        if em_pbr is not None:
+            td = next(em_pbr.iterancestors("td"), None)
+            ems = td.findall(".//em") if td is not None else []
+            if len(ems) >= 2:
+                bps = to_float_safe(text(ems[1]))
+            if bps is None:
+                nxt = em_pbr.xpath("following::em[1]")
+                if nxt:
+                    bps = to_float_safe(text(nxt[0]))
+
+    if bps is None:
+        for th in doc.xpath("//th | //dt"):
+            if _BPS_LABEL.search(th.text_content()):
+                td = th.xpath("following::td[1]")
+                if td:
+                    bps = to_float_safe(" ".join(td[0].text_content().split()))
+                break
+
+    if bps is None:
+        em_with_won = doc.xpath("//em[contains(text(), '원')]")
+        if em_with_won:
+            candidate = text(em_with_won[0])
+            if to_float_safe(candidate) is None:
+                candidate = em_with_won[0].getparent().text_content()
+            bps = to_float_safe(candidate)
+
+    return per, pbr, roe, eps, bps
+
+# -----------------------------
+# 3) bs4 - 기존 BeautifulSoup(html.parser) 로직
+# -----------------------------
+def extract_bs4(html: str, per=None, pbr=None, roe=None, eps=None, bps=None) -> Values:
+    """종목 메인 HTML에서 비어 있는 값만 채워 (per, pbr, roe, eps, bps) 반환"""
+    from bs4 import BeautifulSoup  # 폴백 경로에서만 필요 (기동 시 import 비용 절약)
+    soup = BeautifulSoup(html, "html.parser")
+
+    # id 기반(있으면 가장 신뢰)
+    if per is None:
+        node = soup.select_one("#_per")
+        per = to_float_safe(node.get_text(strip=True)) if node else per
+    if pbr is None:
+        node = soup.select_one("#_pbr") or soup.select_one("#pbr")  # 언더스코어/무언더스코어 둘 다 대응
+        pbr = to_float_safe(node.get_text(strip=True)) if node else pbr
+    if roe is None:
+        node = soup.select_one("#_roe")
+        roe = to_float_safe(node.get_text(strip=True)) if node else roe
+    if eps is None:
+        node = soup.select_one("#_eps")
+        eps = to_float_safe(node.get_text(strip=True)) if node else eps
+
+    # BPS: 너가 확인한 구조 - <em id="pbr">PBR</em> 바로 다음 <em>이 BPS(원 단위)
+    if bps is None:
+        em_pbr = soup.select_one("em#_pbr") or soup.select_one("em#pbr")
+        if em_pbr:
+            # 같은 <td> 안의 두 번째 em을 우선 시도
+            td = em_pbr.find_parent("td")
+            ems = td.find_all("em") if td else []
+            if len(ems) >= 2:
+                bps = to_float_safe(ems[1].get_text(strip=True))
+            # 보조: 문서 순서상 다음 em 하나만 집는다
+            if bps is None:
+                nxt = em_pbr.find_next("em")
+                if nxt and nxt is not em_pbr:
+                    bps = to_float_safe(nxt.get_text(strip=True))
+
+    # 최후 보강: 표 헤더가 'BPS'인 셀을 찾아 오른쪽(td) 값
+    if bps is None:
+        th_bps = soup.find(["th", "dt"], string=_BPS_LABEL)
+        if th_bps:
+            td_bps = th_bps.find_next("td") or (th_bps.parent.find_next("td") if th_bps.parent else None)
+            if td_bps:
+                bps = to_float_safe(td_bps.get_text(" ", strip=True))
+
+    # 마지막 보조: '원'이 포함된 em 주변에서 숫자만 추출
+    if bps is None:
+        em_with_won = soup.find("em", string=re.compile(r"원"))
+        if em_with_won:
+            candidate = em_with_won.get_text(" ", strip=True)
+            if to_float_safe(candidate) is None:
+                candidate = (em_with_won.previous_sibling or "") or em_with_won.parent.get_text(" ", strip=True)
+            bps = to_float_safe(candidate)
+
+    return per, pbr, roe, eps, bps
+
+# -----------------------------
+# 단계 연결
+# -----------------------------
+STRATEGIES = {"regex": extract_regex, "lxml": extract_lxml, "bs4": extract_bs4}
+
+def available_strategies() -> List[str]:
+    return [name for name in STRATEGIES if name != "lxml" or lxml_html is not None]
+
+_lock = threading.Lock()
+_counters = {"calls": 0, "regex_complete": 0, "lxml_used": 0, "bs4_used": 0, "errors": 0}
+
+def _count(name: str) -> None:
+    with _lock:
+        _counters[name] += 1
+
+def extract(html: str, per=None, pbr=None, roe=None, eps=None, bps=None) -> Values:
+    """regex → (lxml 또는 bs4) 순서로 비어 있는 값만 채운다"""
+    _count("calls")
+    values: Values = (per, pbr, roe, eps, bps)
+    try:
+        values = extract_regex(html, *values)
+    except Exception as e:
+        _count("errors")
+        log.warning("naver_html.extract_error", strategy="regex", error=str(e))
+    if not _needs_more(values):
+        _count("regex_complete")
+        return values
+
+    if lxml_html is not None:
+        try:
+            values = extract_lxml(html, *values)
+            _count("lxml_used")
+            return values
+        except Exception as e:
+            _count("errors")
+            log.warning("naver_html.extract_error", strategy="lxml", error=str(e))
+    _count("bs4_used")
+    return extract_bs4(html, *values)
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        c = dict(_counters)
+    c["lxml_available"] = lxml_html is not None
+    return c
@@ -0,0 +1,293 @@
+"""
+네이버 금융 시가총액 목록(sise_market_sum) 일괄 수집.
+
+- 종목별 경로(itemSummary JSON + 필요 시 종목 페이지)로 KRX 전체(~2,500 종목)를 갱신하면 수천 번 요청해야 하지만,
+  목록 페이지는 한 장에 50 종목의 PER/ROE 등을 담고 있어 KOSPI + KOSDAQ 전체가 수십 페이지로 끝난다
+- 표시 항목은 field_submit 으로 PER/PBR/ROE/EPS 를 고른 쿠키로 요청 (실패하면 기본 항목인 PER/ROE 만)
+  쿠키는 일회용 클라이언트로 받아 목록 요청 헤더에만 싣는다 (공유 클라이언트 쿠키 저장소에 남기지 않음)
+- 열 위치는 머리글(th) 순서로 찾는다. 모든 페이지를 열 리스트로 모은 뒤 DataFrame 을 한 번에 만든다
+- PER/PBR/ROE 중 빠진 값이 있는 종목은 fill(코드) (기존 종목별 경로)로 채운다. fill_codes 로 대상 종목을 좁힐 수 있다
+- 업종은 네이버 업종별 시세(sise_group, type=upjong) 목록과 업종별 구성 종목 페이지로 전 종목에 붙인다 (industry 열).
+  업종 구성은 자주 바뀌지 않아 industry_ttl 동안 재사용하고, 받지 못하면 이전 매핑(처음이면 빈 매핑)으로 진행
+- 보고서(last_report)에 요청 수·소요 시간과 종목별 경로로 했을 때의 최소 요청 수·시간을 함께 남긴다
+"""
+import asyncio, html as html_lib, os, re, time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Collection, Dict, List, Optional, Tuple
+
+import httpx
+
+from http_pool import pools
+from naver_html import to_float_safe
+from rate_governor import governor
+from telemetry import get_logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = get_logger("naver_listing")
+
+Metrics = Tuple[Optional[float], Optional[float], Optional[float]]
+FillFn = Callable[[str], Awaitable[Metrics]]
+
+LISTING_URL = os.getenv("NAVER_LISTING_URL", "https://finance.naver.com/sise/sise_market_sum.naver")
+FIELD_URL = os.getenv("NAVER_LISTING_FIELD_URL", "https://finance.naver.com/sise/field_submit.naver")
+INDUSTRY_URL = os.getenv("NAVER_INDUSTRY_URL", "https://finance.naver.com/sise/sise_group.naver")
+INDUSTRY_DETAIL_URL = os.getenv("NAVER_INDUSTRY_DETAIL_URL", "https://finance.naver.com/sise/sise_group_detail.naver")
+MARKETS = {"KS": 0, "KQ": 1}  # 시장 → sosok 파라미터
+FIELD_IDS = ("market_sum", "per", "pbr", "roe", "eps")
+# 머리글 → DataFrame 열 이름
+COLUMNS = {"시가총액": "market_cap", "PER": "per", "PBR": "pbr", "ROE": "roe", "EPS": "eps"}
+METRIC_COLUMNS = ("per", "pbr", "roe")
+HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+_TABLE = re.compile(r'<table[^>]*class="type_2"[^>]*>(.*?)</table>', re.S)
+_TH = re.compile(r'<th[^>]*>(.*?)</th>', re.S)
+_TR = re.compile(r'<tr[^>]*>(.*?)</tr>', re.S)
+_TD = re.compile(r'<td[^>]*>(.*?)</td>', re.S)
+_CODE = re.compile(r'code=(\d{6})')
+_NAME = re.compile(r'class="tltle"[^>]*>(.*?)</a>', re.S)
+_LAST_PAGE = re.compile(r'class="pgRR".*?page=(\d+)', re.S)
+_GROUP_TABLE = re.compile(r'<table[^>]*class="type_1"[^>]*>(.*?)</table>', re.S)
+_GROUP = re.compile(r'sise_group_detail\.naver\?type=upjong&(?:amp;)?no=(\d+)"[^>]*>(.*?)</a>', re.S)
+_MEMBER_TABLE = re.compile(r'<table[^>]*class="type_5"[^>]*>(.*?)</table>', re.S)
+_MEMBER = re.compile(r'/item/main\.naver\?code=(\d{6})')
+_TAG = re.compile(r'<[^>]+>')
+
+def _text(fragment: str) -> str:
+    return html_lib.unescape(_TAG.sub("", fragment)).strip()
+
+def parse_page(page: str) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """목록 페이지 한 장 → (종목 행 목록, 마지막 페이지 번호). 행은 code, name 과 머리글에 있는 지표 열"""
+    m = _TABLE.search(page)
+    if not m:
+        return [], None
+    table = m.group(1)
+    header = [_text(h) for h in _TH.findall(table)]
+    positions = {COLUMNS[h]: i for i, h in enumerate(header) if h in COLUMNS}
+    rows = []
+    for tr in _TR.findall(table):
+        code = _CODE.search(tr)
+        name = _NAME.search(tr)
+        if not code or not name:
+            continue
+        cells = _TD.findall(tr)
+        row = {"code": code.group(1), "name": _text(name.group(1))}
+        for col, i in positions.items():
+            row[col] = to_float_safe(_text(cells[i])) if i < len(cells) else None
+        rows.append(row)
+    last = _LAST_PAGE.search(page)
+    return rows, int(last.group(1)) if last else None
+
+def parse_industries(page: str) -> List[Tuple[str, str]]:
+    """업종별 시세 목록 → [(업종 번호, 업종명)]"""
+    m = _GROUP_TABLE.search(page)
+    if not m:
+        return []
+    seen, out = set(), []
+    for no, name in _GROUP.findall(m.group(1)):
+        if no not in seen:
+            seen.add(no)
+            out.append((no, _text(name)))
+    return out
+
+def parse_industry_members(page: str) -> List[str]:
+    """업종 구성 종목 페이지 → 종목 코드 목록"""
+    m = _MEMBER_TABLE.search(page)
+    return list(dict.fromkeys(_MEMBER.findall(m.group(1)))) if m else []
+
+class ListingIngester:
+    def __init__(self, concurrency: int = 4, fill_concurrency: int = 4, industry_ttl: float = 86400.0):
+        self.concurrency = concurrency
+        self.fill_concurrency = fill_concurrency
+        self.industry_ttl = industry_ttl
+        self.running = False
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._industry: Dict[str, str] = {}  # 코드 → 업종명
+        self._industry_at: Optional[float] = None
+
+    async def _field_cookie(self) -> Optional[str]:
+        """
+        PER/PBR/ROE/EPS 표시 항목을 고른 쿠키 (Cookie 헤더 값). 실패하면 None - 기본 항목으로 진행.
+        공유 네이버 클라이언트의 쿠키 저장소에 남으면 다른 네이버 요청 응답까지 바뀌므로 일회용 클라이언트로 받고,
+        목록 요청 헤더에만 싣는다
+        """
+        try:
+            async with pools.isolated_aclient("naver") as isolated:
+                r = await isolated.get(FIELD_URL, headers=HEADERS, follow_redirects=False, params=[
+                    ("menu", "market_sum"), ("returnUrl", LISTING_URL), *(("fieldIds", f) for f in FIELD_IDS)
+                ])
+            cookies = r.cookies
+            if not cookies:
+                return None
+            return "; ".join(f"{k}={v}" for k, v in cookies.items())
+        except httpx.HTTPError as e:
+            log.warning("naver_listing.field_error", error=str(e))
+            return None
+
+    async def _get(self, client: httpx.AsyncClient, url: str, params: Dict[str, Any],
+                   cookie: Optional[str] = None) -> str:
+        headers = dict(HEADERS, Cookie=cookie) if cookie else HEADERS
+        r = await client.get(url, headers=headers, params=params)
+        r.raise_for_status()
+        return r.text
+
+    async def _page(self, client: httpx.AsyncClient, sosok: int, page: int, cookie: Optional[str]) -> str:
+        return await self._get(client, LISTING_URL, {"sosok": sosok, "page": page}, cookie)
+
+    async def _industries(self, client: httpx.AsyncClient, sem: asyncio.Semaphore,
+                          counts: Dict[str, int]) -> Dict[str, str]:
+        """코드 → 업종명. industry_ttl 이내면 이전 매핑 그대로, 업종 페이지 하나라도 실패하면 이전 매핑 유지"""
+        if self._industry_at is not None and time.time() - self._industry_at < self.industry_ttl:
+            return self._industry
+
+        async def members(no: str, name: str) -> Tuple[str, List[str]]:
+            async with sem:
+                counts["requests"] += 1
+                return name, parse_industry_members(
+                    await self._get(client, INDUSTRY_DETAIL_URL, {"type": "upjong", "no": no}))
+
+        try:
+            async with sem:
+                counts["requests"] += 1
+                groups = parse_industries(await self._get(client, INDUSTRY_URL, {"type": "upjong"}))
+            mapping: Dict[str, str] = {}
+            for name, codes in await asyncio.gather(*(members(no, name) for no, name in groups)):
+                for code in codes:
+                    mapping.setdefault(code, name)
+        except Exception as e:
+            counts["industry_errors"] += 1
+            log.warning("naver_listing.industry_error", error=str(e))
+            return self._industry
+        if mapping:
+            self._industry, self._industry_at = mapping, time.time()
+        return self._industry
+
+    async def _market(self, client: httpx.AsyncClient, market: str, cookie: Optional[str],
+                      sem: asyncio.Semaphore, counts: Dict[str, int]) -> List[Dict[str, Any]]:
+        """시장 하나의 전체 페이지. 첫 페이지로 마지막 페이지를 알아낸 뒤 나머지는 동시에 받는다"""
+        sosok = MARKETS[market]
+
+        async def one(page: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+            async with sem:
+                counts["requests"] += 1
+                try:
+                    return parse_page(await self._page(client, sosok, page, cookie))
+                except Exception as e:
+                    counts["page_errors"] += 1
+                    log.warning("naver_listing.page_error", market=market, page=page, error=str(e))
+                    return [], None
+
+        rows, last = await one(1)
+        pages = [rows]
+        if last and last > 1:
+            pages += [r for r, _ in await asyncio.gather(*(one(p) for p in range(2, last + 1)))]
+        out = []
+        for page_rows in pages:
+            for row in page_rows:
+                row["market"] = market
+                out.append(row)
+        return out
+
+    async def ingest(self, client: httpx.AsyncClient, fill: Optional[FillFn] = None,
+                     fill_codes: Optional[Collection[str]] = None) -> "pd.DataFrame":
+        """
+        전 종목 DataFrame (code, name, market, rank, market_cap, per, pbr, roe, eps, industry, source).
+        industry: 네이버 업종명 (업종 매핑에 없으면 "")
+        source: "listing"(목록 값만으로 완전) / "item"(종목별 경로로 채움) / ""(빠진 값 남음)
+        """
+        import pandas as pd
+
+        self.running = True
+        started = time.perf_counter()
+        counts = {"requests": 0, "page_errors": 0, "industry_errors": 0}
+        try:
+            cookie = await self._field_cookie()
+            counts["requests"] += 1
+            sem = asyncio.Semaphore(self.concurrency)
+            industry, *markets = await asyncio.gather(
+                self._industries(client, sem, counts), *(self._market(client, m, cookie, sem, counts) for m in MARKETS))
+            rows = [row for market_rows in markets for row in market_rows]
+            listing_sec = time.perf_counter() - started
+
+            # 열 리스트로 모아 DataFrame 을 한 번에 만든다
+            names = ("code", "name", "market") + tuple(COLUMNS.values())
+            columns = {c: [r.get(c) for r in rows] for c in names}
+            df = pd.DataFrame(columns)
+            for c in COLUMNS.values():
+                df[c] = pd.to_numeric(df[c], errors="coerce")
+            df.insert(3, "rank", df.groupby("market").cumcount() + 1)
+            df["industry"] = df["code"].map(industry).fillna("")
+            complete = df[list(METRIC_COLUMNS)].notna().all(axis=1)
+            df["source"] = complete.map({True: "listing", False: ""})
+
+            fill_started = time.perf_counter()
+            filled = 0
+            todo = df.index[~complete]
+            if fill_codes is not None:
+                wanted = set(fill_codes)
+                todo = [i for i in todo if df.at[i, "code"] in wanted]
+            if fill is not None and len(todo):
+                filled = await self._fill(df, list(todo), fill)
+            fill_sec = time.perf_counter() - fill_started
+        finally:
+            self.running = False
+
+        rate = governor.rate("naver_json")
+        self.last_report = {
+            "rows": len(df),
+            "complete_from_listing": int(complete.sum()),
+            "filled_per_item": filled,
+            "fill_attempted": len(todo),
+            "missing": int((df["source"] == "").sum()),
+            "field_selection": cookie is not None,
+            "industry_rows": int((df["industry"] != "").sum()),
+            "industry_groups": len(set(industry.values())),
+            "industry_errors": counts["industry_errors"],
+            "listing_requests": counts["requests"],
+            "page_errors": counts["page_errors"],
+            "listing_sec": round(listing_sec, 2),
+            "fill_sec": round(fill_sec, 2),
+            "elapsed_sec": round(time.perf_counter() - started, 2),
+            # 같은 종목을 종목별 경로로 받을 때의 하한: 종목당 JSON 1회 (부족하면 종목 페이지 추가), naver_json 버킷 속도
+            "per_item_requests_min": len(df),
+            "per_item_sec_min": round(len(df) / rate, 1) if rate else None,
+            "finished_at": time.time(),
+        }
+        log.info("naver_listing.ingest", **{k: v for k, v in self.last_report.items() if k != "finished_at"})
+        return df
+
+    async def _fill(self, df: "pd.DataFrame", todo: List[int], fill: FillFn) -> int:
+        """빠진 값이 있는 행을 종목별 경로로 조회해 빈 칸만 채운다. 채워서 완전해진 행 수"""
+        sem = asyncio.Semaphore(self.fill_concurrency)
+
+        async def one(i: int) -> Optional[Metrics]:
+            async with sem:
+                try:
+                    return await fill(df.at[i, "code"])
+                except Exception as e:
+                    log.warning("naver_listing.fill_error", code=df.at[i, "code"], error=str(e))
+                    return None
+
+        filled = 0
+        for i, values in zip(todo, await asyncio.gather(*(one(i) for i in todo))):
+            if values is None:
+                continue
+            for col, v in zip(METRIC_COLUMNS, values):
+                if v is not None and df.at[i, col] != df.at[i, col]:  # NaN 인 칸만
+                    df.at[i, col] = v
+            if df.loc[i, list(METRIC_COLUMNS)].notna().all():
+                df.at[i, "source"] = "item"
+                filled += 1
+        return filled
+
+    def stats(self) -> Dict[str, Any]:
+        return {"running": self.running, "last_report": self.last_report}
+
+listing = ListingIngester(
+    concurrency=int(os.getenv("NAVER_LISTING_CONCURRENCY", "4")),
+    fill_concurrency=int(os.getenv("NAVER_LISTING_FILL_CONCURRENCY", "4")),
+    industry_ttl=float(os.getenv("NAVER_INDUSTRY_TTL_SEC", "86400")),
+)
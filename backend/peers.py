@@ -0,0 +1,188 @@
+"""
+업종(섹터) 내 상대 위치 - PER/PBR/ROE 백분위와 상대 RPG 분류.
+
+- 스크리너 스냅샷을 섹터별·시장별 그룹으로 나눠, 그룹마다 지표별 정렬 배열(NaN 제외)을 미리 만들어 둔다
+- 백분위는 정렬 배열에 searchsorted 두 번 (O(log n)) - 동점은 중간 순위 (left + right) / 2
+- 종목 하나의 지표가 바뀌면 그 종목이 속한 그룹 배열에서 옛 값을 빼고 새 값을 제자리에 끼운다 (전체 재정렬 없음)
+  배열은 새로 만들어 참조만 바꾸므로 조회는 잠금 안에서 참조만 잡고 searchsorted 는 잠금 밖에서
+- 섹터 종목 수가 min_peers 미만이거나 섹터를 모르면 같은 시장(KS/KQ) 전체를 비교 그룹으로.
+  이때 결과의 basis 는 "market", sector 는 종목 자신의 섹터(모르면 None) - 업종 비교로 읽히지 않게
+- 상대 분류: thresholds() 가 비교 그룹의 중앙값을 RPG 기준값(ROE 이상 High, PER·PBR 이하 Low)으로 돌려준다
+  (rpg.classify_rpg 에 그대로 넘기면 같은 규칙으로 업종 대비 분류)
+"""
+import math, os, threading, time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rpg import DEFAULT_THRESHOLDS, RPGThresholds
+from telemetry import get_logger
+
+log = get_logger("peers")
+
+COLUMNS = ("per", "pbr", "roe")
+Metrics = Tuple[Optional[float], Optional[float], Optional[float]]  # (per, pbr, roe)
+
+def _nan(v) -> float:
+    return np.nan if v is None else float(v)
+
+def _remove(arr: np.ndarray, value: float) -> np.ndarray:
+    if math.isnan(value):
+        return arr
+    i = int(np.searchsorted(arr, value, side="left"))
+    if i < arr.size and arr[i] == value:
+        return np.delete(arr, i)
+    return arr
+
+def _insert(arr: np.ndarray, value: float) -> np.ndarray:
+    if math.isnan(value):
+        return arr
+    return np.insert(arr, int(np.searchsorted(arr, value, side="right")), value)
+
+def _median(arr: np.ndarray) -> Optional[float]:
+    n = arr.size
+    if not n:
+        return None
+    return float(arr[(n - 1) // 2] + arr[n // 2]) / 2
+
+class PeerIndex:
+    def __init__(self, min_peers: int = 5):
+        self.min_peers = min_peers
+        # 그룹 키("sector:반도체", "market:KS") → 지표 → 정렬 배열
+        self._sorted: Dict[str, Dict[str, np.ndarray]] = {}
+        # 심볼 → (섹터 그룹, 시장 그룹, 현재 값). 코드(6자리)로도 찾을 수 있게 별칭
+        self._members: Dict[str, Tuple[Optional[str], Optional[str], Tuple[float, ...]]] = {}
+        self._alias: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.loaded_at: Optional[float] = None
+        self._counters = {"loads": 0, "updates": 0, "unchanged": 0, "lookups": 0}
+
+    # -----------------------------
+    # 구성
+    # -----------------------------
+    def load(self, symbols: Sequence[str], codes: Sequence[str], markets: Sequence[str], sectors: Sequence[str],
+             values: Dict[str, np.ndarray]) -> None:
+        """스냅샷 컬럼 배열로 전체 그룹을 다시 만든다 (다 만든 뒤 참조만 교체)"""
+        started = time.perf_counter()
+        symbols, markets, sectors = np.asarray(symbols), np.asarray(markets), np.asarray(sectors)
+        cols = {c: np.asarray(values[c], dtype=np.float64) for c in COLUMNS}
+        keys = {
+            "sector": np.array([f"sector:{s}" if s else "" for s in sectors], dtype=object),
+            "market": np.array([f"market:{m}" if m else "" for m in markets], dtype=object),
+        }
+        groups: Dict[str, Dict[str, np.ndarray]] = {}
+        for kind_keys in keys.values():
+            for key in set(kind_keys.tolist()) - {""}:
+                mask = kind_keys == key
+                groups[key] = {c: np.sort(v[mask & ~np.isnan(v)]) for c, v in cols.items()}
+
+        members = {}
+        alias = {}
+        for i, sym in enumerate(symbols.tolist()):
+            members[sym] = (keys["sector"][i] or None, keys["market"][i] or None,
+                            tuple(float(cols[c][i]) for c in COLUMNS))
+            if i < len(codes) and codes[i]:
+                alias[str(codes[i])] = sym
+        with self._lock:
+            self._sorted, self._members, self._alias = groups, members, alias
+            self.loaded_at = time.time()
+            self._counters["loads"] += 1
+        log.info("peers.loaded", members=len(members), groups=len(groups),
+                 elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+
+    def _symbol(self, key: str) -> Optional[str]:
+        if key in self._members:
+            return key
+        return self._alias.get(key)
+
+    def update(self, key: str, metrics: Metrics) -> bool:
+        """종목 하나의 새 지표 (심볼 또는 6자리 코드). 스냅샷에 없는 종목이거나 값이 같으면 False"""
+        with self._lock:
+            symbol = self._symbol(key)
+            if symbol is None:
+                return False
+            sector, market, old = self._members[symbol]
+            new = tuple(_nan(v) for v in metrics)
+            if all(a == b or (math.isnan(a) and math.isnan(b)) for a, b in zip(old, new)):
+                self._counters["unchanged"] += 1
+                return False
+            for group in (sector, market):
+                if group is None:
+                    continue
+                arrays = dict(self._sorted[group])
+                for c, a, b in zip(COLUMNS, old, new):
+                    if a != b:
+                        arrays[c] = _insert(_remove(arrays[c], a), b)
+                self._sorted[group] = arrays
+            self._members[symbol] = (sector, market, new)
+            self._counters["updates"] += 1
+        return True
+
+    # -----------------------------
+    # 조회
+    # -----------------------------
+    def _group(self, symbol: str) -> Optional[str]:
+        """비교 그룹: 섹터 종목이 min_peers 이상이면 섹터, 아니면 시장"""
+        sector, market, _ = self._members[symbol]
+        for group in (sector, market):
+            if group is not None and max(a.size for a in self._sorted[group].values()) >= self.min_peers:
+                return group
+        return None
+
+    def percentiles(self, key: str, metrics: Optional[Metrics] = None) -> Optional[Dict[str, Any]]:
+        """
+        비교 그룹 안에서의 백분위 (0~100, 오름차순 - PER/PBR 은 낮을수록, ROE 는 높을수록 유리).
+        metrics 를 주면 그 값으로, 없으면 저장된 값으로. 스냅샷에 없는 종목이면 None.
+        basis: "sector"(업종 비교) / "market"(시장 전체로 대체), group: 비교 그룹 이름, sector: 종목의 섹터
+        """
+        with self._lock:  # 전체 재구성(load)과 섞이지 않게 그룹·값 참조만 잠금 안에서
+            symbol = self._symbol(key)
+            group = self._group(symbol) if symbol is not None else None
+            if group is None:
+                return None
+            self._counters["lookups"] += 1
+            arrays = self._sorted[group]
+            sector, _, stored = self._members[symbol]
+            values = tuple(_nan(v) for v in metrics) if metrics is not None else stored
+        out: Dict[str, Any] = {
+            "basis": group.split(":", 1)[0], "group": group.split(":", 1)[1],
+            "sector": sector.split(":", 1)[1] if sector else None,
+        }
+        for c, v in zip(COLUMNS, values):
+            arr = arrays[c]
+            pct = None
+            if arr.size and not math.isnan(v):
+                left = int(np.searchsorted(arr, v, side="left"))
+                right = int(np.searchsorted(arr, v, side="right"))
+                pct = round((left + right) / 2 / arr.size * 100, 1)
+            median = _median(arr)
+            out[c] = {"percentile": pct, "median": None if median is None else round(median, 4), "count": int(arr.size)}
+        return out
+
+    def thresholds(self, key: str) -> Optional[RPGThresholds]:
+        """비교 그룹 중앙값 기준 (그룹에 값이 없는 지표는 기본 기준값)"""
+        with self._lock:
+            symbol = self._symbol(key)
+            group = self._group(symbol) if symbol is not None else None
+            if group is None:
+                return None
+            arrays = self._sorted[group]
+        roe, per, pbr = (_median(arrays[c]) for c in ("roe", "per", "pbr"))
+        return RPGThresholds(
+            roe_min=DEFAULT_THRESHOLDS.roe_min if roe is None else roe,
+            per_max=DEFAULT_THRESHOLDS.per_max if per is None else per,
+            pbr_max=DEFAULT_THRESHOLDS.pbr_max if pbr is None else pbr,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self._counters)
+            c.update({
+                "members": len(self._members),
+                "groups": len(self._sorted),
+                "loaded_at": self.loaded_at,
+                "min_peers": self.min_peers,
+            })
+        return c
+
+peers = PeerIndex(min_peers=int(os.getenv("PEER_MIN_GROUP", "5")))
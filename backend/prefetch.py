@@ -0,0 +1,192 @@
+"""
+인기 종목 미리 가져오기 (캐시 워밍).
+
+- analyze_by_name 이 해석한 (심볼, 표시 이름)마다 조회 빈도를 반감기 방식으로 센다 (오래된 조회일수록 가중치가 작다)
+- 주기적으로 상위 N 개 종목의 지표·GPT 요약 캐시를 만료 전에 다시 채운다 (무엇을 갱신할지는 warm 함수가 결정)
+- 기동 직후 시드 목록(KOSPI 200 등)을 먼저 워밍
+- 업스트림 호출은 BACKGROUND 우선순위로 토큰을 받고(사용자 요청이 먼저), 자체 속도 제한·GPT 호출 예산을 따로 둔다
+  연속 실패가 이어지면(업스트림 장애, 토큰 대기 초과) 이번 주기는 멈추고 다음 주기로 미룬다
+"""
+import asyncio, heapq, math, os, threading, time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from rate_governor import BACKGROUND, priority
+from screener import _RateLimiter
+from telemetry import get_logger
+
+log = get_logger("prefetch")
+
+Target = Tuple[str, str]  # (심볼, 표시 이름)
+WarmFn = Callable[[str, str], Awaitable[str]]
+
+# warm 함수가 돌려주는 결과 중 실패로 보는 것
+FAILED = ("error", "empty")
+
+class QueryTracker:
+    """(심볼, 이름)별 조회 점수. 점수는 half_life 초마다 절반으로 줄어든다"""
+    def __init__(self, half_life: float = 3600.0, maxsize: int = 5000):
+        self.half_life = half_life
+        self.maxsize = maxsize
+        self._scores: Dict[Target, Tuple[float, float]] = {}  # 대상 → (점수, 갱신 시각)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def _decayed(self, score: float, updated: float, now: float) -> float:
+        return score * math.pow(0.5, (now - updated) / self.half_life)
+
+    def record(self, symbol: str, name: str) -> None:
+        now = time.time()
+        key = (symbol, name)
+        with self._lock:
+            score, updated = self._scores.get(key, (0.0, now))
+            self._scores[key] = (self._decayed(score, updated, now) + 1.0, now)
+            self.recorded += 1
+            if len(self._scores) > self.maxsize:
+                self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        """점수가 낮은 절반을 버린다 (lock 안에서 호출)"""
+        keep = heapq.nlargest(self.maxsize // 2, self._scores.items(),
+                              key=lambda kv: self._decayed(kv[1][0], kv[1][1], now))
+        self._scores = dict(keep)
+
+    def top(self, n: int) -> List[Tuple[str, str, float]]:
+        now = time.time()
+        with self._lock:
+            items = [(sym, name, self._decayed(s, u, now)) for (sym, name), (s, u) in self._scores.items()]
+        return heapq.nlargest(n, items, key=lambda t: t[2])
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+class Prefetcher:
+    def __init__(self, top_n: int = 50, interval: float = 600.0, refresh_ahead: float = 0.8,
+                 rate: float = 1.0, concurrency: int = 2, gpt_budget: int = 30, max_failures: int = 5,
+                 tracker: Optional[QueryTracker] = None):
+        self.top_n = top_n
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.rate = rate
+        self.concurrency = concurrency
+        self.gpt_budget = gpt_budget
+        self.max_failures = max_failures
+        self.tracker = tracker or QueryTracker()
+        self.running = False
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._gpt_left = gpt_budget
+        self._lock = threading.Lock()
+        self._totals: Counter = Counter()
+
+    def record(self, symbol: str, name: str) -> None:
+        self.tracker.record(symbol, name)
+
+    def due(self, age: Optional[float], ttl: float) -> bool:
+        """캐시 항목이 없거나 TTL 의 refresh_ahead 비율을 지났으면 갱신 대상"""
+        return age is None or age >= ttl * self.refresh_ahead
+
+    def take_gpt(self) -> bool:
+        """이번 주기의 GPT 호출 예산에서 1회 차감 (남은 예산이 없으면 False)"""
+        with self._lock:
+            if self._gpt_left <= 0:
+                return False
+            self._gpt_left -= 1
+            return True
+
+    async def warm(self, targets: Sequence[Target], warm_one: WarmFn, reason: str = "top") -> Dict[str, Any]:
+        """targets 를 순서대로(중요한 것부터) 워밍. 결과별 개수를 돌려준다"""
+        if self.running:
+            return {"skipped": "already running"}
+        self.running = True
+        with self._lock:
+            self._gpt_left = self.gpt_budget
+        started = time.perf_counter()
+        outcomes: Counter = Counter()
+        limiter = _RateLimiter(self.rate)
+        sem = asyncio.Semaphore(self.concurrency)
+        failures = 0
+        stop = asyncio.Event()
+
+        async def one(symbol: str, name: str) -> None:
+            nonlocal failures
+            async with sem:
+                if stop.is_set():
+                    outcomes["aborted"] += 1
+                    return
+                await limiter.wait()
+                try:
+                    with priority(BACKGROUND):
+                        outcome = await warm_one(symbol, name)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log.warning("prefetch.error", symbol=symbol, error=str(e))
+                    outcome = "error"
+                outcomes[outcome] += 1
+                failures = failures + 1 if outcome in FAILED else 0
+                if failures >= self.max_failures and not stop.is_set():
+                    log.warning("prefetch.abort", reason=reason, failures=failures)
+                    stop.set()
+
+        try:
+            await asyncio.gather(*(one(sym, name) for sym, name in targets))
+        finally:
+            self.running = False
+            with self._lock:
+                self._totals.update(outcomes)
+            self.last_run = {
+                "reason": reason,
+                "targets": len(targets),
+                "outcomes": dict(outcomes),
+                "elapsed": round(time.perf_counter() - started, 2),
+                "finished_at": time.time(),
+            }
+        log.info("prefetch.run", **self.last_run)
+        return self.last_run
+
+    async def run_periodic(self, seeds: Callable[[], Awaitable[Sequence[Target]]], warm_one: WarmFn) -> None:
+        """기동 시 시드 워밍 후 interval 초마다 인기 상위 top_n 워밍 (앱 수명 주기 동안 백그라운드 태스크)"""
+        try:
+            targets = await seeds()
+            if targets:
+                await self.warm(targets, warm_one, reason="seed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error("prefetch.seed_error", error=str(e))
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                top = [(sym, name) for sym, name, _ in self.tracker.top(self.top_n)]
+                if top:
+                    await self.warm(top, warm_one)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error("prefetch.run_error", error=str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = dict(self._totals)
+        return {
+            "tracked": len(self.tracker),
+            "recorded": self.tracker.recorded,
+            "top": [{"symbol": s, "name": n, "score": round(sc, 2)} for s, n, sc in self.tracker.top(10)],
+            "running": self.running,
+            "last_run": self.last_run,
+            "totals": totals,
+            "top_n": self.top_n,
+            "interval": self.interval,
+            "refresh_ahead": self.refresh_ahead,
+            "gpt_budget": self.gpt_budget,
+        }
+
+prefetcher = Prefetcher(
+    top_n=int(os.getenv("PREFETCH_TOP_N", "50")),
+    interval=float(os.getenv("PREFETCH_INTERVAL_SEC", "600")),
+    refresh_ahead=float(os.getenv("PREFETCH_REFRESH_AHEAD", "0.8")),
+    rate=float(os.getenv("PREFETCH_RATE", "1")),
+    concurrency=int(os.getenv("PREFETCH_CONCURRENCY", "2")),
+    gpt_budget=int(os.getenv("PREFETCH_GPT_BUDGET", "30")),
+    tracker=QueryTracker(half_life=float(os.getenv("PREFETCH_HALF_LIFE_SEC", "3600"))),
+)
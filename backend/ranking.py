@@ -0,0 +1,148 @@
+"""
+티커 후보 랭킹 엔진.
+
+후보 전체를 NumPy 문자열 ufunc(np.strings)로 한 번에 점수화하고, 상위 k 개만 argpartition 으로 고른다.
+- 이름 매칭: 포함(+2) / 완전 일치(+2)  (기존 _rank_kr_candidates 와 동일)
+- 접두 일치 / 토큰 겹침 비율
+- 거래소 우선순위 테이블 (기본: KRX > 미국 본상장 > 기타, RANK_EXCHANGE_PRIORITY 로 조정)
+Finnhub 검색 결과와 로컬 종목 인덱스 결과를 같은 엔진으로 정렬한다.
+"""
+import os, re
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 거래소 접미사 → 가산점. "US" 는 접미사가 없거나 주식 클래스(BRK.B)만 붙은 미국 본상장 심볼
+DEFAULT_EXCHANGE_PRIORITY = {"KS": 0.3, "KQ": 0.3, "US": 0.2}
+
+US_SHARE_CLASSES = ("A", "B", "C")
+
+DEFAULT_WEIGHTS = {
+    "base": 1.0,
+    "contains": 2.0,
+    "exact": 2.0,
+    "prefix": 0.5,
+    "token_overlap": 0.5,
+}
+
+def parse_priority(spec: Optional[str]) -> Dict[str, float]:
+    """'KS=0.3,KQ=0.3,US=0.2' 형식 파싱"""
+    if not spec:
+        return dict(DEFAULT_EXCHANGE_PRIORITY)
+    table = {}
+    for part in spec.split(","):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            table[k.strip().upper()] = float(v)
+    return table
+
+def _tokens(s: str) -> List[str]:
+    return [t for t in re.split(r"[^0-9a-z가-힣]+", s.lower()) if t]
+
+class RankingEngine:
+    def __init__(self, exchange_priority: Optional[Dict[str, float]] = None,
+                 weights: Optional[Dict[str, float]] = None):
+        self.exchange_priority = dict(exchange_priority or DEFAULT_EXCHANGE_PRIORITY)
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+
+    def _exchange_boost(self, symbols: np.ndarray) -> np.ndarray:
+        boost = np.zeros(symbols.shape, dtype=np.float64)
+        for suffix, value in self.exchange_priority.items():
+            if suffix == "US":
+                continue
+            boost = np.where(np.strings.endswith(symbols, "." + suffix), value, boost)
+        us = self.exchange_priority.get("US")
+        if us:
+            # 접미사 없음 또는 주식 클래스(BRK.B) → 미국 본상장 (APC.F 같은 해외 거래소 접미사는 제외)
+            is_us = np.strings.rfind(symbols, ".") < 0
+            for share_class in US_SHARE_CLASSES:
+                is_us |= np.strings.endswith(symbols, "." + share_class)
+            boost = np.where(is_us & (boost == 0), us, boost)
+        return boost
+
+    def prepare(self, items: List[Dict[str, Any]]) -> "CandidateSet":
+        """후보 딕셔너리 목록 → 점수화용 배열 묶음 (한 번 만들어 여러 질의에 재사용 가능)"""
+        syms = [x.get("symbol", "") for x in items]
+        positions = np.arange(len(items))
+        if not all(type(s) is str for s in syms):
+            # 드문 경우: 심볼이 문자열이 아닌 항목 제외
+            keep = [i for i, s in enumerate(syms) if isinstance(s, str)]
+            items = [items[i] for i in keep]
+            syms = [syms[i] for i in keep]
+            positions = np.asarray(keep, dtype=np.intp)
+        # 소문자화·양끝 공백 패딩은 파이썬 str 메서드로 한 번에 (np.strings.lower 보다 빠름)
+        descs = [f" {(x.get('description') or '').lower()} " for x in items]
+        symbols = np.asarray(syms, dtype=np.str_)
+        return CandidateSet(items, positions, symbols, np.asarray(descs, dtype=np.str_), self._exchange_boost(symbols))
+
+    def score(self, query: str, cs: "CandidateSet", prior: Optional[Sequence[float]] = None) -> np.ndarray:
+        """후보 전체 점수 (벡터)"""
+        w = self.weights
+        q = query.strip().lower()
+        descs = cs.descriptions
+        n = len(cs)
+
+        scores = cs.exchange_boost + w["base"]
+        if q:
+            pos = np.strings.find(descs, q)
+            scores += w["contains"] * (pos >= 0)
+            scores += w["exact"] * np.strings.equal(descs, f" {q} ")
+            scores += w["prefix"] * (pos == 1)
+
+            q_tokens = _tokens(q)
+            if len(q_tokens) > 1:
+                hits = np.zeros(n, dtype=np.float64)
+                for t in q_tokens:
+                    hits += np.strings.find(descs, f" {t} ") >= 0
+                scores += w["token_overlap"] * hits / len(q_tokens)
+
+        if prior is not None:
+            scores += np.asarray(prior, dtype=np.float64)
+        return scores
+
+    def top_k(self, scores: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+        """점수 내림차순 상위 k 개 인덱스 (동점은 입력 순서 유지)"""
+        n = scores.shape[0]
+        if n == 0:
+            return np.empty(0, dtype=np.intp)
+        if k is None or k >= n:
+            idx = np.arange(n)
+        else:
+            # argpartition 으로 k 번째 점수만 구하고, 경계 동점은 앞선 후보부터 채운다
+            kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            above = np.flatnonzero(scores > kth)
+            ties = np.flatnonzero(scores == kth)[:k - above.size]
+            idx = np.concatenate([above, ties])
+        return idx[np.lexsort((idx, -scores[idx]))]
+
+    def rank_prepared(self, query: str, cs: "CandidateSet", k: Optional[int] = None,
+                      prior: Optional[Sequence[float]] = None) -> List[Dict[str, Any]]:
+        if not len(cs):
+            return []
+        scores = self.score(query, cs, prior)
+        return [cs.items[i] for i in self.top_k(scores, k)]
+
+    def rank(self, query: str, items: List[Dict[str, Any]], k: Optional[int] = None,
+             prior: Optional[Sequence[float]] = None) -> List[Dict[str, Any]]:
+        """Finnhub /search 형식({symbol, description}) 후보 정렬. prior 는 items 와 같은 길이의 사전 점수"""
+        cs = self.prepare(items)
+        if prior is not None:
+            prior = np.asarray(prior, dtype=np.float64)[cs.positions]
+        return self.rank_prepared(query, cs, k, prior)
+
+class CandidateSet:
+    """점수화에 필요한 배열(심볼, 소문자·패딩 설명, 거래소 가산점)을 미리 만들어 둔 후보 묶음"""
+    __slots__ = ("items", "positions", "symbols", "descriptions", "exchange_boost")
+
+    def __init__(self, items: List[Dict[str, Any]], positions: np.ndarray, symbols: np.ndarray,
+                 descriptions: np.ndarray, exchange_boost: np.ndarray):
+        self.items = items
+        self.positions = positions  # 원래 items 목록에서의 위치
+        self.symbols = symbols
+        self.descriptions = descriptions
+        self.exchange_boost = exchange_boost
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+engine = RankingEngine(parse_priority(os.getenv("RANK_EXCHANGE_PRIORITY")))
@@ -0,0 +1,300 @@
+"""
+업스트림 호출 속도 조절 (토큰 버킷).
+
+429 를 받은 뒤 재시도하는 대신, 보내기 전에 버킷에서 토큰을 받아 업스트림 한도를 넘지 않게 한다.
+- 버킷: finnhub_search / finnhub_metric / naver_json / naver_html / openai
+  RATE_LIMIT_<버킷> = "횟수/초[:버스트]" (예: "30/60:4" → 분당 30회, 순간 최대 4회), "off" 면 제한 없음
+- 스레드와 asyncio 태스크가 같은 버킷을 공유. RATE_LIMIT_DB 를 지정하면 토큰 상태를 SQLite 로 워커 간 공유
+  (공유 상태의 읽기·쓰기 트랜잭션은 aacquire 에서 asyncio.to_thread 로 - 다른 워커가 잠가도 이벤트 루프는 멈추지 않음)
+- 우선순위: interactive(사용자 요청) > batch(배치 분석) > background(스크리너/캐시 갱신)
+  대기열에서 우선순위가 높은 호출이 먼저 토큰을 받고, 예상 대기가 우선순위별 상한을 넘으면 RateLimitExceeded
+"""
+import os, time, bisect, asyncio, itertools, threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from shared_state import SQLiteConn, db_path
+
+INTERACTIVE, BATCH, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", BACKGROUND: "background"}
+
+# 무료 Finnhub 키는 분당 60회 - 두 버킷의 (버스트 + 분당 횟수) 합이 60 을 넘지 않게 잡았다
+DEFAULT_LIMITS = {
+    "finnhub_search": "20/60:3",
+    "finnhub_metric": "30/60:4",
+    "naver_json": "10/1:5",
+    "naver_html": "5/1:3",
+    "naver_listing": "2/1:2",
+    "openai": "60/60:5",
+}
+DEFAULT_MAX_WAIT = {INTERACTIVE: 5.0, BATCH: 30.0, BACKGROUND: 300.0}
+
+_priority: ContextVar[int] = ContextVar("rate_priority", default=INTERACTIVE)
+
+@contextmanager
+def priority(level: int):
+    """with priority(BACKGROUND): 블록 안(과 그 안에서 만든 태스크, asyncio.to_thread)의 업스트림 호출 우선순위 지정"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> int:
+    return _priority.get()
+
+class RateLimitExceeded(Exception):
+    def __init__(self, bucket: str, wait: float):
+        super().__init__(f"rate limit: '{bucket}' would wait {wait:.1f}s")
+        self.bucket = bucket
+        self.wait = wait
+
+def parse_limit(spec: Optional[str]) -> Optional[Tuple[float, float]]:
+    """'30/60:4' → (초당 0.5, 버스트 4). 'off'/'0'/빈 값 → None(제한 없음)"""
+    if not spec or spec.strip().lower() in ("off", "0", "none"):
+        return None
+    spec = spec.strip()
+    burst = None
+    if ":" in spec:
+        spec, b = spec.split(":", 1)
+        burst = float(b)
+    count, _, period = spec.partition("/")
+    rate = float(count) / float(period or 1)
+    return rate, burst if burst is not None else max(1.0, float(count) // 4)
+
+# -----------------------------
+# 토큰 상태 (프로세스 내 / SQLite 공유)
+# -----------------------------
+class _LocalState:
+    def __init__(self, burst: float):
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, rate: float, burst: float) -> None:
+        now = time.monotonic()
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def try_take(self, name: str, rate: float, burst: float) -> float:
+        """토큰을 가져가면 0, 아니면 다음 토큰까지 남은 초"""
+        self._refill(rate, burst)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+    def available(self, name: str, rate: float, burst: float) -> float:
+        self._refill(rate, burst)
+        return self.tokens
+
+class _SQLiteState:
+    """모든 워커가 같은 파일의 토큰 수를 읽고 쓴다 (BEGIN IMMEDIATE 로 원자적 갱신)"""
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = SQLiteConn(path, init=[
+            "CREATE TABLE IF NOT EXISTS rate_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        ])
+
+    def _load(self, conn, name: str, rate: float, burst: float) -> Tuple[float, float]:
+        now = time.time()
+        row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE name=?", (name,)).fetchone()
+        tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+        return tokens, now
+
+    def try_take(self, name: str, rate: float, burst: float) -> float:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, now = self._load(conn, name, rate, burst)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute("INSERT OR REPLACE INTO rate_buckets (name, tokens, updated) VALUES (?,?,?)", (name, tokens, now))
+            conn.execute("COMMIT")
+            return wait
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def available(self, name: str, rate: float, burst: float) -> float:
+        return self._load(self._conn(), name, rate, burst)[0]
+
+# -----------------------------
+# 버킷 + 우선순위 대기열
+# -----------------------------
+class TokenBucket:
+    def __init__(self, name: str, rate: float, burst: float, max_wait: Dict[int, float],
+                 shared: Optional[_SQLiteState] = None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self._state = shared or _LocalState(burst)
+        self._offload = shared is not None  # SQLite 상태는 비동기 경로에서 스레드로
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, int]] = []  # (우선순위, 도착 순번) 정렬 상태 유지
+        self._seq = itertools.count()
+        self._stats = {
+            p: {"acquired": 0, "rejected": 0, "wait_sum": 0.0, "wait_max": 0.0} for p in PRIORITY_NAMES
+        }
+
+    # 토큰 상태: 프로세스 내 상태는 대기열 잠금 안에서, SQLite 상태는 잠금 밖에서 (파일 트랜잭션이 원자적이고,
+    # 다른 워커가 파일을 잠근 동안 대기열 잠금을 쥐고 있으면 루프의 _enter/_leave 까지 멈춘다)
+    def _available(self) -> float:
+        if self._offload:
+            return self._state.available(self.name, self.rate, self.burst)
+        with self._lock:
+            return self._state.available(self.name, self.rate, self.burst)
+
+    def _take(self) -> float:
+        if self._offload:
+            return self._state.try_take(self.name, self.rate, self.burst)
+        with self._lock:
+            return self._state.try_take(self.name, self.rate, self.burst)
+
+    def _enter(self, prio: int, tokens: Optional[float] = None) -> Tuple[int, int]:
+        """대기열에 들어간다. tokens 는 미리 읽어 둔 남은 토큰 수 (대기 예상 계산용)"""
+        if tokens is None:
+            tokens = self._available()
+        with self._lock:
+            ticket = (prio, next(self._seq))
+            ahead = bisect.bisect_left(self._queue, ticket)
+            estimate = max(0.0, ahead + 1 - tokens) / self.rate
+            if estimate > self.max_wait.get(prio, 0.0):
+                self._stats[prio]["rejected"] += 1
+                raise RateLimitExceeded(self.name, estimate)
+            bisect.insort(self._queue, ticket)
+            return ticket
+
+    def _attempt(self, ticket: Tuple[int, int]) -> float:
+        """대기열 맨 앞이면 토큰 시도. 받으면 0, 아니면 다시 볼 때까지의 초"""
+        with self._lock:
+            # 맨 앞이 아님 (또는 취소된 aacquire 가 대기열에서 빠진 뒤 스레드에서 늦게 실행됨)
+            head = bool(self._queue) and self._queue[0] == ticket
+        if not head:
+            return max((1 - self._available()) / self.rate, 0.01)
+        wait = self._take()
+        if wait == 0.0:
+            self._leave(ticket)  # 그 사이 우선순위가 높은 번호표가 앞에 끼었을 수 있어 pop(0) 이 아니라 자기 것만
+        return wait
+
+    def _leave(self, ticket: Tuple[int, int]) -> None:
+        with self._lock:
+            i = bisect.bisect_left(self._queue, ticket)
+            if i < len(self._queue) and self._queue[i] == ticket:
+                self._queue.pop(i)
+
+    def _record(self, prio: int, waited: float) -> None:
+        with self._lock:
+            s = self._stats[prio]
+            s["acquired"] += 1
+            s["wait_sum"] += waited
+            s["wait_max"] = max(s["wait_max"], waited)
+
+    def _reject(self, prio: int, waited: float):
+        with self._lock:
+            self._stats[prio]["rejected"] += 1
+        return RateLimitExceeded(self.name, waited)
+
+    def acquire(self, prio: Optional[int] = None) -> float:
+        """토큰을 받을 때까지 블록 (스레드용). 기다린 초를 돌려준다"""
+        prio = current_priority() if prio is None else prio
+        ticket = self._enter(prio)
+        start = time.monotonic()
+        try:
+            while True:
+                delay = self._attempt(ticket)
+                waited = time.monotonic() - start
+                if delay == 0.0:
+                    self._record(prio, waited)
+                    return waited
+                if waited + delay > self.max_wait.get(prio, 0.0):
+                    raise self._reject(prio, waited + delay)
+                time.sleep(min(delay, 0.25))
+        finally:
+            self._leave(ticket)
+
+    async def _call(self, fn, *args):
+        if self._offload:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def aacquire(self, prio: Optional[int] = None) -> float:
+        prio = current_priority() if prio is None else prio
+        # 대기열 등록은 루프에서 (스레드에서 등록한 뒤 취소되면 번호표가 대기열에 남는다), 토큰 읽기·차감만 스레드로
+        ticket = self._enter(prio, await self._call(self._available))
+        start = time.monotonic()
+        try:
+            while True:
+                delay = await self._call(self._attempt, ticket)
+                waited = time.monotonic() - start
+                if delay == 0.0:
+                    self._record(prio, waited)
+                    return waited
+                if waited + delay > self.max_wait.get(prio, 0.0):
+                    raise self._reject(prio, waited + delay)
+                await asyncio.sleep(min(delay, 0.25))
+        finally:
+            self._leave(ticket)
+
+    def stats(self) -> Dict[str, object]:
+        tokens = self._available()
+        with self._lock:
+            by_priority = {}
+            for p, s in self._stats.items():
+                by_priority[PRIORITY_NAMES[p]] = dict(
+                    s, wait_avg=round(s["wait_sum"] / s["acquired"], 4) if s["acquired"] else None,
+                    wait_sum=round(s["wait_sum"], 3), wait_max=round(s["wait_max"], 3),
+                )
+            return {
+                "rate_per_sec": round(self.rate, 4),
+                "burst": self.burst,
+                "queued": len(self._queue),
+                "tokens": round(tokens, 2),
+                "by_priority": by_priority,
+            }
+
+class RateGovernor:
+    def __init__(self, limits: Dict[str, Optional[Tuple[float, float]]],
+                 max_wait: Optional[Dict[int, float]] = None, db_path: Optional[str] = None):
+        self.max_wait = {**DEFAULT_MAX_WAIT, **(max_wait or {})}
+        shared = _SQLiteState(db_path) if db_path else None
+        self.shared = shared is not None
+        self._buckets: Dict[str, TokenBucket] = {}
+        for name, limit in limits.items():
+            if limit is not None:
+                self._buckets[name] = TokenBucket(name, limit[0], limit[1], self.max_wait, shared)
+
+    @classmethod
+    def from_env(cls) -> "RateGovernor":
+        limits = {name: parse_limit(os.getenv(f"RATE_LIMIT_{name.upper()}", spec)) for name, spec in DEFAULT_LIMITS.items()}
+        max_wait = {
+            p: float(os.getenv(f"RATE_MAX_WAIT_{PRIORITY_NAMES[p].upper()}", DEFAULT_MAX_WAIT[p]))
+            for p in PRIORITY_NAMES
+        }
+        return cls(limits, max_wait, db_path("RATE_LIMIT_DB", "rate_limits.db"))
+
+    def acquire(self, bucket: str) -> float:
+        b = self._buckets.get(bucket)
+        return b.acquire() if b is not None else 0.0
+
+    async def aacquire(self, bucket: str) -> float:
+        b = self._buckets.get(bucket)
+        return await b.aacquire() if b is not None else 0.0
+
+    def rate(self, bucket: str) -> Optional[float]:
+        """버킷의 초당 토큰 수 (제한 없으면 None)"""
+        b = self._buckets.get(bucket)
+        return b.rate if b is not None else None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "shared": self.shared,
+            "max_wait": {PRIORITY_NAMES[p]: w for p, w in self.max_wait.items()},
+            "buckets": {name: b.stats() for name, b in self._buckets.items()},
+        }
+
+governor = RateGovernor.from_env()
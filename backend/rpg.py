@@ -0,0 +1,91 @@
+"""
+RPG 캐릭터 분류 (ROE / PER / PBR → 전사·마법사·도적 × 수호·모험).
+
+컬럼 단위(NumPy 배열 / DataFrame)로 한 번에 분류하고, 단일 종목용 classify_rpg 는 그 얇은 래퍼다.
+결측값(None/NaN)은 roe Low / per High / pbr High 로 취급한다.
+"""
+import os
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:  # pandas 는 DataFrame/Series 를 받을 때만 import (앱 기동 시간)
+    import pandas as pd
+
+class RPGThresholds(NamedTuple):
+    roe_min: float = 10.0   # ROE(%) 이상이면 High
+    per_max: float = 12.0   # PER(x) 이하이면 Low
+    pbr_max: float = 1.0    # PBR(x) 이하이면 Low
+
+DEFAULT_THRESHOLDS = RPGThresholds(
+    roe_min=float(os.getenv("RPG_ROE_MIN", "10")),
+    per_max=float(os.getenv("RPG_PER_MAX", "12")),
+    pbr_max=float(os.getenv("RPG_PBR_MAX", "1.0")),
+)
+
+JOBS = ("전사", "마법사", "도적")
+TEMPERS = ("수호", "모험")
+
+RPG_DESCRIPTIONS = {
+    "수호 전사": "안정적 수익성과 저평가 매력을 바탕으로 자산을 지키는 타입",
+    "모험 전사": "수익성을 무기로 새로운 기회를 추적하는 도전형",
+    "수호 마법사": "검증된 기반 위에 분석과 혁신을 결합한 전략가",
+    "모험 마법사": "성장성과 기술 혁신을 앞세우는 개척자",
+    "수호 도적": "저평가 구간에서 반등을 노리는 잠행형",
+    "모험 도적": "높은 변동성을 기회로 삼는 추격형"
+}
+
+# (job 코드 * 2 + temper 코드) → 결과 테이블
+_TITLE_TABLE = np.array([f"{t} {j}" for j in JOBS for t in TEMPERS], dtype=object)
+_JOB_TABLE = np.array([j for j in JOBS for _ in TEMPERS], dtype=object)
+_TEMPER_TABLE = np.array([t for _ in JOBS for t in TEMPERS], dtype=object)
+_DESC_TABLE = np.array([RPG_DESCRIPTIONS.get(t, "") for t in _TITLE_TABLE], dtype=object)
+
+def _as_float_array(values) -> np.ndarray:
+    """None 이 섞인 시퀀스/Series → float64 배열 (None → NaN)"""
+    if isinstance(values, np.ndarray) and values.dtype.kind in "fiu":
+        return values.astype(np.float64, copy=False)
+    if isinstance(values, np.ndarray) or hasattr(values, "to_numpy"):
+        # object 배열 / pandas Series - 숫자가 아닌 값은 NaN
+        import pandas as pd
+        return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+def classify_codes(roe, per, pbr, thresholds: Optional[RPGThresholds] = None) -> np.ndarray:
+    """분류 결과를 0~5 정수 코드로 (job*2 + temper)"""
+    th = thresholds or DEFAULT_THRESHOLDS
+    roe, per, pbr = _as_float_array(roe), _as_float_array(per), _as_float_array(pbr)
+
+    # NaN 비교는 항상 False
+    roe_high = roe >= th.roe_min
+    per_high = ~(per <= th.per_max)
+    pbr_low = pbr <= th.pbr_max
+
+    job = np.select([roe_high & pbr_low, roe_high & per_high], [0, 1], default=2)
+    temper = np.where(per_high & roe_high, 1, 0)
+    return job * 2 + temper
+
+def classify_arrays(roe, per, pbr, thresholds: Optional[RPGThresholds] = None) -> Dict[str, np.ndarray]:
+    """roe/per/pbr 배열 → title/job/temper/description 배열"""
+    codes = classify_codes(roe, per, pbr, thresholds)
+    return {
+        "title": _TITLE_TABLE[codes],
+        "job": _JOB_TABLE[codes],
+        "temper": _TEMPER_TABLE[codes],
+        "description": _DESC_TABLE[codes],
+    }
+
+def classify_frame(df: "pd.DataFrame", thresholds: Optional[RPGThresholds] = None,
+                   roe_col: str = "roe", per_col: str = "per", pbr_col: str = "pbr") -> "pd.DataFrame":
+    """스크리너용: roe/per/pbr 컬럼을 가진 DataFrame → 같은 인덱스의 title/job/temper/description DataFrame"""
+    import pandas as pd
+    cols = classify_arrays(df[roe_col], df[per_col], df[pbr_col], thresholds)
+    return pd.DataFrame(cols, index=df.index)
+
+def classify_rpg_many(roes, pers, pbrs, thresholds: Optional[RPGThresholds] = None) -> List[tuple]:
+    """여러 종목 분류 결과를 classify_rpg 와 같은 (title, job, temper, desc) 튜플 목록으로"""
+    cols = classify_arrays(roes, pers, pbrs, thresholds)
+    return list(zip(cols["title"].tolist(), cols["job"].tolist(), cols["temper"].tolist(), cols["description"].tolist()))
+
+def classify_rpg(roe, per, pbr, thresholds: Optional[RPGThresholds] = None):
+    return classify_rpg_many([roe], [per], [pbr], thresholds)[0]
@@ -0,0 +1,254 @@
+"""
+종목 스크리너 (KRX 전체 PER/PBR/ROE + RPG 분류 스냅샷).
+
+주기적으로 전 종목 지표를 모아 컬럼 배열 스냅샷을 만들고, 질의는 업스트림 호출 없이 스냅샷에서만 답한다.
+- bulk 가 있으면 먼저 전 종목 행(종목 정보 + 지표)을 한 번에 받아 스냅샷의 기본 종목 집합으로 쓰고(네이버 시가총액 목록 등),
+  universe 중 거기 없는 종목만 종목별로 조회해 뒤에 붙인다
+- 숫자 컬럼마다 정렬 인덱스(오름/내림차순, NaN 은 항상 뒤)를 미리 만들어 둔다
+- 범위 필터는 정렬된 값에 searchsorted, 정렬은 미리 만든 순서에 마스크만 적용
+- 새 스냅샷은 다 만든 뒤 참조만 교체 (질의 중인 요청은 이전 스냅샷을 그대로 사용)
+- on_snapshot(fn) 으로 새 스냅샷을 받아 파생 인덱스(업종 백분위 등)를 다시 만든다
+"""
+import asyncio, datetime, math, os, time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rpg import classify_arrays
+from telemetry import get_logger
+
+log = get_logger("screener")
+
+NUMERIC_COLUMNS = ("per", "pbr", "roe")
+SORT_KEYS = ("rank", "name") + NUMERIC_COLUMNS
+
+Metrics = Tuple[Optional[float], Optional[float], Optional[float]]
+Fetcher = Callable[[str], Awaitable[Metrics]]
+BulkFetcher = Callable[[], Awaitable[List[Dict[str, Any]]]]  # 종목 행 (symbol, code, name, market, sector, per, pbr, roe)
+
+def _nan_to_none(v: float) -> Optional[float]:
+    return None if math.isnan(v) else float(v)
+
+class ScreenerSnapshot:
+    def __init__(self, rows: List[Dict[str, Any]], built_at: Optional[float] = None, elapsed: float = 0.0):
+        n = len(rows)
+        self.built_at = built_at or time.time()
+        self.elapsed = elapsed
+        self.size = n
+
+        self.symbol = np.array([r["symbol"] for r in rows], dtype=np.str_)
+        self.code = np.array([r.get("code", "") for r in rows], dtype=np.str_)
+        self.name = np.array([r.get("name", "") for r in rows], dtype=np.str_)
+        self.market = np.array([r.get("market", "") for r in rows], dtype=np.str_)
+        self.sector = np.array([r.get("sector", "") for r in rows], dtype=np.str_)
+        self.values = {
+            c: np.array([np.nan if r.get(c) is None else r[c] for r in rows], dtype=np.float64)
+            for c in NUMERIC_COLUMNS
+        }
+        self._search_text = np.array([f"{r.get('name', '')} {r['symbol']}".lower() for r in rows], dtype=np.str_)
+        self.missing = int(np.sum(np.isnan(self.values["per"]) & np.isnan(self.values["pbr"]) & np.isnan(self.values["roe"])))
+
+        rpg = classify_arrays(self.values["roe"], self.values["per"], self.values["pbr"])
+        self.title = rpg["title"].astype(np.str_) if n else np.array([], dtype=np.str_)
+        self.job = rpg["job"].astype(np.str_) if n else np.array([], dtype=np.str_)
+        self.temper = rpg["temper"].astype(np.str_) if n else np.array([], dtype=np.str_)
+
+        # 정렬 인덱스: (오름차순, 내림차순). stable 정렬이라 동점은 목록(시가총액) 순서
+        rank = np.arange(n)
+        name_order = np.argsort(self.name, kind="stable")
+        self.orders = {"rank": (rank, rank[::-1].copy()), "name": (name_order, name_order[::-1].copy())}
+        self.sorted_values = {}
+        for c in NUMERIC_COLUMNS:
+            v = self.values[c]
+            asc = np.argsort(v, kind="stable")      # NaN 은 맨 뒤
+            desc = np.argsort(-v, kind="stable")    # -NaN 도 NaN → 맨 뒤
+            self.orders[c] = (asc, desc)
+            self.sorted_values[c] = v[asc]
+
+    def range_mask(self, column: str, lo: Optional[float], hi: Optional[float]) -> np.ndarray:
+        """lo <= column <= hi 인 행 마스크 (NaN 제외)"""
+        sv = self.sorted_values[column]
+        asc = self.orders[column][0]
+        valid = int(np.count_nonzero(~np.isnan(sv)))
+        start = 0 if lo is None else int(np.searchsorted(sv[:valid], lo, side="left"))
+        end = valid if hi is None else int(np.searchsorted(sv[:valid], hi, side="right"))
+        mask = np.zeros(self.size, dtype=bool)
+        mask[asc[start:end]] = True
+        return mask
+
+    def query(self, filters: Dict[str, Any], sort: str = "rank", descending: bool = False,
+              offset: int = 0, limit: int = 50) -> Tuple[int, List[Dict[str, Any]]]:
+        mask = np.ones(self.size, dtype=bool)
+        for col in ("market", "sector", "title", "job", "temper"):
+            want = filters.get(col)
+            if want:
+                mask &= getattr(self, col) == want
+        for c in NUMERIC_COLUMNS:
+            lo, hi = filters.get(f"{c}_min"), filters.get(f"{c}_max")
+            if lo is not None or hi is not None:
+                mask &= self.range_mask(c, lo, hi)
+        q = (filters.get("q") or "").strip().lower()
+        if q:
+            mask &= (np.strings.find(self._search_text, q) >= 0)
+
+        order = self.orders[sort][1 if descending else 0]
+        hits = order[mask[order]]
+        return int(hits.size), [self.row(i) for i in hits[offset:offset + limit]]
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """내보내기용 컬럼 배열 (복사 없이 스냅샷 배열 그대로)"""
+        return {
+            "symbol": self.symbol, "code": self.code, "name": self.name, "market": self.market, "sector": self.sector,
+            **self.values, "title": self.title, "job": self.job, "temper": self.temper,
+        }
+
+    def select(self, symbols: Optional[Sequence[str]] = None, sectors: Optional[Sequence[str]] = None,
+               markets: Optional[Sequence[str]] = None) -> np.ndarray:
+        """심볼(또는 6자리 코드)·섹터·시장 목록으로 고른 행 번호 (None 이면 그 조건 없음)"""
+        mask = np.ones(self.size, dtype=bool)
+        if symbols is not None:
+            mask &= np.isin(self.symbol, symbols) | np.isin(self.code, symbols)
+        if sectors is not None:
+            mask &= np.isin(self.sector, sectors)
+        if markets is not None:
+            mask &= np.isin(self.market, markets)
+        return np.flatnonzero(mask)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {
+            "symbol": str(self.symbol[i]),
+            "code": str(self.code[i]),
+            "name": str(self.name[i]),
+            "market": str(self.market[i]),
+            "sector": str(self.sector[i]),
+            "per": _nan_to_none(self.values["per"][i]),
+            "pbr": _nan_to_none(self.values["pbr"][i]),
+            "roe": _nan_to_none(self.values["roe"][i]),
+            "rpg": {"title": str(self.title[i]), "job": str(self.job[i]), "temper": str(self.temper[i])},
+        }
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "missing": self.missing,
+            "built_at": datetime.datetime.fromtimestamp(self.built_at).astimezone().isoformat(timespec="seconds"),
+            "build_sec": round(self.elapsed, 2),
+        }
+
+class _RateLimiter:
+    """초당 rate 회 이하로 호출 간격을 벌린다 (rate <= 0 이면 제한 없음)"""
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+                now = time.monotonic()
+            self._next = max(now, self._next) + self.interval
+
+class Screener:
+    def __init__(self, rate: float = 5.0, concurrency: int = 4):
+        self.rate = rate
+        self.concurrency = concurrency
+        self.snapshot: Optional[ScreenerSnapshot] = None
+        self.refreshing = False
+        self.last_error: Optional[str] = None
+        self.last_bulk: Optional[Dict[str, int]] = None
+        self._listeners: List[Callable[[ScreenerSnapshot], None]] = []
+
+    def on_snapshot(self, fn: Callable[[ScreenerSnapshot], None]) -> None:
+        """새 스냅샷으로 교체될 때마다 fn(snapshot) 호출"""
+        self._listeners.append(fn)
+
+    async def _bulk(self, bulk: Optional[BulkFetcher]) -> List[Dict[str, Any]]:
+        if bulk is None:
+            return []
+        try:
+            return await bulk()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("screener.bulk_error", error=str(e))
+            return []
+
+    async def refresh(self, universe: Sequence[Dict[str, Any]], fetch: Fetcher,
+                      bulk: Optional[BulkFetcher] = None) -> Optional[ScreenerSnapshot]:
+        """bulk 행 + bulk 에 없는 universe 종목(rate 제한 아래 개별 조회)으로 새 스냅샷을 만들어 교체"""
+        if self.refreshing:
+            return self.snapshot
+        self.refreshing = True
+        started = time.perf_counter()
+        limiter = _RateLimiter(self.rate)
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def one(item: Dict[str, Any]) -> Dict[str, Any]:
+            async with sem:
+                await limiter.wait()
+                try:
+                    per, pbr, roe = await fetch(item["symbol"])
+                except Exception as e:
+                    log.warning("screener.fetch_error", symbol=item["symbol"], error=str(e))
+                    per = pbr = roe = None
+            return dict(item, per=per, pbr=pbr, roe=roe)
+
+        try:
+            listed = await self._bulk(bulk)
+            if bulk is not None and not listed and self.snapshot is not None:
+                # 일괄 수집 실패 - universe 만으로 줄어든 스냅샷을 만들지 않고 기존 스냅샷 유지 (다음 주기에 다시)
+                self.last_error = "bulk fetch failed"
+                log.warning("screener.bulk_empty", kept=self.snapshot.size)
+                return self.snapshot
+            seen = {r["symbol"] for r in listed}
+            rest = [x for x in universe if x["symbol"] not in seen]
+            self.last_bulk = {"rows": len(listed), "universe_hit": len(universe) - len(rest),
+                              "per_item": len(rest)} if bulk else None
+            rows = listed + list(await asyncio.gather(*[one(x) for x in rest]))
+            snap = ScreenerSnapshot(rows, elapsed=time.perf_counter() - started)
+            if snap.size and snap.missing == snap.size and self.snapshot is not None:
+                # 업스트림 전면 장애 - 빈 지표로 기존 스냅샷을 덮지 않는다
+                self.last_error = "all fetches failed"
+                log.warning("screener.empty_refresh")
+                return self.snapshot
+            self.snapshot = snap
+            self.last_error = None
+            log.info("screener.snapshot", size=snap.size, missing=snap.missing, elapsed=round(snap.elapsed, 2))
+            for fn in self._listeners:
+                try:
+                    fn(snap)
+                except Exception as e:
+                    log.warning("screener.listener_error", error=str(e))
+            return snap
+        finally:
+            self.refreshing = False
+
+    async def run_periodic(self, universe_fn: Callable[[], Sequence[Dict[str, Any]]], fetch: Fetcher,
+                           interval: float, bulk: Optional[BulkFetcher] = None) -> None:
+        """interval 초마다 스냅샷 갱신 (앱 수명 주기 동안 백그라운드 태스크로 실행)"""
+        while True:
+            try:
+                await self.refresh(universe_fn(), fetch, bulk)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                log.error("screener.refresh_error", error=str(e))
+            await asyncio.sleep(interval)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "snapshot": self.snapshot.info() if self.snapshot else None,
+            "refreshing": self.refreshing,
+            "last_error": self.last_error,
+            "last_bulk": self.last_bulk,
+        }
+
+screener = Screener(
+    rate=float(os.getenv("SCREENER_RATE", "5")),
+    concurrency=int(os.getenv("SCREENER_CONCURRENCY", "4")),
+)
@@ -0,0 +1,229 @@
+"""
+워커 간 공유 상태 (uvicorn --workers N / gunicorn 프리포크).
+
+- SHARED_STATE_DIR 를 지정하면 지표 캐시·요약 캐시·토큰 버킷·single-flight 임대를 그 디렉터리의 SQLite(WAL) 파일로 공유
+  (모듈별 경로 환경변수 METRIC_CACHE_DB / SUMMARY_CACHE_DB / RATE_LIMIT_DB 가 있으면 그쪽이 우선)
+- SQLiteConn: 스레드·프로세스별 연결. import 시점에는 연결을 열지 않고, fork 전에 열린 연결은 자식에서 새로 연다
+- SharedFlight: 같은 키의 업스트림 호출을 워커 전체에서 한 번만 - 임대 행을 잡은 워커가 호출·저장하고,
+  나머지는 공유 캐시에 결과가 생기거나 임대가 끝날 때까지 기다린다
+- run_as_leader: 캐시 워밍·이력 봉인 같은 백그라운드 작업을 워커 하나에서만 실행 (임대를 주기적으로 갱신)
+- 비동기 진입점(atry_acquire / arelease / await_result / acoordinate)은 SQLite 호출을 asyncio.to_thread 로 돌린다
+  (busy timeout 5초 동안 이벤트 루프가 멈추지 않도록)
+"""
+import asyncio, os, sqlite3, threading, time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from telemetry import get_logger
+
+log = get_logger("shared_state")
+
+SHARED_DIR = os.getenv("SHARED_STATE_DIR") or None
+
+def db_path(env_name: str, filename: str) -> Optional[str]:
+    """모듈별 환경변수 → SHARED_STATE_DIR/filename → None(프로세스 내 상태만)"""
+    path = os.getenv(env_name)
+    if path:
+        return path
+    if SHARED_DIR:
+        os.makedirs(SHARED_DIR, exist_ok=True)
+        return os.path.join(SHARED_DIR, filename)
+    return None
+
+class SQLiteConn:
+    """conn = SQLiteConn(path, init=[...])() - 새 연결마다 init SQL(CREATE TABLE IF NOT EXISTS 등) 실행"""
+    def __init__(self, path: str, init: Sequence[str] = ()):
+        self.path = path
+        self.init = tuple(init)
+        self._local = threading.local()
+
+    def __call__(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            # fork 로 물려받은 연결은 닫지 않고 버린다 (부모의 잠금 상태를 건드리지 않도록)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for sql in self.init:
+                conn.execute(sql)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+# -----------------------------
+# 워커 간 single-flight
+# -----------------------------
+class SharedFlight:
+    def __init__(self, path: str, lease: float = 30.0, poll: float = 0.05):
+        self.lease = lease
+        self.poll = poll
+        self._conn = SQLiteConn(path, init=[
+            "CREATE TABLE IF NOT EXISTS flights (key TEXT PRIMARY KEY, owner INTEGER NOT NULL, expires REAL NOT NULL)"
+        ])
+        self._lock = threading.Lock()
+        self._counters = {"acquired": 0, "waited": 0, "shared_hits": 0, "wait_misses": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def try_acquire(self, key: str, lease: Optional[float] = None) -> bool:
+        """임대가 없거나 만료됐거나 이미 이 프로세스 것이면 잡는다(갱신)"""
+        conn = self._conn()
+        now = time.time()
+        owner = os.getpid()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT owner, expires FROM flights WHERE key=?", (key,)).fetchone()
+            ok = row is None or row[1] < now or row[0] == owner
+            if ok:
+                conn.execute("INSERT OR REPLACE INTO flights (key, owner, expires) VALUES (?,?,?)",
+                             (key, owner, now + (lease or self.lease)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if ok:
+            self._count("acquired")
+        return ok
+
+    def release(self, key: str) -> None:
+        self._conn().execute("DELETE FROM flights WHERE key=? AND owner=?", (key, os.getpid()))
+
+    def held(self, key: str) -> bool:
+        row = self._conn().execute("SELECT expires FROM flights WHERE key=?", (key,)).fetchone()
+        return row is not None and row[0] >= time.time()
+
+    async def atry_acquire(self, key: str, lease: Optional[float] = None) -> bool:
+        """try_acquire 를 스레드에서. 기다리던 쪽이 취소돼도 스레드가 잡은 임대는 놓는다"""
+        fut = asyncio.ensure_future(asyncio.to_thread(self.try_acquire, key, lease))
+        try:
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            loop = asyncio.get_running_loop()
+
+            def undo(f: "asyncio.Future[bool]") -> None:
+                if not f.cancelled() and f.exception() is None and f.result():
+                    loop.run_in_executor(None, self.release, key)
+            fut.add_done_callback(undo)
+            raise
+
+    async def arelease(self, key: str) -> None:
+        # 취소돼도 삭제는 끝까지 (임대가 만료까지 남지 않도록)
+        await asyncio.shield(asyncio.to_thread(self.release, key))
+
+    def _poll(self, key: str, read: Callable[[], Any]) -> Tuple[Any, bool]:
+        """(결과, 기다림이 끝났는지) - 결과가 생겼거나 임대가 끝났으면 끝"""
+        value = read()
+        if value is not None:
+            return value, True
+        if not self.held(key):
+            return read(), True
+        return None, False
+
+    def _settle(self, value: Any) -> Any:
+        self._count("shared_hits" if value is not None else "wait_misses")
+        return value
+
+    async def await_result(self, key: str, read: Callable[[], Any]) -> Any:
+        """다른 워커가 만든 결과(read() 가 None 이 아닌 값)를 기다린다. 임대가 끝났는데 결과가 없으면 None.
+        read 와 임대 확인은 스레드에서 부른다"""
+        self._count("waited")
+        while True:
+            value, done = await asyncio.to_thread(self._poll, key, read)
+            if done:
+                return self._settle(value)
+            await asyncio.sleep(self.poll)
+
+    def wait_result(self, key: str, read: Callable[[], Any]) -> Any:
+        """await_result 의 동기(스레드) 버전"""
+        self._count("waited")
+        while True:
+            value, done = self._poll(key, read)
+            if done:
+                return self._settle(value)
+            time.sleep(self.poll)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+_flight_db = db_path("SHARED_FLIGHT_DB", "flights.db")
+flight: Optional[SharedFlight] = SharedFlight(
+    _flight_db, lease=float(os.getenv("SHARED_FLIGHT_LEASE_SEC", "30"))
+) if _flight_db else None
+
+@asynccontextmanager
+async def acoordinate(flight: Optional[SharedFlight], key: str, read: Callable[[], Any]):
+    """
+    async with acoordinate(flight, key, read) as shared:
+        shared 가 None 이 아니면 다른 워커가 만든 결과, None 이면 블록 안에서 직접 만들어 공유 캐시에 저장
+    """
+    if flight is None:
+        yield None
+        return
+    if not await flight.atry_acquire(key):
+        shared = await flight.await_result(key, read)
+        if shared is not None:
+            yield shared
+            return
+    try:
+        yield None
+    finally:
+        await flight.arelease(key)
+
+@contextmanager
+def coordinate(flight: Optional[SharedFlight], key: str, read: Callable[[], Any]):
+    """acoordinate 의 동기 버전"""
+    if flight is None:
+        yield None
+        return
+    if not flight.try_acquire(key):
+        shared = flight.wait_result(key, read)
+        if shared is not None:
+            yield shared
+            return
+    try:
+        yield None
+    finally:
+        flight.release(key)
+
+# -----------------------------
+# 백그라운드 작업 리더
+# -----------------------------
+_leading: Dict[str, bool] = {}
+
+async def run_as_leader(name: str, job: Callable[[], Awaitable[Any]], lease: float = 60.0) -> None:
+    """공유 상태가 없으면 바로 job 실행. 있으면 임대를 잡은 워커만 실행하고, 임대를 잃으면 job 을 취소하고 다시 대기"""
+    if flight is None:
+        _leading[name] = True
+        await job()
+        return
+    key = f"leader:{name}"
+    while True:
+        if await flight.atry_acquire(key, lease):
+            _leading[name] = True
+            log.info("shared_state.leader", job=name, pid=os.getpid())
+            task = asyncio.ensure_future(job())
+            try:
+                while not task.done():
+                    await asyncio.wait({task}, timeout=lease / 3)
+                    if not task.done() and not await flight.atry_acquire(key, lease):
+                        log.warning("shared_state.leader_lost", job=name, pid=os.getpid())
+                        break
+                if task.done():
+                    return task.result()
+            finally:
+                _leading[name] = False
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await flight.arelease(key)
+        await asyncio.sleep(lease / 3)
+
+def stats() -> Dict[str, Any]:
+    return {
+        "dir": SHARED_DIR,
+        "pid": os.getpid(),
+        "flight": flight.stats() if flight is not None else None,
+        "leading": dict(_leading),
+    }
@@ -0,0 +1,101 @@
+"""
+동일 작업 합치기 (single-flight).
+
+같은 키로 동시에 들어온 호출은 한 번만 실행하고, 기다리던 모든 호출자가 같은 결과(또는 같은 예외)를 받는다.
+- SingleFlight: 동기 경로 (스레드)
+- AsyncSingleFlight: 비동기 경로 (asyncio) - 대기자가 취소되어도 공유 작업은 계속 진행
+- coalesce(key_fn): 동기/비동기 함수 모두에 쓸 수 있는 데코레이터
+"""
+import asyncio, functools, inspect, threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+class AsyncSingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda t, key=key: self._calls.pop(key, None) if self._calls.get(key) is t else None)
+        else:
+            self.shared += 1
+        # shield: 대기자 하나가 타임아웃/연결 종료로 취소되어도 다른 대기자의 작업은 유지
+        return await asyncio.shield(task)
+
+# 프로세스 공용 그룹
+sync_flight = SingleFlight()
+async_flight = AsyncSingleFlight()
+
+def coalesce(key_fn: Callable[..., Hashable]):
+    """함수 인자로 key_fn(*args, **kwargs) 키를 만들어 동시 중복 호출을 합친다"""
+    def decorator(fn):
+        name = fn.__name__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                key = (name, key_fn(*args, **kwargs))
+                return await async_flight.do(key, lambda: fn(*args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (name, key_fn(*args, **kwargs))
+            return sync_flight.do(key, lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorator
+
+def stats() -> Dict[str, int]:
+    return {
+        "sync_executed": sync_flight.executed,
+        "sync_shared": sync_flight.shared,
+        "async_executed": async_flight.executed,
+        "async_shared": async_flight.shared,
+    }
@@ -0,0 +1,95 @@
+"""
+SSE(Server-Sent Events) 응답 유틸.
+
+- sse_event: 이벤트 한 건을 text/event-stream 형식 문자열로
+- JSONFieldStream: GPT 가 토큰 단위로 내보내는 JSON 을 받아, 문자열 필드 값을 완성 전부터 조금씩 꺼낸다
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # 프록시(nginx 등) 버퍼링 끄기
+}
+
+def sse_event(event: str, data: Any) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+def _decode_partial(raw: str) -> str:
+    """끝이 잘린 JSON 문자열 본문 디코드 (미완성 이스케이프는 버림)"""
+    for cut in range(0, 7):
+        try:
+            text = json.loads('"' + raw[:len(raw) - cut] + '"')
+        except ValueError:
+            continue
+        # \ud83d 처럼 서로게이트 쌍의 앞쪽만 온 경우 다음 조각까지 보류
+        if text and "\ud800" <= text[-1] <= "\udbff":
+            text = text[:-1]
+        return text
+    return ""
+
+class JSONFieldStream:
+    """
+    {"key": "value", ...} 형태의 JSON 을 조각으로 받아 (키, 지금까지의 값, 완료 여부) 를 돌려준다.
+    첫 '{' 앞의 텍스트(```json 등)는 무시하고, 객체 바로 아래의 문자열 값만 내보낸다.
+    """
+    def __init__(self):
+        self._stack: List[str] = []
+        self._expect_key = False
+        self._in_string = False
+        self._escape = False
+        self._role: Optional[str] = None  # key / value / None(배열 원소 등)
+        self._raw: List[str] = []
+        self._key: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, bool]]:
+        out: List[Tuple[str, str, bool]] = []
+        grew = False
+        for ch in chunk:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._raw.append(ch)
+                elif ch == "\\":
+                    self._escape = True
+                    self._raw.append(ch)
+                elif ch == '"':
+                    self._in_string = False
+                    text = _decode_partial("".join(self._raw))
+                    if self._role == "key":
+                        self._key = text
+                    elif self._role == "value" and self._key is not None:
+                        out.append((self._key, text, True))
+                    grew = False
+                else:
+                    self._raw.append(ch)
+                    grew = grew or self._role == "value"
+                continue
+
+            if not self._stack:
+                if ch == "{":
+                    self._stack.append("obj")
+                    self._expect_key = True
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._raw = []
+                top = self._stack[-1]
+                self._role = ("key" if self._expect_key else "value") if top == "obj" and len(self._stack) == 1 else None
+            elif ch == "{":
+                self._stack.append("obj")
+                self._expect_key = True
+            elif ch == "[":
+                self._stack.append("arr")
+            elif ch in "}]":
+                self._stack.pop()
+                self._expect_key = False
+            elif ch == ":":
+                self._expect_key = False
+            elif ch == ",":
+                self._expect_key = self._stack[-1] == "obj"
+
+        if grew and self._in_string and self._role == "value" and self._key is not None:
+            out.append((self._key, _decode_partial("".join(self._raw)), False))
+        return out
@@ -0,0 +1,188 @@
+"""
+GPT 요약 응답 캐시 (내용 주소 방식).
+
+- 키: 렌더링된 프롬프트 + 모델 설정의 SHA-256 해시
+- 지표는 SUMMARY_CACHE_PRECISION 자리로 반올림한 뒤 프롬프트에 넣어, 소수점 끝자리만 다른 요청이 같은 키를 쓴다
+- L1: 프로세스 내 LRU + TTL, L2: 선택적 SQLite 파일 (SUMMARY_CACHE_DB) - 재시작 후에도 유지
+- 실패/오프라인 응답은 저장하지 않는다
+- 비동기 경로(aget / apeek / aput)는 L2(SQLite) 읽기·쓰기를 asyncio.to_thread 로 (이벤트 루프를 막지 않음)
+"""
+import os, json, time, hashlib, sqlite3, threading, asyncio
+from typing import Any, Dict, Optional, Tuple
+
+from lru import CountingLRU
+import shared_state
+from shared_state import SQLiteConn, db_path
+from telemetry import get_logger
+
+log = get_logger("summary_cache")
+
+PRUNE_EVERY = 200  # L2 정리(만료/용량 초과 삭제) 주기 - put 횟수 기준
+
+def _round(v, precision: int):
+    if v is None:
+        return None
+    try:
+        return round(float(v), precision)
+    except (TypeError, ValueError):
+        return v
+
+class _SQLiteStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = SQLiteConn(path, init=[
+            "CREATE TABLE IF NOT EXISTS summary_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        ])
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        row = self._conn().execute("SELECT value, created_at FROM summary_cache WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put(self, key: str, value: Dict[str, Any], created_at: float) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO summary_cache (key, value, created_at) VALUES (?,?,?)",
+            (key, json.dumps(value, ensure_ascii=False), created_at),
+        )
+
+    def prune(self, min_created_at: float, max_rows: int) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM summary_cache WHERE created_at < ?", (min_created_at,))
+        conn.execute(
+            "DELETE FROM summary_cache WHERE key NOT IN"
+            " (SELECT key FROM summary_cache ORDER BY created_at DESC LIMIT ?)",
+            (max_rows,),
+        )
+
+class SummaryCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 86400.0, precision: int = 1,
+                 db_path: Optional[str] = None, db_max_rows: int = 20000):
+        self.ttl = ttl
+        self.precision = precision
+        self.db_max_rows = db_max_rows
+        self._l1 = CountingLRU(maxsize)
+        self._l2 = _SQLiteStore(db_path) if db_path else None
+        self.flight = shared_state.flight if self._l2 is not None else None  # 워커 간 같은 요약 생성 1회
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._counters = {"hits_l1": 0, "hits_l2": 0, "misses": 0, "stores": 0}
+
+    def bucket(self, roe, per, pbr):
+        """프롬프트에 넣기 전 지표 반올림 (근접 중복 요청을 같은 키로)"""
+        p = self.precision
+        return _round(roe, p), _round(per, p), _round(pbr, p)
+
+    @staticmethod
+    def key(prompt: str, model: str, temperature: float) -> str:
+        payload = json.dumps({"prompt": prompt, "model": model, "temperature": temperature},
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _lookup(self, key: str, l2: bool = True) -> Tuple[Optional[Tuple[Dict[str, Any], float]], str]:
+        """(유효한 (요약, 생성 시각) 또는 None, 계층). l2=False 면 L1 만"""
+        with self._lock:
+            entry = self._l1.get(key)
+        tier = "hits_l1"
+        if entry is None and l2 and self._l2 is not None:
+            try:
+                entry = self._l2.get(key)
+            except (sqlite3.Error, ValueError) as e:
+                log.warning("summary_cache.l2_read_error", error=str(e))
+                entry = None
+            if entry is not None:
+                tier = "hits_l2"
+                with self._lock:
+                    self._l1[key] = entry
+        if entry is not None and time.time() - entry[1] > self.ttl:
+            with self._lock:
+                self._l1.pop(key, None)
+            entry = None
+        return entry, tier
+
+    async def _alookup(self, key: str) -> Tuple[Optional[Tuple[Dict[str, Any], float]], str]:
+        """_lookup 의 비동기 버전 - L1 미스일 때만 스레드에서 L2 조회"""
+        found = self._lookup(key, l2=False)
+        if found[0] is None and self._l2 is not None:
+            found = await asyncio.to_thread(self._lookup, key)
+        return found
+
+    def _tally(self, entry: Optional[Tuple[Dict[str, Any], float]], tier: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        if entry is None:
+            self._count("misses")
+            return None
+        self._count(tier)
+        value, created_at = entry
+        return value, time.time() - created_at
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """(요약, 경과초) 또는 None"""
+        return self._tally(*self._lookup(key))
+
+    async def aget(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        return self._tally(*await self._alookup(key))
+
+    def peek(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """get 과 같지만 적중/미스 카운터를 건드리지 않는다 (prefetch 판단용)"""
+        entry, _ = self._lookup(key)
+        return None if entry is None else (entry[0], time.time() - entry[1])
+
+    async def apeek(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        entry, _ = await self._alookup(key)
+        return None if entry is None else (entry[0], time.time() - entry[1])
+
+    def _store(self, key: str, value: Dict[str, Any]) -> Tuple[float, bool]:
+        """L1 저장 → (생성 시각, 이번에 L2 정리할지)"""
+        created_at = time.time()
+        with self._lock:
+            self._l1[key] = (value, created_at)
+            self._counters["stores"] += 1
+            self._puts += 1
+            return created_at, self._puts % PRUNE_EVERY == 0
+
+    def _l2_put(self, key: str, value: Dict[str, Any], created_at: float, prune: bool) -> None:
+        try:
+            self._l2.put(key, value, created_at)
+            if prune:
+                self._l2.prune(created_at - self.ttl, self.db_max_rows)
+        except sqlite3.Error as e:
+            log.warning("summary_cache.l2_write_error", error=str(e))
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        created_at, prune = self._store(key, value)
+        if self._l2 is not None:
+            self._l2_put(key, value, created_at, prune)
+
+    async def aput(self, key: str, value: Dict[str, Any]) -> None:
+        """put 의 비동기 버전 (L2 쓰기·정리는 스레드에서)"""
+        created_at, prune = self._store(key, value)
+        if self._l2 is not None:
+            await asyncio.to_thread(self._l2_put, key, value, created_at, prune)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            c = dict(self._counters)
+            size, maxsize, evictions = len(self._l1), self._l1.maxsize, self._l1.evictions
+        lookups = c["hits_l1"] + c["hits_l2"] + c["misses"]
+        c.update({
+            "l1_size": size,
+            "l1_maxsize": maxsize,
+            "l1_evictions": evictions,
+            "l2_enabled": self._l2 is not None,
+            "hit_rate": round((lookups - c["misses"]) / lookups, 4) if lookups else None,
+            "ttl": self.ttl,
+            "precision": self.precision,
+        })
+        return c
+
+summary_cache = SummaryCache(
+    maxsize=int(os.getenv("SUMMARY_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("SUMMARY_CACHE_TTL", "86400")),
+    precision=int(os.getenv("SUMMARY_CACHE_PRECISION", "1")),
+    db_path=db_path("SUMMARY_CACHE_DB", "summary_cache.db"),
+)
@@ -0,0 +1,232 @@
+"""
+로컬 종목 인덱스 (한글명/영문명/별칭/6자리 코드 → .KS/.KQ/미국 심볼).
+
+GPT 번역 + Finnhub 검색 없이 대부분의 질의를 메모리에서 바로 해석한다.
+- 정확 일치 → 접두 일치(bisect) → 퍼지 일치(문자 bigram 후보 + 편집거리) 순으로 점수화
+- 목록 파일(data/symbols.csv, SYMBOL_INDEX_PATH 로 교체 가능)이 바뀌면 새 인덱스를 만든 뒤 참조만 교체(원자적 스왑)
+"""
+import os, re, csv, time, bisect, threading
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional
+
+from telemetry import get_logger
+
+log = get_logger("symbol_index")
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "symbols.csv")
+
+PREFIX_MIN_LEN = 2      # 이보다 짧은 질의는 접두 일치 생략
+FUZZY_MIN_SCORE = 0.6   # 퍼지 일치 채택 하한 (0~1)
+FUZZY_CANDIDATES = 50   # bigram 겹침 상위 몇 개만 편집거리 계산
+
+_CORP_SUFFIXES = {"inc", "corp", "corporation", "co", "ltd", "plc", "company", "주식회사"}
+
+def normalize(s: str) -> str:
+    """대소문자·공백·특수문자·법인 접미사를 제거한 비교용 키"""
+    s = (s or "").lower().replace("(주)", " ")
+    tokens = [t for t in re.split(r"[^0-9a-z가-힣]+", s) if t]
+    while len(tokens) > 1 and tokens[-1] in _CORP_SUFFIXES:
+        tokens.pop()
+    return "".join(tokens)
+
+def _grams(s: str) -> set:
+    if len(s) < 2:
+        return {s} if s else set()
+    return {s[i:i + 2] for i in range(len(s) - 1)}
+
+def _levenshtein(a: str, b: str) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+class SymbolEntry(NamedTuple):
+    symbol: str
+    code: str
+    name_ko: str
+    name_en: str
+    market: str   # KS / KQ / US
+    sector: str
+    rank: int     # 목록 파일 순서 (시가총액 순) - 동점일 때 우선
+
+    @property
+    def display_name(self) -> str:
+        return self.name_ko if self.market in ("KS", "KQ") else (self.name_en or self.name_ko)
+
+class SymbolMatch(NamedTuple):
+    entry: SymbolEntry
+    score: float
+    kind: str     # exact / prefix / fuzzy
+
+class SymbolIndex:
+    def __init__(self, entries: List[SymbolEntry], keys_per_entry: List[List[str]]):
+        self.entries = entries
+        key_entries: Dict[str, set] = defaultdict(set)
+        for i, raw_keys in enumerate(keys_per_entry):
+            for raw in raw_keys:
+                k = normalize(raw)
+                if k:
+                    key_entries[k].add(i)
+        self._key_entries = {k: sorted(v) for k, v in key_entries.items()}
+        self._keys = sorted(self._key_entries)  # 접두 검색용 정렬 키
+        grams: Dict[str, List[int]] = defaultdict(list)
+        for ki, k in enumerate(self._keys):
+            for g in _grams(k):
+                grams[g].append(ki)
+        self._grams = dict(grams)  # bigram → 키 번호 (퍼지 후보 생성)
+        self._candidates = None
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, str]]) -> "SymbolIndex":
+        entries, keys_per_entry = [], []
+        for i, row in enumerate(rows):
+            e = SymbolEntry(
+                symbol=row["symbol"].strip(),
+                code=(row.get("code") or "").strip(),
+                name_ko=(row.get("name_ko") or "").strip(),
+                name_en=(row.get("name_en") or "").strip(),
+                market=(row.get("market") or "").strip().upper(),
+                sector=(row.get("sector") or "").strip(),
+                rank=i,
+            )
+            aliases = [a for a in (row.get("aliases") or "").split(";") if a.strip()]
+            entries.append(e)
+            keys_per_entry.append([e.symbol, e.symbol.split(".")[0], e.code, e.name_ko, e.name_en, *aliases])
+        return cls(entries, keys_per_entry)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "SymbolIndex":
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls.from_rows(list(csv.DictReader(f)))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # -----------------------------
+    # 검색
+    # -----------------------------
+    def _prefix_keys(self, q: str) -> List[str]:
+        lo = bisect.bisect_left(self._keys, q)
+        hi = bisect.bisect_left(self._keys, q + "\uffff")
+        return self._keys[lo:hi]
+
+    def _fuzzy_keys(self, q: str) -> List[tuple]:
+        qg = _grams(q)
+        overlap: Dict[int, int] = defaultdict(int)
+        for g in qg:
+            for ki in self._grams.get(g, ()):
+                overlap[ki] += 1
+        if not overlap:
+            return []
+        scored = []
+        for ki, n in overlap.items():
+            k = self._keys[ki]
+            scored.append((2.0 * n / (len(qg) + len(_grams(k))), k))
+        scored.sort(reverse=True)
+        out = []
+        for dice, k in scored[:FUZZY_CANDIDATES]:
+            sim = 1.0 - _levenshtein(q, k) / max(len(q), len(k))
+            score = max(dice, sim)
+            if score >= FUZZY_MIN_SCORE:
+                out.append((score, k))
+        return out
+
+    def lookup(self, query: str, limit: int = 5) -> List[SymbolMatch]:
+        q = normalize(query)
+        if not q:
+            return []
+        best: Dict[int, SymbolMatch] = {}
+
+        def offer(ei: int, score: float, kind: str):
+            cur = best.get(ei)
+            if cur is None or score > cur.score:
+                best[ei] = SymbolMatch(self.entries[ei], score, kind)
+
+        for ei in self._key_entries.get(q, ()):
+            offer(ei, 3.0, "exact")
+        if len(q) >= PREFIX_MIN_LEN:
+            for k in self._prefix_keys(q):
+                for ei in self._key_entries[k]:
+                    offer(ei, 2.0 + len(q) / len(k), "prefix")
+        if not best:
+            for score, k in self._fuzzy_keys(q):
+                for ei in self._key_entries[k]:
+                    offer(ei, 1.0 + score, "fuzzy")
+
+        matches = sorted(best.values(), key=lambda m: (-m.score, m.entry.rank))
+        return matches[:limit]
+
+    def candidate_set(self, engine):
+        """전체 종목을 랭킹 엔진용 배열(ranking.CandidateSet)로 한 번만 만들어 재사용"""
+        if self._candidates is None:
+            self._candidates = engine.prepare([
+                {"symbol": e.symbol, "description": f"{e.name_ko} {e.name_en}", "_entry": e}
+                for e in self.entries
+            ])
+        return self._candidates
+
+    def get(self, symbol: str) -> Optional[SymbolEntry]:
+        for ei in self._key_entries.get(normalize(symbol), ()):
+            if self.entries[ei].symbol == symbol:
+                return self.entries[ei]
+        return None
+
+class SymbolIndexHolder:
+    """현재 인덱스 참조를 들고 있다가 파일 변경 시 새 인덱스로 교체"""
+    def __init__(self, path: str, check_interval: float = 60.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._index: Optional[SymbolIndex] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def index(self) -> SymbolIndex:
+        if self._index is None:
+            self.reload()
+        else:
+            self.maybe_reload()
+        return self._index
+
+    def reload(self) -> SymbolIndex:
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.path)
+                new_index = SymbolIndex.from_csv(self.path)
+            except (OSError, KeyError, csv.Error) as e:
+                log.error("symbol_index.load_error", path=self.path, error=str(e))
+                if self._index is None:
+                    self._index = SymbolIndex.from_rows([])
+                return self._index
+            # 완성된 인덱스로 참조만 바꾼다 - 읽는 쪽은 잠금 없이 이전/새 인덱스 중 하나를 본다
+            self._index = new_index
+            self._mtime = mtime
+            self._checked_at = time.time()
+            log.info("symbol_index.loaded", path=self.path, size=len(new_index))
+            return new_index
+
+    def maybe_reload(self) -> None:
+        now = time.time()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def lookup(self, query: str, limit: int = 5) -> List[SymbolMatch]:
+        return self.index.lookup(query, limit)
+
+symbol_index = SymbolIndexHolder(
+    os.getenv("SYMBOL_INDEX_PATH", DEFAULT_PATH),
+    check_interval=float(os.getenv("SYMBOL_INDEX_CHECK_SEC", "60")),
+)
@@ -0,0 +1,300 @@
+"""
+단계별 지연 계측 + Prometheus 텍스트 노출 + 구조화 로그.
+
+- Histogram / Counter: 라벨별 누적값을 메모리에 두고 /metrics 에서 Prometheus text format(0.0.4)으로 내보낸다
+  (prometheus_client 없이 동작, 워커별 값 - 여러 워커면 스크레이프 대상도 워커별)
+- stage("metrics", source="naver") / @timed("gpt"): 블록·함수 소요 시간을 finance_stage_seconds 에 기록
+- register_collector(fn): 스크레이프 시점에 캐시 적중률 등 다른 모듈의 stats() 를 metric 으로 변환
+- get_logger(name): 한 줄 JSON(LOG_FORMAT=text 면 key=value) 이벤트 로그.
+  sample=0.01 처럼 표본 비율을 주면 그 비율만 기록 (응답 payload 같은 큰 값은 LOG_PAYLOAD_MAX 자로 자름)
+  레벨은 LOG_LEVEL 로 시작하고 set_level() 로 실행 중에 바꾼다
+"""
+import os, sys, json, math, time, bisect, random, logging, functools, inspect, threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# -----------------------------
+# metric 타입
+# -----------------------------
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels_text(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # 라벨값 → [버킷별 개수(+Inf 포함, 누적 아님), 합계, 개수]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, n) in items:
+            acc = 0
+            for bound, c in zip(self.buckets + (math.inf,), counts):
+                acc += c
+                le = 'le="%s"' % _fmt(bound)
+                lines.append(f"{self.name}_bucket{_labels_text(self.labelnames, key, le)} {acc}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labelnames, key)} {_fmt(round(total, 6))}")
+            lines.append(f"{self.name}_count{_labels_text(self.labelnames, key)} {n}")
+        return lines
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """라벨별 count / 평균 / 버킷 상한 기준 p50·p95 (JSON 통계용 근사치)"""
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._series.items()]
+        out = {}
+        for key, (counts, total, n) in sorted(items):
+            def quantile(q):
+                target, acc = q * n, 0
+                for bound, c in zip(self.buckets + (math.inf,), counts):
+                    acc += c
+                    if acc >= target:
+                        return bound if bound != math.inf else None
+                return None
+            label = ",".join(v for v in key if v)
+            out[label] = {"count": n, "mean": round(total / n, 4) if n else None,
+                          "p50_le": quantile(0.5), "p95_le": quantile(0.95)}
+        return out
+
+# -----------------------------
+# 레지스트리 / 노출
+# -----------------------------
+_metrics: List[Any] = []
+_collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]]]] = []
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    m = Counter(name, help, labelnames)
+    _metrics.append(m)
+    return m
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    m = Histogram(name, help, labelnames, buckets)
+    _metrics.append(m)
+    return m
+
+def register_collector(fn: Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]]]) -> None:
+    """fn() → [(이름, 'gauge'|'counter', 설명, [(라벨 dict, 값), ...]), ...]"""
+    _collectors.append(fn)
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _metrics:
+        lines += m.render()
+    for fn in _collectors:
+        try:
+            families = list(fn())
+        except Exception as e:
+            log.warning("metrics.collector_error", collector=getattr(fn, "__name__", "?"), error=str(e))
+            continue
+        for name, kind, help, samples in families:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                if value is None:
+                    continue
+                lines.append(f"{name}{_labels_text(list(labels), [str(v) for v in labels.values()])} {_fmt(float(value))}")
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# -----------------------------
+# 단계 타이머
+# -----------------------------
+STAGE_SECONDS = histogram("finance_stage_seconds", "분석 단계별 소요 시간(초)", ("stage", "source"))
+STAGE_TIMEOUTS = counter("finance_stage_timeouts_total", "단계별 타임아웃 횟수", ("stage",))
+HTTP_SECONDS = histogram("finance_http_request_seconds", "API 요청 처리 시간(초, 스트리밍은 응답 종료까지)",
+                         ("route", "method", "status"))
+
+@contextmanager
+def stage(name: str, source: str = ""):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name, source=source)
+
+def timed(name: str, source: str = ""):
+    """동기/비동기 함수 모두에 쓰는 stage() 데코레이터"""
+    def deco(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name, source):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name, source):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+class TimingMiddleware:
+    """ASGI 미들웨어 - 라우트 템플릿 단위로 요청 시간을 기록 (SSE 도 스트림 종료까지 측정)"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_SECONDS.observe(
+                time.perf_counter() - start,
+                route=getattr(route, "path", "unmatched"), method=scope.get("method", ""), status=status["code"],
+            )
+
+# -----------------------------
+# 구조화 로그
+# -----------------------------
+ROOT_LOGGER = "finance"
+PAYLOAD_SAMPLE = float(os.getenv("LOG_PAYLOAD_SAMPLE", "0.01"))
+PAYLOAD_MAX = int(os.getenv("LOG_PAYLOAD_MAX", "2000"))
+
+class _JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        out.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{k}={v!r}" if isinstance(v, str) else f"{k}={v}" for k, v in getattr(record, "fields", {}).items())
+        line = f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname:<7} {record.name} {record.getMessage()} {fields}".rstrip()
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+def _clip(value: Any) -> Any:
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= PAYLOAD_MAX else text[:PAYLOAD_MAX] + f"...(+{len(text) - PAYLOAD_MAX})"
+
+class EventLogger:
+    """log.info("naver.json", itemcode=..., payload=js, sample=0.01) → {"event": "naver.json", "itemcode": ..., ...}"""
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+    def enabled(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def _emit(self, level: int, event: str, sample: Optional[float], exc_info, fields: Dict[str, Any]) -> None:
+        if not self._logger.isEnabledFor(level):
+            return
+        if sample is not None and random.random() >= sample:
+            return
+        if sample is not None:
+            fields["sampled"] = sample
+        self._logger.log(level, event, exc_info=exc_info, extra={"fields": {k: _clip(v) for k, v in fields.items()}})
+
+    def debug(self, event: str, sample: Optional[float] = None, **fields) -> None:
+        self._emit(logging.DEBUG, event, sample, None, fields)
+
+    def info(self, event: str, sample: Optional[float] = None, **fields) -> None:
+        self._emit(logging.INFO, event, sample, None, fields)
+
+    def warning(self, event: str, sample: Optional[float] = None, **fields) -> None:
+        self._emit(logging.WARNING, event, sample, None, fields)
+
+    def error(self, event: str, exc_info: Any = False, **fields) -> None:
+        self._emit(logging.ERROR, event, None, exc_info or None, fields)
+
+def get_logger(name: str) -> EventLogger:
+    return EventLogger(name)
+
+def setup_logging() -> None:
+    """앱 로거(finance.*)는 LOG_LEVEL, 라이브러리(httpx/openai 등)는 LOG_LEVEL_LIBS 로 시작"""
+    root = logging.getLogger(ROOT_LOGGER)
+    if not any(getattr(h, "_finance", False) for h in root.handlers):
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(_TextFormatter() if os.getenv("LOG_FORMAT", "json").lower() == "text" else _JSONFormatter())
+        handler._finance = True
+        root.addHandler(handler)
+    root.propagate = False
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logging.getLogger().setLevel(os.getenv("LOG_LEVEL_LIBS", "WARNING").upper())
+
+def set_level(level: str, logger: str = ROOT_LOGGER) -> str:
+    """실행 중 로그 레벨 변경 (logger 를 주면 httpx 같은 라이브러리 로거도 가능). 적용된 레벨 이름 반환"""
+    name = level.upper()
+    if name not in ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"):
+        raise ValueError(f"unknown log level: {level}")
+    logging.getLogger(logger or None).setLevel(name)
+    return name
+
+def levels() -> Dict[str, str]:
+    names = [ROOT_LOGGER] + sorted(n for n in logging.root.manager.loggerDict if n.startswith(ROOT_LOGGER + "."))
+    out = {n: logging.getLevelName(logging.getLogger(n).getEffectiveLevel()) for n in names}
+    out["root"] = logging.getLevelName(logging.getLogger().level)
+    return out
+
+log = get_logger("telemetry")
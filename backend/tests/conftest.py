@@ -0,0 +1,4 @@
+import os, sys
+
+# 백엔드 모듈은 backend/ 에서 실행하는 전제로 최상위 import (from rpg import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
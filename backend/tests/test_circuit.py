@@ -0,0 +1,52 @@
+"""circuit.CircuitBreaker: 상태 전이, 늦게 끝난 실패, 토큰 대기 제외"""
+import time
+
+import pytest
+
+from circuit import HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, note_queued
+from rate_governor import RateLimitExceeded
+
+def _open(b: CircuitBreaker) -> None:
+    for _ in range(b.failures):
+        b.record_failure("boom")
+
+def test_late_failure_does_not_extend_cooldown():
+    b = CircuitBreaker("t", failures=2, cooldown=0.2)
+    _open(b)
+    opened_at = b._opened_at
+    time.sleep(0.05)
+    b.record_failure("straggler")  # 열리기 전에 보낸 호출이 뒤늦게 실패
+    assert b._opened_at == opened_at
+    assert b.stats()["opened"] == 1
+    time.sleep(0.2)
+    assert b.state == HALF_OPEN
+
+def test_failed_probe_reopens():
+    b = CircuitBreaker("t", failures=2, cooldown=0.05)
+    _open(b)
+    time.sleep(0.06)
+    b.allow()
+    with pytest.raises(CircuitOpen):
+        b.allow()  # 시험 호출은 한 건만
+    b.record_failure("probe")
+    assert b.state == OPEN
+    assert b.stats()["opened"] == 2
+
+def test_rate_limit_rejection_is_not_a_failure():
+    b = CircuitBreaker("t", failures=1, cooldown=30)
+    with pytest.raises(RateLimitExceeded):
+        with b.guard():
+            raise RateLimitExceeded("bucket", 9.0)
+    assert b.stats()["failures"] == 0
+    assert b.state != OPEN
+
+def test_queued_time_is_excluded_from_slow_calls():
+    b = CircuitBreaker("t", failures=1, cooldown=30, slow_sec=0.05)
+    with b.guard():
+        time.sleep(0.1)
+        note_queued(0.1)  # 트랜스포트가 보고한 토큰 대기
+    assert b.stats()["slow"] == 0
+    with b.guard():
+        time.sleep(0.1)
+    assert b.stats()["slow"] == 1
+    assert b.state == OPEN
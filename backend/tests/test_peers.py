@@ -0,0 +1,35 @@
+"""peers: 업종 비교와 시장 대체 비교가 API·템플릿 문장에서 구분되는지"""
+import numpy as np
+
+import local_summary
+from peers import PeerIndex
+from rpg import DEFAULT_THRESHOLDS
+
+def _index() -> PeerIndex:
+    # 반도체 6 종목(업종 비교), 보험 2 종목(업종이 작아 시장), 업종 없는 1 종목(시장)
+    sectors = ["반도체"] * 6 + ["보험"] * 2 + [""]
+    n = len(sectors)
+    index = PeerIndex(min_peers=5)
+    index.load([f"{i:06d}.KS" for i in range(n)], [f"{i:06d}" for i in range(n)], ["KS"] * n, sectors,
+               {c: np.arange(1, n + 1, dtype=np.float64) for c in ("per", "pbr", "roe")})
+    return index
+
+def test_market_fallback_is_labelled():
+    index = _index()
+    sector = index.percentiles("000000")
+    assert (sector["basis"], sector["group"], sector["sector"]) == ("sector", "반도체", "반도체")
+    small = index.percentiles("000006")
+    assert (small["basis"], small["group"], small["sector"]) == ("market", "KS", "보험")
+    unknown = index.percentiles("000008")
+    assert (unknown["basis"], unknown["group"], unknown["sector"]) == ("market", "KS", None)
+
+def test_template_does_not_call_market_an_industry():
+    index = _index()
+    text = local_summary._peer_text(index.percentiles("000000"), DEFAULT_THRESHOLDS)
+    assert text.startswith("'반도체' 업종 6개 종목")
+    small = local_summary._peer_text(index.percentiles("000006"), DEFAULT_THRESHOLDS)
+    assert small.startswith("'보험' 업종 종목이 적어 KS 시장 전체와 비교했다.")
+    unknown = local_summary._peer_text(index.percentiles("000008"), DEFAULT_THRESHOLDS)
+    assert unknown.startswith("업종 정보가 없어 KS 시장 전체와 비교했다.")
+    for t in (small, unknown):
+        assert "업종 평균" not in t and "업종보다" not in t
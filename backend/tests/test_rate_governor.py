@@ -0,0 +1,81 @@
+"""rate_governor: 공유(SQLite) 토큰 버킷이 잠겨 있어도 aacquire 가 이벤트 루프를 막지 않는지, 취소 후 대기열 정리"""
+import asyncio, sqlite3, threading, time
+
+from rate_governor import BACKGROUND, INTERACTIVE, TokenBucket, _SQLiteState
+
+MAX_WAIT = {INTERACTIVE: 5.0, BACKGROUND: 30.0}
+
+def _hold_write_lock(path: str, seconds: float, ready: threading.Event) -> None:
+    """다른 워커가 쓰기 트랜잭션을 쥐고 있는 상황"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    ready.set()
+    time.sleep(seconds)
+    conn.execute("COMMIT")
+    conn.close()
+
+async def _max_loop_gap(until: asyncio.Future, interval: float = 0.01) -> float:
+    gap, last = 0.0, time.monotonic()
+    while not until.done():
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        gap, last = max(gap, now - last), now
+    return gap
+
+def test_shared_acquire_does_not_block_event_loop(tmp_path):
+    path = str(tmp_path / "rate.db")
+    bucket = TokenBucket("t", rate=100.0, burst=5, max_wait=MAX_WAIT, shared=_SQLiteState(path))
+    bucket._available()  # 테이블 생성
+
+    async def main():
+        ready = threading.Event()
+        holder = threading.Thread(target=_hold_write_lock, args=(path, 0.6, ready))
+        holder.start()
+        ready.wait()
+        started = time.monotonic()
+        acquire = asyncio.ensure_future(bucket.aacquire(INTERACTIVE))
+        gap = await _max_loop_gap(acquire)
+        waited = time.monotonic() - started
+        holder.join()
+        await acquire
+        return gap, waited
+
+    gap, waited = asyncio.run(main())
+    assert waited >= 0.4  # 잠금이 풀릴 때까지 기다렸고
+    assert gap < 0.2      # 그동안 루프는 계속 돌았다
+    assert bucket.stats()["by_priority"]["interactive"]["acquired"] == 1
+
+def test_cancelled_acquire_leaves_queue(tmp_path):
+    bucket = TokenBucket("t", rate=1.0, burst=1, max_wait=MAX_WAIT, shared=_SQLiteState(str(tmp_path / "rate.db")))
+
+    async def main():
+        await bucket.aacquire(BACKGROUND)  # 버스트 소진
+        waiter = asyncio.ensure_future(bucket.aacquire(BACKGROUND))
+        await asyncio.sleep(0.1)
+        assert bucket.stats()["queued"] == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0.05)  # 스레드에서 늦게 끝난 시도
+        # 다음 호출이 남은 번호표 뒤에 막히지 않는다
+        return await asyncio.wait_for(bucket.aacquire(INTERACTIVE), timeout=3)
+
+    asyncio.run(main())
+    assert bucket.stats()["queued"] == 0
+
+def test_local_bucket_priority_order():
+    bucket = TokenBucket("t", rate=20.0, burst=1, max_wait=MAX_WAIT)
+    order = []
+
+    async def take(name, prio):
+        await bucket.aacquire(prio)
+        order.append(name)
+
+    async def main():
+        await bucket.aacquire(INTERACTIVE)  # 버스트 소진 - 이후는 대기열 순서대로
+        tasks = [asyncio.ensure_future(take("bg", BACKGROUND))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(take("user", INTERACTIVE)))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["user", "bg"]
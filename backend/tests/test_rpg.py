@@ -0,0 +1,81 @@
+"""
+rpg 분류: 컬럼 단위 구현(classify_arrays / classify_frame / classify_rpg)이
+원래의 종목별 분류 로직(_baseline)과 같은 결과를 내는지 - 경계값 격자 + 시드 고정 랜덤 입력.
+"""
+import itertools, math, random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rpg import RPG_DESCRIPTIONS, RPGThresholds, classify_arrays, classify_frame, classify_rpg, classify_rpg_many
+
+TH = RPGThresholds()  # 10 / 12 / 1.0 (환경변수 RPG_* 와 무관하게)
+
+def _baseline(roe, per, pbr, th=TH):
+    """벡터화 이전 app.classify_rpg 와 같은 규칙 (기준값만 인자로)"""
+    def given(v):
+        return v is not None and not (isinstance(v, float) and math.isnan(v))
+
+    roe_tag = "High" if (given(roe) and roe >= th.roe_min) else "Low"
+    per_tag = "Low" if (given(per) and per <= th.per_max) else "High"
+    pbr_tag = "Low" if (given(pbr) and pbr <= th.pbr_max) else "High"
+
+    if roe_tag == "High" and pbr_tag == "Low": job = "전사"
+    elif roe_tag == "High" and per_tag == "High": job = "마법사"
+    else: job = "도적"
+
+    temper = "모험" if (per_tag == "High" and roe_tag == "High") else "수호"
+    title = f"{temper} {job}"
+    return title, job, temper, RPG_DESCRIPTIONS.get(title, "")
+
+def _edges(limit):
+    return [None, math.nan, -limit, -1.0, 0.0, limit - 1e-9, limit, limit + 1e-9, 1.0, 10.0, 12.0, 1e9]
+
+BOUNDARY_GRID = list(itertools.product(_edges(TH.roe_min), _edges(TH.per_max), _edges(TH.pbr_max)))
+
+def _random_cases(seed, n=5000):
+    rng = random.Random(seed)
+
+    def value(limit):
+        r = rng.random()
+        if r < 0.1:
+            return None
+        if r < 0.15:
+            return math.nan
+        if r < 0.35:  # 기준값 근처 (정확히 같은 값 포함)
+            return rng.choice([limit, limit + rng.uniform(-0.01, 0.01)])
+        return rng.uniform(-50, 100)
+
+    return [(value(TH.roe_min), value(TH.per_max), value(TH.pbr_max)) for _ in range(n)]
+
+def _frame_rows(cases):
+    df = pd.DataFrame(cases, columns=["roe", "per", "pbr"], dtype=object)
+    out = classify_frame(df, TH)
+    return list(out[["title", "job", "temper", "description"]].itertuples(index=False, name=None))
+
+@pytest.mark.parametrize("cases", [BOUNDARY_GRID, _random_cases(0), _random_cases(1)], ids=["boundary", "seed0", "seed1"])
+def test_vectorized_matches_baseline(cases):
+    expected = [_baseline(*c) for c in cases]
+    roes, pers, pbrs = zip(*cases)
+
+    assert [classify_rpg(*c, thresholds=TH) for c in cases] == expected
+    assert classify_rpg_many(roes, pers, pbrs, TH) == expected
+    assert _frame_rows(cases) == expected
+
+    cols = classify_arrays(np.array(roes, dtype=object), np.array(pers, dtype=object), np.array(pbrs, dtype=object), TH)
+    assert list(zip(*(cols[k].tolist() for k in ("title", "job", "temper", "description")))) == expected
+
+def test_float_arrays_match_baseline():
+    """스크리너 스냅샷처럼 결측이 NaN 인 float64 배열"""
+    rng = np.random.default_rng(2)
+    roe, per, pbr = (np.where(rng.random(2000) < 0.1, np.nan, rng.uniform(-20, 40, 2000)) for _ in range(3))
+    cols = classify_arrays(roe, per, pbr, TH)
+    expected = [_baseline(*c) for c in zip(roe.tolist(), per.tolist(), pbr.tolist())]
+    assert list(zip(cols["title"].tolist(), cols["job"].tolist(), cols["temper"].tolist(),
+                    cols["description"].tolist())) == expected
+
+@pytest.mark.parametrize("th", [RPGThresholds(15.0, 8.0, 0.7), RPGThresholds(0.0, 0.0, 0.0)])
+def test_custom_thresholds_match_baseline(th):
+    cases = _random_cases(3, n=2000) + list(itertools.product(_edges(th.roe_min), _edges(th.per_max), _edges(th.pbr_max)))
+    assert [classify_rpg(*c, thresholds=th) for c in cases] == [_baseline(*c, th=th) for c in cases]
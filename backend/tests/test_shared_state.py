@@ -0,0 +1,113 @@
+"""shared_state: single-flight 임대 획득·만료, 워커(프로세스) 간 같은 키 미스 합치기, 잠긴 DB 에서도 루프가 도는지"""
+import asyncio, multiprocessing, os, sqlite3, threading, time
+
+from metric_cache import MetricCache
+from shared_state import SharedFlight, acoordinate
+
+def _lease_other_worker(path: str, key: str, seconds: float) -> None:
+    """다른 워커(pid)가 임대를 잡고 있는 상황"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("INSERT OR REPLACE INTO flights (key, owner, expires) VALUES (?,?,?)",
+                 (key, os.getpid() + 1, time.time() + seconds))
+    conn.close()
+
+async def _acoordinate_value(flight, key):
+    async with acoordinate(flight, key, lambda: None) as shared:
+        return shared
+
+def test_lease_acquire_and_expiry(tmp_path):
+    path = str(tmp_path / "flights.db")
+    flight = SharedFlight(path, lease=30.0)
+    assert flight.try_acquire("a")
+    assert flight.try_acquire("a")  # 같은 프로세스는 다시 잡을 수 있다(갱신)
+    flight.release("a")
+    assert not flight.held("a")
+
+    _lease_other_worker(path, "b", 0.3)
+    assert not flight.try_acquire("b")
+    assert flight.held("b")
+    time.sleep(0.35)
+    assert not flight.held("b")
+    assert flight.try_acquire("b")  # 만료된 임대는 넘겨받는다
+    assert flight.stats()["acquired"] == 3
+
+def test_waiter_gets_result_or_none_after_lease(tmp_path):
+    path = str(tmp_path / "flights.db")
+    flight = SharedFlight(path, lease=30.0, poll=0.02)
+    flight.held("x")  # 테이블 생성
+    _lease_other_worker(path, "x", 0.2)
+    box = {}
+
+    async def main():
+        async with acoordinate(flight, "x", lambda: box.get("v")) as shared:
+            return shared
+
+    threading.Timer(0.05, box.update, kwargs={"v": 42}).start()
+    assert asyncio.run(main()) == 42
+    # 결과 없이 임대만 끝나면 직접 만든다 (shared is None)
+    _lease_other_worker(path, "y", 0.1)
+    assert asyncio.run(_acoordinate_value(flight, "y")) is None
+    assert flight.stats()["wait_misses"] == 1
+
+def _worker(db_dir: str, calls: str, barrier, out) -> None:
+    cache = MetricCache(db_path=os.path.join(db_dir, "metric.db"))
+    cache.flight = SharedFlight(os.path.join(db_dir, "flights.db"), poll=0.02)
+
+    async def fetch():
+        with open(calls, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        await asyncio.sleep(0.3)
+        return (10.0, 1.0, 12.0)
+
+    barrier.wait()
+    value = asyncio.run(cache.aget_or_fetch("naver", "005930", fetch))
+    out.put((value, cache.stats()["shared_hits"]))
+
+def test_cross_worker_miss_fetches_once(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    calls = str(tmp_path / "calls.txt")
+    barrier, out = ctx.Barrier(3), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(str(tmp_path), calls, barrier, out)) for _ in range(3)]
+    for p in procs:
+        p.start()
+    results = [out.get(timeout=15) for _ in procs]
+    for p in procs:
+        p.join(timeout=5)
+
+    assert all(value == (10.0, 1.0, 12.0) for value, _ in results)
+    with open(calls) as f:
+        assert len(f.read().split()) == 1  # 업스트림 호출은 한 번
+    assert sum(hits for _, hits in results) == 2  # 나머지 둘은 공유 L2 에서
+
+def test_acoordinate_does_not_block_event_loop(tmp_path):
+    path = str(tmp_path / "flights.db")
+    flight = SharedFlight(path)
+    flight.held("k")  # 테이블 생성
+
+    def hold(ready: threading.Event) -> None:
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")
+        ready.set()
+        time.sleep(0.6)
+        conn.execute("COMMIT")
+        conn.close()
+
+    async def main():
+        ready = threading.Event()
+        holder = threading.Thread(target=hold, args=(ready,))
+        holder.start()
+        ready.wait()
+        started = time.monotonic()
+        task = asyncio.ensure_future(_acoordinate_value(flight, "k"))
+        gap, last = 0.0, time.monotonic()
+        while not task.done():
+            await asyncio.sleep(0.01)
+            now = time.monotonic()
+            gap, last = max(gap, now - last), now
+        holder.join()
+        return await task, gap, time.monotonic() - started
+
+    shared, gap, waited = asyncio.run(main())
+    assert shared is None and not flight.held("k")  # 직접 만들고 임대를 놓았다
+    assert waited >= 0.4  # 쓰기 잠금이 풀릴 때까지 기다렸고
+    assert gap < 0.2      # 그동안 루프는 계속 돌았다
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import './Search.css';
 import logo from './asset/logo.png';
 import { Link } from 'react-router-dom';
@@ -12,25 +12,80 @@ const Search = () => {
   const [data, setData] = useState(null); // API 응답 데이터 상태
   const [error, setError] = useState(null); // 에러 상태
   const [loading, setLoading] = useState(false); // 로딩 상태 추가
+  const [summarizing, setSummarizing] = useState(false); // GPT 요약 스트리밍 중
+  const sourceRef = useRef(null); // 진행 중인 SSE 연결 (새 검색·페이지 이탈 시 닫는다)
+
+  // 페이지를 떠나면 진행 중인 스트림을 닫는다
+  useEffect(() => () => {
+    if (sourceRef.current) sourceRef.current.close();
+  }, []);
+
+  // GPT 가 내보내는 JSON 필드 → 화면 데이터 위치
+  const applyField = (prev, name, value) => {
+    const summaryIndex = { investment_advice: 0, recent_news_strategy: 1, rpg_title_desc: 2 }[name];
+    if (summaryIndex !== undefined) {
+      const summary3 = [...prev.summary3];
+      summary3[summaryIndex] = value;
+      return { ...prev, summary3 };
+    }
+    if (name === 'caution' || name === 'advantage') {
+      const key = name === 'caution' ? 'caution' : 'positive';
+      return { ...prev, insights: { ...prev.insights, [key]: value } };
+    }
+    return prev;
+  };
+
+  const handleSearch = () => {
+    // 이전 검색의 스트림이 남아 있으면 닫아, 늦게 온 이벤트가 새 결과를 덮지 않게 한다
+    if (sourceRef.current) sourceRef.current.close();
 
-  const handleSearch = async () => {
     setError(null);
     setData(null);
     setLoading(true); // 로딩 시작
+    setSummarizing(false);
 
-    try {
-      // const response = await fetch(`${API_BASE_URL}/api/analyze_by_name?name=${encodeURIComponent(search)}`); // 로컬에서 실행할 경우
-      const response = await fetch(`${VITE_API_URL}/api/analyze_by_name?name=${encodeURIComponent(search)}`); // 배포 페이지에서 실행할 경우
-      if (!response.ok) {
-        throw new Error("데이터를 가져오는 데 실패했습니다. 조금 더 구체적인 종목명 또는 영어 종목명을 작성해주세요!");
-      }
-      const result = await response.json();
-      setData(result);
-    } catch (err) {
-      setError(err.message);
-    } finally {
+    // 지표가 먼저 오고 GPT 요약은 생성되는 대로 채워지는 스트리밍(SSE) 엔드포인트
+    // const source = new EventSource(`${API_BASE_URL}/api/analyze_by_name/stream?name=${encodeURIComponent(search)}`); // 로컬에서 실행할 경우
+    const source = new EventSource(`${VITE_API_URL}/api/analyze_by_name/stream?name=${encodeURIComponent(search)}`); // 배포 페이지에서 실행할 경우
+    sourceRef.current = source;
+
+    const finish = () => {
+      source.close();
+      if (sourceRef.current === source) sourceRef.current = null;
       setLoading(false); // 로딩 종료
-    }
+      setSummarizing(false);
+    };
+
+    source.addEventListener('ticker', (e) => {
+      const { company, ticker } = JSON.parse(e.data);
+      setData({ company, ticker, summary3: [], insights: {} });
+    });
+
+    source.addEventListener('metrics', (e) => {
+      const metrics = JSON.parse(e.data);
+      setData((prev) => ({ ...prev, ...metrics }));
+      setLoading(false);
+      setSummarizing(true);
+    });
+
+    source.addEventListener('field', (e) => {
+      const { name, value } = JSON.parse(e.data);
+      setData((prev) => applyField(prev, name, value));
+    });
+
+    source.addEventListener('done', (e) => {
+      setData(JSON.parse(e.data));
+      finish();
+    });
+
+    // 서버가 보낸 error 이벤트(data 있음)와 연결 오류(data 없음) 모두 여기로 온다
+    source.addEventListener('error', (e) => {
+      if (e.data) {
+        setData(null);
+      }
+      setError("데이터를 가져오는 데 실패했습니다. 조금 더 구체적인 종목명 또는 영어 종목명을 작성해주세요!");
+      finish();
+    });
   };
 
   return (
@@ -66,7 +121,7 @@ const Search = () => {
 
         {error && <div className="error">에러: {error}</div>}
 
-        {data && (
+        {data && data.rpg && (
           <div className="search-results">
             <div className="stock-info">
               <div className="info">종목 정보</div><br />
@@ -107,13 +162,18 @@ const Search = () => {
               <br />
 
               <h3>⚜️인사이트</h3>
-              <p><strong>주의:</strong> {data.insights.caution || '위 요약본 참고'}</p>
-              <p><strong>장점:</strong> {data.insights.positive || '위 요약본 참고'}</p>
+              <p><strong>주의:</strong> {data.insights.caution || (summarizing ? '' : '위 요약본 참고')}</p>
+              <p><strong>장점:</strong> {data.insights.positive || (summarizing ? '' : '위 요약본 참고')}</p>
 
               <br />
-              <h3>⚜️데이터 출처</h3>
-              <p><strong>출처:</strong> {data.source.primary}</p>
-              <p><strong>기준 시점:</strong> {data.source.as_of}</p>
+              {summarizing && <p>투자 정보를 생성중입니다...</p>}
+              {data.source && (
+                <>
+                  <h3>⚜️데이터 출처</h3>
+                  <p><strong>출처:</strong> {data.source.primary}</p>
+                  <p><strong>기준 시점:</strong> {data.source.as_of}</p>
+                </>
+              )}
             </div>
           </div>
         )}